@@ -4,6 +4,7 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError, AuthenticationFailed
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from core.querysets import optimize_queryset_for_serializer
 from drivers.models import Driver
 from drivers.serializers import DriverSerializer
 from vehicles.models import Vehicle
@@ -100,17 +101,31 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Returns the tokens and the profile of the account.
+
+    By default the drivers and vehicles of the account are included as well, for the clients that still expect the
+    legacy combined payload. Clients that send `?payload=lean` get the tokens and profile only, and fetch the fleet
+    from the paginated bootstrap endpoint instead.
+    """
+    LEAN_PAYLOAD = 'lean'
+
     def validate(self, attrs):
         account = self._validate_account(attrs)
         data = self._get_tokens_data(attrs)
         serialized_account = UserProfileSerializer(account).data
         data.update(serialized_account)
-        data.update(self._get_serialized_data(Driver, DriverSerializer, account))
-        data.update(self._get_serialized_data(Vehicle, VehicleSerializer, account))
+        if not self._is_lean_payload_requested():
+            data.update(self._get_serialized_data(Driver, DriverSerializer, account))
+            data.update(self._get_serialized_data(Vehicle, VehicleSerializer, account))
         return data
 
+    def _is_lean_payload_requested(self):
+        request = self.context.get('request')
+        return request is not None and request.query_params.get('payload') == self.LEAN_PAYLOAD
+
     def _get_serialized_data(self, model, serializer, profile):
-        queryset = model.objects.filter(profile=profile)
+        queryset = optimize_queryset_for_serializer(model.objects.filter(profile=profile), serializer)
         serializer_data = serializer(queryset, many=True).data
         return {model.__name__.lower() + 's': serializer_data}
 
@@ -122,7 +137,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
     def _validate_account(self, attrs):
-        account = UserProfile.objects.filter(user__username=attrs['username']).first()
+        account = UserProfile.objects.select_related('user').filter(user__username=attrs['username']).first()
         if not account:
             raise AuthenticationFailed(detail=AUTHENTICATION_ERROR)
         return account
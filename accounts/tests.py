@@ -3,7 +3,9 @@ from random import choice
 from allauth.socialaccount.models import SocialAccount
 from allauth.socialaccount.signals import social_account_added
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from factory import LazyAttribute
 from rest_framework import status
@@ -239,3 +241,65 @@ class UserProfileSignalTests(TestCase):
             1,
             "Duplicate profile created!"
         )
+
+
+class LeanLoginAndBootstrapTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.vehicles = VehicleFactory.create_batch(size=3, profile=cls.user_profile)
+        cls.drivers = DriverFactory.create_batch(size=5, profile=cls.user_profile, vehicle=LazyAttribute(lambda _: choice(cls.vehicles)))
+        other_user_profile = UserProfileFactory.create()
+        DriverFactory.create_batch(size=2, profile=other_user_profile, vehicle=VehicleFactory.create(profile=other_user_profile))
+
+    def login(self, **params):
+        url = reverse("login") + (f"?{'&'.join(f'{key}={value}' for key, value in params.items())}" if params else "")
+        return self.client.post(url, {"username": self.user_profile.user.username, "password": "password"}, format="json")
+
+    def test_lean_login_returns_profile_only(self):
+        response = self.login(payload='lean')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['username'], self.user_profile.user.username)
+        for key in ('drivers', 'vehicles'):
+            self.assertNotIn(key, response.data)
+        for key in ('refresh', 'access'):
+            self.assertIn(key, response.cookies)
+
+    def test_legacy_login_query_count_does_not_grow_with_fleet_size(self):
+        with CaptureQueriesContext(connection) as context:
+            self.login()
+        DriverFactory.create_batch(size=5, profile=self.user_profile, vehicle=LazyAttribute(lambda _: choice(self.vehicles)))
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.login()
+        self.assertEqual(len(response.data['drivers']), 10)
+
+    def test_bootstrap_pages(self):
+        self.client.cookies['access'] = AccessToken.for_user(self.user_profile.user)
+        driver_ids = []
+        url, data = reverse("bootstrap", args=["drivers"]), {"pageSize": 2}
+        while url:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], len(self.drivers))
+            for driver in response.data['results']:
+                self.assertEqual(driver['vehicle_details']['id'], driver['vehicle'])
+            driver_ids.extend(driver['id'] for driver in response.data['results'])
+            url, data = response.data['next'], None
+        self.assertEqual(driver_ids, sorted(driver.id for driver in self.drivers))
+
+        response = self.client.get(reverse("bootstrap", args=["vehicles"]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], len(self.vehicles))
+
+    def test_bootstrap_query_count_does_not_grow_with_page_size(self):
+        self.client.cookies['access'] = AccessToken.for_user(self.user_profile.user)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse("bootstrap", args=["drivers"]), {"pageSize": 1})
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(reverse("bootstrap", args=["drivers"]), {"pageSize": 5})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_bootstrap_unknown_resource(self):
+        self.client.cookies['access'] = AccessToken.for_user(self.user_profile.user)
+        response = self.client.get(reverse("bootstrap", args=["parts"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
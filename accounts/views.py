@@ -8,6 +8,7 @@ from allauth.socialaccount.models import SocialAccount
 from allauth.socialaccount.providers.facebook.views import FacebookOAuth2Adapter
 from dj_rest_auth.registration.views import SocialLoginView
 from rest_framework import permissions, status
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
@@ -16,6 +17,12 @@ from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from core.querysets import optimize_queryset_for_serializer
+from drivers.models import Driver
+from drivers.serializers import DriverSerializer
+from vehicles.models import Vehicle
+from vehicles.serializers import VehicleSerializer
+from .pagination import BootstrapPagination
 from .serializers import UserProfileSerializer, CustomTokenObtainPairSerializer
 
 
@@ -63,6 +70,29 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         return response
 
 
+class AccountBootstrapView(APIView):
+    """
+    Returns one page of the fleet of the account, per resource, so that clients can load the drivers and vehicles
+    after a lean login in parallel or incrementally.
+    """
+    permission_classes = [permissions.IsAuthenticated, ]
+    RESOURCES = {
+        'drivers': (Driver, DriverSerializer),
+        'vehicles': (Vehicle, VehicleSerializer),
+    }
+
+    def get(self, request, resource):
+        if resource not in self.RESOURCES:
+            raise NotFound(detail="Resource does not exist.")
+        model, serializer_class = self.RESOURCES[resource]
+        queryset = model.objects.filter(profile__user=request.user).order_by('pk')
+        queryset = optimize_queryset_for_serializer(queryset, serializer_class)
+        paginator = BootstrapPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = serializer_class(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+
 class TokenVerificationView(TokenRefreshView):
     permission_classes = (permissions.IsAuthenticated,)
 
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of open DB-API connections to one database.
+
+    Connections are handed out most recently returned first, so a lightly loaded process keeps reusing a few warm
+    connections and the others reach their maximum lifetime and are closed. At most `max_size` connections are open
+    at the same time: a checkout waits up to `timeout` seconds for one to be returned before raising `PoolTimeout`.
+    """
+
+    def __init__(self, max_size=10, max_lifetime=1800, timeout=10, check_on_checkout=True):
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_on_checkout = check_on_checkout
+        self._idle = deque()
+        self._opened_at = {}
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            'checkouts': 0, 'connections_opened': 0, 'connections_closed': 0, 'health_check_failures': 0,
+            'timeouts': 0, 'waits': 0, 'wait_time_total': 0.0, 'wait_time_max': 0.0,
+        }
+
+    def acquire(self, connect):
+        """Returns an open connection, reusing an idle one if there is a healthy one left or opening one with `connect`."""
+        started = time.monotonic()
+        while True:
+            connection = self._checkout(started)
+            if connection is None:
+                break
+            if self.is_healthy(connection):
+                return connection
+            with self._condition:
+                self._stats['health_check_failures'] += 1
+            self.release(connection, discard=True)
+
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._opened_at[connection] = time.monotonic()
+            self._stats['connections_opened'] += 1
+        return connection
+
+    def _checkout(self, started):
+        """Reserves a slot and returns an idle connection for it, or None if a new connection has to be opened."""
+        with self._condition:
+            waited = False
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout} seconds ({self.max_size} in use).")
+                waited = True
+                self._condition.wait(remaining)
+
+            if waited:
+                wait_time = time.monotonic() - started
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += wait_time
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+            self._stats['checkouts'] += 1
+            self._in_use += 1
+            while self._idle:
+                connection = self._idle.pop()
+                if not self.is_expired(connection):
+                    return connection
+                self._close(connection)
+            return None
+
+    def release(self, connection, discard=False):
+        """Returns a connection to the pool, or closes it if it is broken, expired or in the middle of a transaction."""
+        if not discard:
+            discard = connection.closed or self.is_expired(connection) or not self.reset(connection)
+        with self._condition:
+            self._in_use -= 1
+            if discard:
+                self._close(connection)
+            else:
+                self._idle.append(connection)
+            self._condition.notify()
+
+    def close_idle(self):
+        """Closes every idle connection, the ones in use are closed when they are returned after their lifetime."""
+        with self._condition:
+            while self._idle:
+                self._close(self._idle.pop())
+
+    def is_expired(self, connection):
+        return time.monotonic() - self._opened_at.get(connection, 0) > self.max_lifetime
+
+    def is_healthy(self, connection):
+        if connection.closed:
+            return False
+        if not self.check_on_checkout:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except Exception:
+            return False
+        return self.reset(connection)
+
+    @staticmethod
+    def reset(connection):
+        """Rolls back whatever transaction the connection was left in, returns False if it cannot be reused."""
+        try:
+            if connection.get_transaction_status() != 0:  # psycopg2.extensions.TRANSACTION_STATUS_IDLE
+                connection.rollback()
+            return connection.get_transaction_status() == 0
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        # Called with the condition held
+        self._opened_at.pop(connection, None)
+        self._stats['connections_closed'] += 1
+        try:
+            connection.close()
+        except Exception:
+            logger.warning("Failed to close a pooled database connection", exc_info=True)
+
+    def stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(max_size=self.max_size, in_use=self._in_use, idle=len(self._idle))
+        checkouts = stats['checkouts'] or 1
+        stats['wait_time_avg_ms'] = round(stats.pop('wait_time_total') / checkouts * 1000, 3)
+        stats['wait_time_max_ms'] = round(stats.pop('wait_time_max') * 1000, 3)
+        return stats
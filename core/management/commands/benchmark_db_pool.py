@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+
+from core.backends.postgresql_pool.base import DatabaseWrapper as PooledDatabaseWrapper
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the database cost of a request, which connects, runs one query and closes its connection, with the "
+        "plain PostgreSQL backend and with the pooled one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Number of requests simulated with each backend.")
+        parser.add_argument('--database', default='default', help="Database the connections are opened to.")
+
+    def handle(self, *args, **options):
+        settings_dict = connections[options['database']].settings_dict
+        backends = {
+            'plain': PostgresDatabaseWrapper(dict(settings_dict), alias='benchmark_plain'),
+            'pooled': PooledDatabaseWrapper(dict(settings_dict), alias='benchmark_pooled'),
+        }
+
+        timings = {}
+        for label, connection in backends.items():
+            timings[label] = self.simulate_requests(connection, options['requests'])
+            self.stdout.write(f"{label:<7} {timings[label] * 1000:8.3f} ms/request")
+
+        saved = timings['plain'] - timings['pooled']
+        self.stdout.write(f"pool    {backends['pooled'].pool.stats()}")
+        self.stdout.write(self.style.SUCCESS(f"The pool saves {saved * 1000:.3f} ms per request ({timings['plain'] / timings['pooled']:.1f}x faster)."))
+
+    @staticmethod
+    def simulate_requests(connection, requests):
+        started = time.perf_counter()
+        for _ in range(requests):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            # Django closes the connection at the end of every request when CONN_MAX_AGE is 0
+            connection.close()
+        return (time.perf_counter() - started) / requests
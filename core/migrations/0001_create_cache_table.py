@@ -0,0 +1,16 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # Creates the table of the database cache backend configured in settings.CACHES, if any
+    call_command('createcachetable', database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Keyset pagination used when the client asks for `?pagination=cursor`. Pages are fetched with a WHERE clause on
+    the ordering column instead of OFFSET and no COUNT query is made, so deep pages cost the same as the first one.
+
+    DRF only keys the cursor on the first ordering field. Subclasses that order by a non-unique field first skip the
+    rows sharing the cursor's value with an offset, so pages stay correct but cost grows with the number of ties.
+    """
+    page_size_query_param = 'pageSize'
+    max_page_size = 20
+    ordering = 'pk'
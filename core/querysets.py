@@ -0,0 +1,61 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def optimize_queryset_for_serializer(queryset, serializer_class, **serializer_kwargs):
+    """
+    Applies the select_related and prefetch_related calls a serializer needs to render the queryset.
+
+    The serializer tree is walked once: nested serializers whose source is a forward foreign key or one-to-one
+    relation are joined with select_related, and nested `many=True` serializers on reverse or many-to-many relations
+    are prefetched with a queryset that is optimized recursively for the child serializer. Fields with dotted or
+    custom sources are left alone.
+
+    Args:
+        queryset: The queryset that is going to be serialized.
+        serializer_class: The serializer class used to render each object of the queryset.
+        **serializer_kwargs: Extra keyword arguments used to instantiate the serializer (e.g. context).
+
+    Returns:
+        QuerySet: The optimized queryset.
+    """
+    return _optimize_queryset(queryset, serializer_class(**serializer_kwargs))
+
+
+def _optimize_queryset(queryset, serializer):
+    select_related, prefetch_related = _collect_related_lookups(queryset.model, serializer, prefix='')
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset
+
+
+def _collect_related_lookups(model, serializer, prefix):
+    select_related, prefetch_related = [], []
+    for field in serializer.fields.values():
+        is_many = isinstance(field, ListSerializer)
+        nested_serializer = field.child if is_many else field
+        if field.write_only or not isinstance(nested_serializer, BaseSerializer) or '.' in field.source or field.source == '*':
+            continue
+
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        lookup = f'{prefix}{field.source}'
+        related_model = model_field.related_model
+        if not is_many and (model_field.many_to_one or model_field.one_to_one):
+            select_related.append(lookup)
+            nested_select_related, nested_prefetch_related = _collect_related_lookups(related_model, nested_serializer, prefix=f'{lookup}__')
+            select_related.extend(nested_select_related)
+            prefetch_related.extend(nested_prefetch_related)
+        elif is_many and (model_field.one_to_many or model_field.many_to_many):
+            nested_queryset = _optimize_queryset(related_model._default_manager.all(), nested_serializer)
+            prefetch_related.append(Prefetch(lookup, queryset=nested_queryset))
+
+    return select_related, prefetch_related
@@ -0,0 +1,48 @@
+from functools import reduce
+from operator import or_
+from typing import Callable, Iterable, Sequence
+
+from django.db import transaction
+from django.db.models import Model, Q
+
+
+def refresh_rollup_rows(model, unique_fields: Sequence[str], empty_rows: Iterable[Model], compute_rows: Callable[[], Iterable[Model]]) -> None:
+    """
+    Replaces the rows of a rollup table for a set of keys with freshly computed ones.
+
+    `empty_rows` holds one unsaved row per key to refresh, with its unique fields and any other required field set.
+    They are upserted first, which creates the missing rows and locks the existing ones until the end of the
+    transaction, so concurrent refreshes of a key run one after the other instead of failing on the unique constraint.
+    `compute_rows` is only called once the locks are held: under READ COMMITTED its queries see everything committed by
+    the refreshes it waited for, so no update is lost. The computed rows are upserted in turn and the keys left without
+    a computed row are deleted. Keys are locked in sorted order so that refreshes of overlapping keys cannot deadlock.
+
+    Args:
+        model: The rollup model.
+        unique_fields: The attribute names of the unique constraint identifying a row, e.g. ('profile_id', 'date').
+        empty_rows: One unsaved row per key to refresh.
+        compute_rows: Returns the unsaved rows of the keys that still have data.
+    """
+    # Unsaved rows may hold raw values, such as dates given as strings, so keys are compared in their Python form
+    key_fields = [model._meta.get_field(field) for field in unique_fields]
+
+    def get_key(row):
+        return tuple(field.to_python(getattr(row, field.attname)) for field in key_fields)
+
+    empty_rows = sorted({get_key(row): row for row in empty_rows}.values(), key=get_key)
+    if not empty_rows:
+        return
+    update_fields = [
+        field.name for field in model._meta.concrete_fields if not field.primary_key and field.attname not in unique_fields
+    ]
+
+    with transaction.atomic():
+        model.objects.bulk_create(empty_rows, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields)
+        rows = sorted(compute_rows(), key=get_key)
+        if rows:
+            model.objects.bulk_create(rows, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields)
+
+        computed_keys = {get_key(row) for row in rows}
+        empty_keys = [get_key(row) for row in empty_rows if get_key(row) not in computed_keys]
+        if empty_keys:
+            model.objects.filter(reduce(or_, (Q(**dict(zip(unique_fields, key))) for key in empty_keys))).delete()
@@ -0,0 +1,103 @@
+from django.db import connections
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.factories import UserProfileFactory
+from core.backends.postgresql_pool.base import DatabaseWrapper
+from core.backends.postgresql_pool.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, healthy=True):
+        self.closed = 0
+        self.healthy = healthy
+        self.transaction_status = 0
+
+    def cursor(self):
+        if not self.healthy:
+            raise Exception("server closed the connection unexpectedly")
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql):
+        pass
+
+    def get_transaction_status(self):
+        return self.transaction_status
+
+    def rollback(self):
+        self.transaction_status = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(max_size=2)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+        self.assertIs(pool.acquire(FakeConnection), first)
+        self.assertEqual(pool.stats()['connections_opened'], 1)
+
+    def test_unhealthy_and_expired_connections_are_replaced(self):
+        pool = ConnectionPool(max_size=2)
+        broken = pool.acquire(FakeConnection)
+        pool.release(broken)
+        broken.healthy = False
+        replacement = pool.acquire(FakeConnection)
+        self.assertIsNot(replacement, broken)
+        self.assertTrue(broken.closed)
+        self.assertEqual(pool.stats()['health_check_failures'], 1)
+
+        pool.release(replacement)
+        pool.max_lifetime = -1
+        self.assertIsNot(pool.acquire(FakeConnection), replacement)
+        self.assertTrue(replacement.closed)
+
+    def test_connections_left_in_a_transaction_are_rolled_back(self):
+        pool = ConnectionPool(max_size=1)
+        connection = pool.acquire(FakeConnection)
+        connection.transaction_status = 2
+        pool.release(connection)
+        self.assertEqual(connection.transaction_status, 0)
+        self.assertIs(pool.acquire(FakeConnection), connection)
+
+    def test_checkout_waits_for_a_free_connection(self):
+        pool = ConnectionPool(max_size=1, timeout=0.01)
+        connection = pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        stats = pool.stats()
+        self.assertEqual((stats['in_use'], stats['idle'], stats['timeouts']), (1, 0, 1))
+
+        pool.release(connection)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+
+class DatabasePoolStatsViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+
+    def test_pool_stats_for_staff(self):
+        self.assertIsInstance(connections["default"], DatabaseWrapper)
+        self.user_profile.user.is_staff = True
+        self.user_profile.user.save()
+        self.client.cookies["access"] = AccessToken.for_user(self.user_profile.user)
+        response = self.client.get(reverse("db-pool-stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('in_use', response.data['pools'][0])
+
+    def test_failed_pool_stats_for_non_staff(self):
+        self.client.cookies["access"] = AccessToken.for_user(self.user_profile.user)
+        response = self.client.get(reverse("db-pool-stats"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,29 @@
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.backends.postgresql_pool.base import get_pool_stats
+
+
+class DatabasePoolStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Returns the statistics of the database connection pools of the process that serves the request.
+
+        Every worker process has its own pools, so repeated calls can be answered by different workers.
+        """
+        return Response({'pools': get_pool_stats()}, status=status.HTTP_200_OK)
+
+
+def import_error_response(summary: dict, error: Exception) -> Response:
+    """
+    Returns the response of a bulk import that failed partway through.
+
+    Imports commit their batches as they go, so the summary of what was imported before the failure is returned along
+    with the error: 207 Multi-Status if some rows were created, 400 Bad Request if nothing was.
+    """
+    response_status = status.HTTP_207_MULTI_STATUS if summary['created'] else status.HTTP_400_BAD_REQUEST
+    return Response({**summary, "error": str(error)}, status=response_status)
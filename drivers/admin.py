@@ -1,8 +1,10 @@
 from django.contrib import admin
 
-from .models import Driver, DriverStartingShift
+from .models import Driver, DriverStartingShift, DriverShiftDailyRollup, ProfileShiftDailyRollup
 
 # Register your models here.
 
 admin.site.register(Driver)
 admin.site.register(DriverStartingShift)
+admin.site.register(DriverShiftDailyRollup)
+admin.site.register(ProfileShiftDailyRollup)
@@ -0,0 +1,98 @@
+"""
+Async versions of the driver endpoints that every driver app calls at the start of the day.
+
+DRF views are synchronous, so these are plain Django async views: served through fleetMaster/asgi.py, a request
+waiting on the database does not hold a worker. They authenticate with the same driver tokens as the DRF views, from
+the claims only, and use the async ORM methods for their queries.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.throttling import AnonRateThrottle
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .authentication import DriverJWTAuthentication, DriverPrincipal, DriverToken
+from .models import Driver, DriverStartingShift
+from .serializers import DriverShiftSubmissionSerializer
+from .services import OverdueFormsService
+
+
+def get_request_driver(request):
+    """Returns the DriverPrincipal of the request's driver access token, or None if it has no valid one."""
+    authentication = DriverJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+    if token.get('token_type') != DriverToken.token_type or token.get('driver_id') is None:
+        return None
+    return DriverPrincipal.from_token(token)
+
+
+class DriverAnonRateThrottle(AnonRateThrottle):
+    """
+    The anonymous rate the DRF driver views are throttled with, sharing their cache keys.
+
+    Driver tokens never authenticate a user, so `request.user` is not checked: its lazy session lookup cannot run in
+    an async view.
+    """
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class AsyncDriverView(View):
+    """Base view that only lets throttled requests with a driver access token through, and sets `request.driver`."""
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Like DRF views, driver endpoints are authenticated with tokens rather than session cookies
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.driver = get_request_driver(request)
+        if request.driver is None:
+            return JsonResponse({'detail': "Driver authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+        if not DriverAnonRateThrottle().allow_request(request, self):
+            return JsonResponse({'detail': "Request was throttled."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncDriverStartingShiftView(AsyncDriverView):
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return JsonResponse({'detail': "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            return JsonResponse({'detail': "Expected an object."}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = DriverShiftSubmissionSerializer(data=data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # The token is checked from its claims only, so its driver may have been deleted since it was issued. Like in the
+        # DRF view, this is checked before inserting rather than failing on the foreign key
+        if not await Driver.objects.filter(pk=request.driver.id).aexists():
+            return JsonResponse({'detail': "Driver not found"}, status=status.HTTP_401_UNAUTHORIZED)
+        shift = await DriverStartingShift.objects.acreate(driver_id=request.driver.id, **serializer.validated_data)
+        return JsonResponse(DriverShiftSubmissionSerializer(shift).data, status=status.HTTP_201_CREATED, encoder=DjangoJSONEncoder)
+
+
+class AsyncDriverOverdueFormsView(AsyncDriverView):
+    async def get(self, request):
+        """
+        Returns a list of dates in the last 30 days that don't have any entries in the table.
+        """
+        window = OverdueFormsService.get_window()
+        shift_dates = {date async for date in OverdueFormsService.get_shift_dates(request.driver.id, window)}
+        missing_dates = OverdueFormsService.get_missing_dates(window, shift_dates)
+        return JsonResponse({'missing_dates': missing_dates}, status=status.HTTP_200_OK, encoder=DjangoJSONEncoder)
@@ -2,14 +2,24 @@ import uuid
 from datetime import timedelta
 
 from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import Token
 from rest_framework_simplejwt.tokens import UntypedToken
 
 from drivers.models import Driver
 
 
+# Claims copied from the driver into its tokens, see DriverPrincipal
+DRIVER_CLAIMS = ('driver_id', 'first_name', 'last_name', 'profile_id', 'vehicle_id')
+
+# The rows cached behind DriverPrincipal are dropped when a driver changes, which every worker must see
+cache = ConnectionProxy(caches, 'shared')
+
+
 class DriverToken(Token):
     token_type = 'driver_access'  # Changed from 'driver' to match what's being set in for_driver
     lifetime = settings.SIMPLE_JWT.get("ACCESS_TOKEN_LIFETIME", timedelta(minutes=120))
@@ -21,6 +31,8 @@ class DriverToken(Token):
         token['driver_id'] = driver.id
         token['first_name'] = driver.first_name
         token['last_name'] = driver.last_name
+        token['profile_id'] = driver.profile_id
+        token['vehicle_id'] = driver.vehicle_id
         token['jti'] = uuid.uuid4().hex
 
         return token
@@ -42,14 +54,71 @@ class DriverRefreshToken(DriverToken):
 
         # Copy driver claims to the access token
         access['token_type'] = 'driver_access'
-        access['driver_id'] = self['driver_id']
-        access['first_name'] = self['first_name']
-        access['last_name'] = self['last_name']
+        for claim in DRIVER_CLAIMS:
+            if claim in self:
+                access[claim] = self[claim]
         access['jti'] = uuid.uuid4().hex
 
         return access
 
 
+class DriverPrincipal:
+    """
+    The driver of a request, built from the claims of its access token.
+
+    The claims (id, first_name, last_name, profile_id and vehicle_id) are available without any query. Any other
+    attribute loads the Driver row on first access, through a short-lived cache shared between workers, so views
+    that only need the claims never touch the database.
+    """
+    CACHE_KEY = 'drivers:driver:{id}'
+    CACHE_TIMEOUT = 60
+
+    def __init__(self, id, **claims):
+        self.id = id
+        self._driver = None
+        # Tokens issued before a claim was added miss it, the attribute is then loaded lazily
+        for name, value in claims.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_token(cls, token):
+        claims = {claim: token[claim] for claim in DRIVER_CLAIMS[1:] if claim in token}
+        return cls(token['driver_id'], **claims)
+
+    @property
+    def pk(self):
+        return self.id
+
+    @classmethod
+    def invalidate(cls, driver_id):
+        cache.delete(cls.CACHE_KEY.format(id=driver_id))
+
+    def get_driver(self):
+        """
+        Returns the Driver row of this principal, loading it on first access.
+
+        Raises:
+            Driver.DoesNotExist: If the driver was deleted after its token was issued.
+        """
+        if self._driver is None:
+            cache_key = self.CACHE_KEY.format(id=self.id)
+            driver = cache.get(cache_key)
+            if driver is None:
+                driver = Driver.objects.get(pk=self.id)
+                cache.set(cache_key, driver, timeout=self.CACHE_TIMEOUT)
+            self._driver = driver
+        return self._driver
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not claims
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get_driver(), name)
+
+    def __str__(self):
+        return f'{self.first_name} {self.last_name}'
+
+
 class DriverJWTAuthentication(JWTAuthentication):
     """
     Authentication backend that validates driver-specific JWT tokens
@@ -58,33 +127,30 @@ class DriverJWTAuthentication(JWTAuthentication):
     def get_validated_token(self, raw_token):
         """
         Validates a token and returns it
+
+        The token is decoded and its signature verified once, then it is routed on its token_type claim: driver access
+        tokens are returned as they are, and admin/manager tokens are checked against the configured token classes
+        without verifying their signature a second time.
         """
         try:
-            # First try normal validation (for admin/manager tokens)
-            return super().get_validated_token(raw_token)
-        except InvalidToken:
-            # If normal validation fails, try driver token validation
-            try:
-                return self.validate_driver_token(raw_token)
-            except Exception as e:
-                # Re-raise as InvalidToken to maintain the expected exception type
-                raise InvalidToken('Token is not valid') from e
-
-    def validate_driver_token(self, raw_token):
-        """
-        Validates a driver token
-        """
-        try:
-            # Use UntypedToken to parse and validate the token without type checking
             token = UntypedToken(raw_token)
+        except TokenError as e:
+            raise InvalidToken('Token is not valid') from e
 
-            # Check if it's a driver token
-            if token.get('token_type') != 'driver_access':
-                raise InvalidToken('Token is not a valid driver token')
-
+        token_type = token.get(api_settings.TOKEN_TYPE_CLAIM)
+        if token_type == DriverToken.token_type:
             return token
-        except Exception as e:
-            raise InvalidToken('Failed to validate driver token') from e
+
+        for AuthToken in api_settings.AUTH_TOKEN_CLASSES:
+            if token_type == AuthToken.token_type:
+                try:
+                    validated_token = AuthToken(raw_token, verify=False)
+                    validated_token.verify()
+                    return validated_token
+                except TokenError as e:
+                    raise InvalidToken('Token is not valid') from e
+
+        raise InvalidToken('Token is not valid')
 
     def get_user(self, validated_token):
         """
@@ -114,13 +180,11 @@ class DriverJWTAuthentication(JWTAuthentication):
 
         # For driver tokens, set driver info on the request but return None for user
         if validated_token.get('token_type') == 'driver_access':
-            try:
-                driver_id = validated_token.get('driver_id')
-                driver = Driver.objects.get(pk=driver_id)
-                request.driver = driver
-                return None, validated_token
-            except Driver.DoesNotExist:
+            if validated_token.get('driver_id') is None:
                 raise AuthenticationFailed('Driver not found')
+            # The driver is built from the token claims, its row is only loaded if a view needs more than that
+            request.driver = DriverPrincipal.from_token(validated_token)
+            return None, validated_token
 
         # For regular tokens, return the user
         return self.get_user(validated_token), validated_token
@@ -0,0 +1,50 @@
+from timeit import timeit
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import UntypedToken
+
+from drivers.authentication import DriverToken, DriverJWTAuthentication
+
+
+def legacy_get_validated_token(authentication, raw_token):
+    """The previous validation path: standard validation first, then a second decode as a driver token."""
+    try:
+        return JWTAuthentication.get_validated_token(authentication, raw_token)
+    except InvalidToken:
+        try:
+            token = UntypedToken(raw_token)
+            if token.get('token_type') != 'driver_access':
+                raise InvalidToken('Token is not a valid driver token')
+            return token
+        except Exception as e:
+            raise InvalidToken('Token is not valid') from e
+
+
+class Command(BaseCommand):
+    help = "Measures the per-request overhead of authenticating a driver token, with the previous and the single-decode validation paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10000, help="Number of authentications measured for each path.")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        # Only the claims are needed to sign a token, so the benchmark does not touch the database
+        driver = SimpleNamespace(id=1, first_name='Bench', last_name='Driver', profile_id=1, vehicle_id=1)
+        raw_token = str(DriverToken.for_driver(driver)).encode()
+        authentication = DriverJWTAuthentication()
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {raw_token.decode()}')
+
+        timings = {
+            'token validation, previous path': timeit(lambda: legacy_get_validated_token(authentication, raw_token), number=iterations),
+            'token validation, single decode': timeit(lambda: authentication.get_validated_token(raw_token), number=iterations),
+            'full authenticate(), single decode': timeit(lambda: authentication.authenticate(request), number=iterations),
+        }
+        for label, seconds in timings.items():
+            self.stdout.write(f"{label:<36} {seconds / iterations * 1e6:8.1f} µs/request")
+
+        before, after = timings['token validation, previous path'], timings['token validation, single decode']
+        self.stdout.write(self.style.SUCCESS(f"Single decode is {before / after:.2f}x faster than the previous path."))
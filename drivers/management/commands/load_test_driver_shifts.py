@@ -0,0 +1,65 @@
+import asyncio
+import time
+from statistics import quantiles
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.throttling import SimpleRateThrottle
+
+from drivers.authentication import DriverRefreshToken
+from drivers.models import Driver, DriverStartingShift
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends concurrent starting shift submissions for a driver through the ASGI handler, to the sync and to the async "
+        "endpoint, and reports the throughput and latency of each path within this single process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('driver_id', type=int, help="Driver the test shifts are submitted for, they are deleted afterwards.")
+        parser.add_argument('--requests', type=int, default=200, help="Number of submissions sent to each endpoint.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Number of submissions in flight at the same time.")
+
+    def handle(self, *args, **options):
+        try:
+            driver = Driver.objects.get(pk=options['driver_id'])
+        except Driver.DoesNotExist:
+            raise CommandError(f"Driver {options['driver_id']} does not exist.")
+        token = str(DriverRefreshToken.for_driver(driver).access_token)
+
+        for label, url_name in (('sync', 'starting-shift'), ('async', 'async-starting-shift')):
+            # Every submission comes from the same address, so the anonymous rate limit would reject nearly all of them
+            with mock.patch.object(SimpleRateThrottle, 'allow_request', return_value=True):
+                elapsed, latencies, shift_ids = asyncio.run(self.submit_shifts(reverse(url_name), token, options['requests'], options['concurrency']))
+            DriverStartingShift.objects.filter(pk__in=shift_ids).delete()
+            if len(shift_ids) != options['requests']:
+                raise CommandError(f"{options['requests'] - len(shift_ids)} {label} submissions failed.")
+
+            p50, p95 = (quantiles(latencies, n=100)[index] * 1000 for index in (49, 94))
+            self.stdout.write(
+                f"{label:<6} {options['requests'] / elapsed:8.1f} submissions/s   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms"
+                f"   ({options['requests']} submissions, concurrency {options['concurrency']})"
+            )
+
+    @staticmethod
+    async def submit_shifts(url, token, requests, concurrency):
+        # The requests go through the ASGI handler of this process, for a host that ALLOWED_HOSTS accepts
+        client = AsyncClient(server=('localhost', '80'))
+        headers = {'authorization': f'Bearer {token}'}
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, shift_ids = [], []
+
+        async def submit(index):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, {'time': '08:00', 'load': index, 'mileage': index}, content_type='application/json', headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code == 201:
+                    shift_ids.append(response.json()['id'])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(submit(index) for index in range(requests)))
+        return time.perf_counter() - started, latencies, shift_ids
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from drivers.services import ShiftRollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily driver and profile shift rollups from scratch."
+
+    def handle(self, *args, **options):
+        driver_rows, profile_rows = ShiftRollupService.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {driver_rows} driver and {profile_rows} profile shift rollup rows."))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0004_driverstartingshift_delete_driverresponse'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driverstartingshift',
+            index=models.Index(fields=['driver', '-date', '-id'], name='shift_driver_date_idx'),
+        ),
+    ]
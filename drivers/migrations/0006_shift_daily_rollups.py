@@ -0,0 +1,57 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('vehicles', '0002_vehicle_indexes'),
+        ('drivers', '0005_driverstartingshift_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileShiftDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('driver_count', models.PositiveIntegerField(default=0)),
+                ('shift_count', models.PositiveIntegerField(default=0)),
+                ('absence_count', models.PositiveIntegerField(default=0)),
+                ('total_load', models.BigIntegerField(default=0)),
+                ('mileage_delta', models.BigIntegerField(default=0)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_rollups', to='accounts.userprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DriverShiftDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('shift_count', models.PositiveIntegerField(default=0)),
+                ('absence_count', models.PositiveIntegerField(default=0)),
+                ('total_load', models.BigIntegerField(default=0)),
+                ('start_mileage', models.PositiveIntegerField(default=0)),
+                ('end_mileage', models.PositiveIntegerField(default=0)),
+                ('mileage_delta', models.PositiveIntegerField(default=0)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_rollups', to='drivers.driver')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='driver_shift_rollups', to='accounts.userprofile')),
+                ('vehicle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='vehicles.vehicle')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='profileshiftdailyrollup',
+            constraint=models.UniqueConstraint(fields=('profile', 'date'), name='unique_profile_shift_daily_rollup'),
+        ),
+        migrations.AddIndex(
+            model_name='drivershiftdailyrollup',
+            index=models.Index(fields=['profile', 'date'], name='driver_rollup_profile_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='drivershiftdailyrollup',
+            constraint=models.UniqueConstraint(fields=('driver', 'date'), name='unique_driver_shift_daily_rollup'),
+        ),
+    ]
@@ -1,11 +1,14 @@
 import datetime
 import random
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
 
 from accounts.models import UserProfile
 
 
+ACCESS_CODE_CHARS = "23456789ABCDEFGHJKLMNPQRSTUVWXYZ"
+
+
 class EmploymentStatusChoices(models.TextChoices):
     ACTIVE = "ACTIVE", "Active"
     INACTIVE = "INACTIVE", "Inactive"
@@ -46,19 +49,64 @@ class Driver(models.Model):
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
 
-    def generate_access_code(self):
-        """Generate a unique 6-character access code for the driver."""
+    @staticmethod
+    def build_access_code():
+        """Build a random 6-character access code followed by its checksum digit."""
 
         def calculate_checksum(code):
             return str(sum(ord(c) for c in code) % 10)
 
-        chars = "23456789ABCDEFGHJKLMNPQRSTUVWXYZ"
-        while True:
-            code = "".join(random.choices(chars, k=6))
-            checksum = calculate_checksum(code)
-            full_code = f'{code}-{checksum}'
-            if not Driver.objects.filter(access_code=full_code).exists():
-                return full_code
+        code = "".join(random.choices(ACCESS_CODE_CHARS, k=6))
+        checksum = calculate_checksum(code)
+        return f'{code}-{checksum}'
+
+    @classmethod
+    def allocate_access_codes(cls, count, exclude=()):
+        """
+        Allocate `count` distinct access codes that no driver uses yet.
+
+        Every round generates the missing candidates and checks all of them with a single `IN` query, so only the
+        collisions are retried. Another transaction can still take a code before it is saved: the unique constraint
+        on `access_code` catches that, see `bulk_create_with_access_codes`.
+        """
+        exclude = set(exclude)
+        codes = set()
+        while len(codes) < count:
+            candidates = {cls.build_access_code() for _ in range(count - len(codes))} - codes - exclude
+            taken = set(cls.objects.filter(access_code__in=candidates).values_list('access_code', flat=True))
+            codes |= candidates - taken
+        return list(codes)
+
+    @classmethod
+    def bulk_create_with_access_codes(cls, drivers, batch_size=1000, max_attempts=3):
+        """
+        Insert the given drivers with `bulk_create`, allocating the missing access codes in batch.
+
+        If a concurrent transaction took one of the allocated codes, the insert fails on the unique constraint: the
+        colliding codes are then replaced and the insert is retried. Integrity errors that are not caused by access
+        codes are raised as they are.
+        """
+        drivers_without_code = [driver for driver in drivers if not driver.access_code]
+        for driver, access_code in zip(drivers_without_code, cls.allocate_access_codes(len(drivers_without_code))):
+            driver.access_code = access_code
+
+        for attempt in range(1, max_attempts + 1):
+            try:
+                with transaction.atomic():
+                    return cls.objects.bulk_create(drivers, batch_size=batch_size)
+            except IntegrityError:
+                codes = [driver.access_code for driver in drivers]
+                taken = set(cls.objects.filter(access_code__in=codes).values_list('access_code', flat=True))
+                if not taken or attempt == max_attempts:
+                    raise
+                replacements = iter(cls.allocate_access_codes(len(taken), exclude=codes))
+                for driver in drivers:
+                    if driver.access_code in taken:
+                        driver.access_code = next(replacements)
+
+    def generate_access_code(self):
+        """Generate a unique 6-character access code for the driver."""
+        return self.allocate_access_codes(1)[0]
 
     def save(self, *args, **kwargs):
         if not self.access_code:
@@ -76,5 +124,60 @@ class DriverStartingShift(models.Model):
     absence_type = models.CharField(max_length=100, choices=AbsenceChoices.choices, blank=True, null=True)
     absence_description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Shifts of a driver, newest first
+            models.Index(fields=['driver', '-date', '-id'], name='shift_driver_date_idx'),
+        ]
+
     def __str__(self):
         return f'{self.driver.first_name} {self.driver.last_name} - {self.date} - {self.time}'
+
+
+class DriverShiftDailyRollup(models.Model):
+    """
+    Daily starting shift totals per driver.
+
+    Rows are derived from DriverStartingShift and kept up to date by the handlers in drivers/signals.py, so utilization
+    analytics read one row per driver and day instead of the raw shifts. `vehicle` is the vehicle the driver had when
+    the day was last rolled up. `mileage_delta` is the distance driven since the driver's previous shift day, 0 for
+    the first one. The `rebuild_shift_rollups` management command rebuilds the table from scratch.
+    """
+    profile = models.ForeignKey("accounts.UserProfile", on_delete=models.CASCADE, related_name='driver_shift_rollups')
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='shift_rollups')
+    vehicle = models.ForeignKey("vehicles.Vehicle", on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    date = models.DateField()
+    shift_count = models.PositiveIntegerField(default=0)
+    absence_count = models.PositiveIntegerField(default=0)
+    total_load = models.BigIntegerField(default=0)
+    start_mileage = models.PositiveIntegerField(default=0)
+    end_mileage = models.PositiveIntegerField(default=0)
+    mileage_delta = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='unique_driver_shift_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['profile', 'date'], name='driver_rollup_profile_date_idx'),
+        ]
+
+
+class ProfileShiftDailyRollup(models.Model):
+    """
+    Daily starting shift totals per profile, aggregated from its DriverShiftDailyRollup rows.
+
+    `driver_count` is the number of drivers with at least one shift that day.
+    """
+    profile = models.ForeignKey("accounts.UserProfile", on_delete=models.CASCADE, related_name='shift_rollups')
+    date = models.DateField()
+    driver_count = models.PositiveIntegerField(default=0)
+    shift_count = models.PositiveIntegerField(default=0)
+    absence_count = models.PositiveIntegerField(default=0)
+    total_load = models.BigIntegerField(default=0)
+    mileage_delta = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'date'], name='unique_profile_shift_daily_rollup'),
+        ]
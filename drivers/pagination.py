@@ -1,6 +1,19 @@
 from rest_framework.pagination import PageNumberPagination
 
+from core.pagination import CustomCursorPagination
+
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'pageSize'
     max_page_size = 20
+
+
+class ShiftCursorPagination(CustomCursorPagination):
+    # The cursor is keyed on the date, pk only orders the few shifts a driver has on the same day
+    ordering = ('-date', '-pk')
+
+
+def get_paginator(request, cursor_pagination_class=CustomCursorPagination):
+    if request.query_params.get('pagination') == 'cursor':
+        return cursor_pagination_class()
+    return CustomPageNumberPagination()
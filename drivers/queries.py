@@ -0,0 +1,19 @@
+# One row per driver of a profile with a string of '0' and '1' per day of the window, '1' marking the days
+# without a starting shift. The shift days of the window are collected once and anti-joined with the day series.
+MISSING_SHIFTS_QUERY = """
+                       WITH shift_days AS (SELECT DISTINCT shift.driver_id, shift.date
+                                           FROM drivers_driverstartingshift shift
+                                                    JOIN drivers_driver driver ON driver.id = shift.driver_id
+                                           WHERE driver.profile_id = %(profile_id)s
+                                             AND shift.date BETWEEN %(start_date)s AND %(end_date)s)
+                       SELECT driver.id,
+                              driver.first_name,
+                              driver.last_name,
+                              string_agg(CASE WHEN shift_days.driver_id IS NULL THEN '1' ELSE '0' END, '' ORDER BY day.date) AS missing
+                       FROM drivers_driver driver
+                                CROSS JOIN (SELECT generate_series(%(start_date)s::date, %(end_date)s::date, INTERVAL '1 day')::date AS date) day
+                                LEFT JOIN shift_days ON shift_days.driver_id = driver.id AND shift_days.date = day.date
+                       WHERE driver.profile_id = %(profile_id)s
+                       GROUP BY driver.id, driver.first_name, driver.last_name
+                       ORDER BY driver.id
+                       """
@@ -1,9 +1,27 @@
+from django.db.models import Q
 from rest_framework import serializers
 
 from vehicles.serializers import VehicleSerializer
 from .models import Driver, DriverStartingShift
 
 
+class DriverListSerializer(serializers.ListSerializer):
+    """Creates a list of drivers with one bulk insert and batch-allocated access codes."""
+    UNIQUE_FIELDS = ('license_number', 'phone_number', 'email')
+
+    def validate(self, attrs):
+        # Each driver is only checked against the database, so duplicates inside the list are caught here
+        for field in self.UNIQUE_FIELDS:
+            values = [item.get(field) for item in attrs if item.get(field) not in (None, '')]
+            if len(values) != len(set(values)):
+                raise serializers.ValidationError(f"Several drivers in the list have the same {field.replace('_', ' ')}")
+        return attrs
+
+    def create(self, validated_data):
+        profile = self.context['request'].user.userprofile
+        return Driver.bulk_create_with_access_codes([Driver(profile=profile, **item) for item in validated_data])
+
+
 class DriverSerializer(serializers.ModelSerializer):
     vehicle_details = VehicleSerializer(source='vehicle', read_only=True)
     access_code = serializers.CharField(read_only=True)
@@ -34,6 +52,7 @@ class DriverSerializer(serializers.ModelSerializer):
             "access_code",
         ]
         read_only_fields = ['profile']
+        list_serializer_class = DriverListSerializer
 
     def create(self, validated_data):
         profile = self.context['request'].user.userprofile
@@ -47,27 +66,57 @@ class DriverSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         data = super().validate(attrs)
-        for field in ['license_expiry_date', 'date_of_birth', 'hire_date']:
+        for field in ['license_expiry_date', 'date_of_birth', 'hire_date', 'license_number', 'phone_number']:
             field_value = data.get(field, None)
             if field_value is None:
                 raise serializers.ValidationError(f"{field.replace('_', ' ').capitalize()} can't be empty")
 
-        for field in ['license_number', 'phone_number', 'email']:
-            field_value = data.get(field, None)
-            if field_value is None and field != 'email':
-                raise serializers.ValidationError(f"{field.replace('_', ' ').capitalize()} can't be empty")
-
-            existing_driver_query = Driver.objects.filter(**{field: field_value})
-            if self.instance:
-                existing_driver_query = existing_driver_query.exclude(pk=self.instance.pk)
+        # The three unique fields are checked with a single query, empty emails are not compared
+        lookups = Q()
+        for field in DriverListSerializer.UNIQUE_FIELDS:
+            if data.get(field) not in (None, ''):
+                lookups |= Q(**{field: data[field]})
+        existing_drivers = Driver.objects.filter(lookups)
+        if self.instance:
+            existing_drivers = existing_drivers.exclude(pk=self.instance.pk)
 
-            if existing_driver_query:
+        existing_values = list(existing_drivers.values_list(*DriverListSerializer.UNIQUE_FIELDS))
+        for index, field in enumerate(DriverListSerializer.UNIQUE_FIELDS):
+            if any(data.get(field) not in (None, '') and values[index] == data[field] for values in existing_values):
                 raise serializers.ValidationError(f"A driver with this {field.replace('_', ' ')} already exists")
 
         return data
 
 
+class DriverImportSerializer(serializers.ModelSerializer):
+    """
+    Validates a driver of a bulk import without touching the database.
+
+    The uniqueness of the license number, phone number and email and the vehicle id are checked by the import service
+    for a whole batch at once instead of with one query per unique field and row.
+    """
+    vehicle = serializers.IntegerField(source='vehicle_id', required=False, allow_null=True)
+
+    class Meta:
+        model = Driver
+        fields = [field for field in DriverSerializer.Meta.fields if field not in ('id', 'vehicle_details', 'access_code')]
+        extra_kwargs = {
+            'license_number': {'validators': []},
+            'phone_number': {'validators': []},
+            'license_expiry_date': {'required': True},
+            'date_of_birth': {'required': True},
+            'hire_date': {'required': True},
+        }
+
+
 class DriverStartingShiftSerializer(serializers.ModelSerializer):
     class Meta:
         model = DriverStartingShift
         fields = "__all__"
+
+
+class DriverShiftSubmissionSerializer(DriverStartingShiftSerializer):
+    """Validates a shift of the request's driver without touching the database, the driver being set from its token."""
+
+    class Meta(DriverStartingShiftSerializer.Meta):
+        read_only_fields = ['driver']
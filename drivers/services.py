@@ -0,0 +1,286 @@
+import csv
+import json
+from datetime import datetime, timedelta
+from functools import reduce
+from itertools import islice
+from operator import or_
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery, Sum
+
+from core.rollups import refresh_rollup_rows
+from vehicles.models import Vehicle
+from .models import Driver, DriverStartingShift, DriverShiftDailyRollup, ProfileShiftDailyRollup
+from .serializers import DriverImportSerializer, DriverListSerializer
+
+
+class DriverImportService:
+    """
+    Imports a roster of drivers for a profile from a CSV or JSON file.
+
+    Rows are handled in batches. Each batch is validated without per-row queries, checked for drivers that already
+    use one of its license numbers, phone numbers or emails with a single query, and its vehicles are resolved with
+    another one. The valid drivers are then inserted with one `bulk_create` and access codes allocated in batch.
+    Invalid rows are reported instead of aborting the import.
+    """
+    BATCH_SIZE = 500
+    MAX_REPORTED_ERRORS = 1000
+    UNIQUE_FIELDS = DriverListSerializer.UNIQUE_FIELDS
+
+    def __init__(self, profile, batch_size: int = BATCH_SIZE):
+        self.profile = profile
+        self.batch_size = batch_size
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        # Values of the drivers imported so far, to catch duplicates across batches of the same file
+        self.imported_values = {field: set() for field in self.UNIQUE_FIELDS}
+
+    def import_json(self, text_file) -> dict:
+        rows = json.load(text_file)
+        if not isinstance(rows, list):
+            raise ValueError("The JSON file must contain a list of drivers.")
+        return self.import_rows(enumerate(rows, start=1))
+
+    def import_csv(self, text_file) -> dict:
+        reader = csv.DictReader(text_file)
+        # Empty cells are treated as missing values so that optional columns fall back to their defaults
+        rows = ((reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}) for row in reader)
+        return self.import_rows(rows)
+
+    def import_rows(self, rows) -> dict:
+        """
+        Imports `(row, data)` pairs and returns a summary of the import.
+
+        Batches that were inserted stay inserted if a later one fails.
+        """
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            self.import_batch(batch)
+
+        return self.get_summary()
+
+    def get_summary(self) -> dict:
+        """Returns what was imported so far, which is also what stays imported if a later batch fails."""
+        return {"created": self.created, "error_count": self.error_count, "errors": self.errors}
+
+    def import_batch(self, batch):
+        validated_rows = []
+        for line, data in batch:
+            serializer = DriverImportSerializer(data=data)
+            if serializer.is_valid():
+                validated_rows.append((line, serializer.validated_data))
+            else:
+                self.add_error(line, serializer.errors)
+
+        vehicle_ids = set(
+            Vehicle.objects.filter(profile=self.profile, pk__in={data['vehicle_id'] for _, data in validated_rows if data.get('vehicle_id')})
+            .values_list('pk', flat=True)
+        )
+        existing_values = self.get_existing_values(validated_rows)
+
+        drivers = []
+        for line, data in validated_rows:
+            errors = {}
+            if data.get('vehicle_id') is not None and data['vehicle_id'] not in vehicle_ids:
+                errors['vehicle'] = ["Vehicle does not exist."]
+            for field in self.UNIQUE_FIELDS:
+                value = self.get_unique_value(data, field)
+                if value is None:
+                    continue
+                if value in existing_values[field]:
+                    errors[field] = [f"A driver with this {field.replace('_', ' ')} already exists."]
+                elif value in self.imported_values[field]:
+                    errors[field] = [f"Several drivers in the file have the same {field.replace('_', ' ')}."]
+            if errors:
+                self.add_error(line, errors)
+                continue
+
+            for field in self.UNIQUE_FIELDS:
+                if self.get_unique_value(data, field) is not None:
+                    self.imported_values[field].add(data[field])
+            drivers.append(Driver(profile=self.profile, **data))
+
+        if drivers:
+            Driver.bulk_create_with_access_codes(drivers, batch_size=self.batch_size)
+        self.created += len(drivers)
+
+    def get_existing_values(self, validated_rows) -> dict:
+        """Returns the license numbers, phone numbers and emails of the batch that existing drivers already use."""
+        existing_values = {field: set() for field in self.UNIQUE_FIELDS}
+        lookups = Q()
+        for field in self.UNIQUE_FIELDS:
+            values = {data[field] for _, data in validated_rows if self.get_unique_value(data, field) is not None}
+            if values:
+                lookups |= Q(**{f'{field}__in': values})
+        if not lookups:
+            return existing_values
+
+        for values in Driver.objects.filter(lookups).values_list(*self.UNIQUE_FIELDS):
+            for field, value in zip(self.UNIQUE_FIELDS, values):
+                existing_values[field].add(value)
+        return existing_values
+
+    @staticmethod
+    def get_unique_value(data, field):
+        """Returns the value of a unique field, or None if it is missing or blank since blank emails are not unique."""
+        value = data.get(field)
+        return None if value in (None, '') else value
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "errors": errors})
+
+
+# A bucket is the key of a DriverShiftDailyRollup row: (driver_id, date)
+Bucket = tuple[int, object]
+
+
+class ShiftRollupService:
+    @staticmethod
+    def aggregate_shifts(filters: Optional[Q] = None):
+        """
+        Aggregates starting shifts into one row per driver and day.
+
+        Args:
+            filters: Optional filters applied to the shifts before grouping.
+
+        Returns:
+            QuerySet of dictionaries with the keys of DriverShiftDailyRollup, `previous_mileage` (the highest mileage of
+            the driver's previous shift day) instead of `mileage_delta`.
+        """
+        shifts = DriverStartingShift.objects.all()
+        if filters is not None:
+            shifts = shifts.filter(filters)
+        previous_mileage = (
+            DriverStartingShift.objects.filter(driver_id=OuterRef('driver_id'), date__lt=OuterRef('date'))
+            .order_by('-date', '-mileage').values('mileage')[:1]
+        )
+        return (
+            shifts
+            .values('driver_id', 'date')
+            .annotate(
+                profile_id=F('driver__profile_id'),
+                vehicle_id=F('driver__vehicle_id'),
+                shift_count=Count('id'),
+                absence_count=Count('id', filter=Q(absence_type__isnull=False) & ~Q(absence_type='')),
+                total_load=Sum('load'),
+                start_mileage=Min('mileage'),
+                end_mileage=Max('mileage'),
+                previous_mileage=Subquery(previous_mileage),
+            )
+            .order_by()
+        )
+
+    @staticmethod
+    def build_driver_rollup(row: dict) -> DriverShiftDailyRollup:
+        row = dict(row)
+        previous_mileage = row.pop('previous_mileage')
+        # A first shift day or an odometer that went backwards does not count as distance driven
+        mileage_delta = max(row['end_mileage'] - previous_mileage, 0) if previous_mileage is not None else 0
+        return DriverShiftDailyRollup(mileage_delta=mileage_delta, **row)
+
+    @staticmethod
+    def aggregate_driver_rollups(filters: Optional[Q] = None):
+        """Aggregates driver rollups into one row per profile and day, with the keys of ProfileShiftDailyRollup."""
+        rollups = DriverShiftDailyRollup.objects.all()
+        if filters is not None:
+            rollups = rollups.filter(filters)
+        return (
+            rollups
+            .values('profile_id', 'date')
+            .annotate(
+                driver_count=Count('id'),
+                shift_count=Sum('shift_count'),
+                absence_count=Sum('absence_count'),
+                total_load=Sum('total_load'),
+                mileage_delta=Sum('mileage_delta'),
+            )
+            .order_by()
+        )
+
+    @staticmethod
+    def refresh_days(buckets: Iterable[Bucket]) -> None:
+        """
+        Recomputes the rollups of the given driver days, and of the profile days they belong to, from the live shifts.
+
+        The mileage delta of a day depends on the driver's previous shift day, so the next shift day of each bucket
+        is refreshed as well. Driver days that no longer have any shift are removed. Both kinds of rows are locked
+        before they are aggregated, see `refresh_rollup_rows`: the drivers of a profile starting their shifts at the
+        same time wait for each other on the profile day instead of failing on its unique constraint or overwriting
+        each other's totals.
+        """
+        buckets = set(buckets)
+        for driver_id, date in list(buckets):
+            next_date = DriverStartingShift.objects.filter(driver_id=driver_id, date__gt=date).order_by('date').values_list('date', flat=True).first()
+            if next_date:
+                buckets.add((driver_id, next_date))
+        if not buckets:
+            return
+
+        bucket_filters = reduce(or_, (Q(driver_id=driver_id, date=date) for driver_id, date in buckets))
+        with transaction.atomic():
+            driver_profiles = dict(Driver.objects.filter(pk__in={driver_id for driver_id, _ in buckets}).values_list('pk', 'profile_id'))
+            profile_days = {(driver_profiles[driver_id], date) for driver_id, date in buckets if driver_id in driver_profiles}
+            deleted_driver_days = [(driver_id, date) for driver_id, date in buckets if driver_id not in driver_profiles]
+            if deleted_driver_days:
+                # The rollups of a deleted driver may still be there when its shifts are deleted before them
+                stale_rollups = DriverShiftDailyRollup.objects.filter(reduce(or_, (Q(driver_id=driver_id, date=date) for driver_id, date in deleted_driver_days)))
+                profile_days |= set(stale_rollups.values_list('profile_id', 'date'))
+                stale_rollups.delete()
+
+            refresh_rollup_rows(
+                DriverShiftDailyRollup,
+                unique_fields=('driver_id', 'date'),
+                empty_rows=[
+                    DriverShiftDailyRollup(driver_id=driver_id, date=date, profile_id=driver_profiles[driver_id])
+                    for driver_id, date in buckets if driver_id in driver_profiles
+                ],
+                compute_rows=lambda: [ShiftRollupService.build_driver_rollup(row) for row in ShiftRollupService.aggregate_shifts(bucket_filters)],
+            )
+            if profile_days:
+                profile_filters = reduce(or_, (Q(profile_id=profile_id, date=date) for profile_id, date in profile_days))
+                refresh_rollup_rows(
+                    ProfileShiftDailyRollup,
+                    unique_fields=('profile_id', 'date'),
+                    empty_rows=[ProfileShiftDailyRollup(profile_id=profile_id, date=date) for profile_id, date in profile_days],
+                    compute_rows=lambda: [ProfileShiftDailyRollup(**row) for row in ShiftRollupService.aggregate_driver_rollups(profile_filters)],
+                )
+
+    @staticmethod
+    def rebuild() -> tuple[int, int]:
+        """Rebuilds both rollup tables from the live shifts and returns the number of driver and profile rows created."""
+        driver_rollups = [ShiftRollupService.build_driver_rollup(row) for row in ShiftRollupService.aggregate_shifts().iterator()]
+        with transaction.atomic():
+            DriverShiftDailyRollup.objects.all().delete()
+            DriverShiftDailyRollup.objects.bulk_create(driver_rollups, batch_size=1000)
+            profile_rollups = [ProfileShiftDailyRollup(**row) for row in ShiftRollupService.aggregate_driver_rollups().iterator()]
+            ProfileShiftDailyRollup.objects.all().delete()
+            ProfileShiftDailyRollup.objects.bulk_create(profile_rollups, batch_size=1000)
+        return len(driver_rollups), len(profile_rollups)
+
+
+class OverdueFormsService:
+    """Finds the days of the last 30 on which a driver did not submit a starting shift, for the sync and async views."""
+    DAYS = 30
+
+    @classmethod
+    def get_window(cls) -> list:
+        """Returns the dates of the last 30 days, today included, in ascending order."""
+        start_date = datetime.now().date() - timedelta(days=cls.DAYS - 1)
+        return [start_date + timedelta(days=i) for i in range(cls.DAYS)]
+
+    @staticmethod
+    def get_shift_dates(driver_id: int, window: list):
+        """Returns a queryset of the distinct dates of the window on which the driver submitted a shift."""
+        return DriverStartingShift.objects.filter(
+            driver_id=driver_id, date__gte=window[0], date__lte=window[-1]
+        ).values_list('date', flat=True).distinct()
+
+    @staticmethod
+    def get_missing_dates(window: list, shift_dates: Iterable) -> list:
+        """Returns the dates of the window that are not in `shift_dates`."""
+        shift_dates = set(shift_dates)
+        return [date for date in window if date not in shift_dates]
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import DriverPrincipal
+from .models import Driver, DriverStartingShift
+from .services import ShiftRollupService
+
+
+# Drop the cached row behind DriverPrincipal so that views see the updated driver
+@receiver(post_save, sender=Driver)
+@receiver(post_delete, sender=Driver)
+def invalidate_cached_driver(sender, instance, **kwargs):
+    DriverPrincipal.invalidate(instance.id)
+
+
+# Remember the driver day a shift belonged to before it is updated
+@receiver(pre_save, sender=DriverStartingShift)
+def remember_previous_shift_day(sender, instance, **kwargs):
+    instance._previous_rollup_bucket = None
+    if instance.pk is not None:
+        instance._previous_rollup_bucket = DriverStartingShift.objects.filter(pk=instance.pk).values_list('driver_id', 'date').first()
+
+
+# Keep the daily shift rollups in sync with the saved shift
+@receiver(post_save, sender=DriverStartingShift)
+def update_shift_rollup_on_save(sender, instance, **kwargs):
+    buckets = {(instance.driver_id, instance.date)}
+    previous_bucket = getattr(instance, '_previous_rollup_bucket', None)
+    if previous_bucket:
+        buckets.add(previous_bucket)
+    ShiftRollupService.refresh_days(buckets)
+
+
+@receiver(post_delete, sender=DriverStartingShift)
+def update_shift_rollup_on_delete(sender, instance, **kwargs):
+    ShiftRollupService.refresh_days({(instance.driver_id, instance.date)})
@@ -1,23 +1,37 @@
+import csv
+import json
 import re
+import threading
+from contextlib import contextmanager
 from datetime import timedelta, datetime, date
+from io import StringIO
 from random import choice
+from unittest import skipUnless
 from unittest.mock import patch
 
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from factory import LazyAttribute
 from factory import Sequence
 from rest_framework import status
 from rest_framework.test import APITestCase
-from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
 from accounts.factories import UserProfileFactory, UserProfile
 from vehicles.factories import VehicleFactory
 from vehicles.models import Vehicle
-from .authentication import DriverRefreshToken
+from .authentication import DriverRefreshToken, DriverPrincipal, DriverJWTAuthentication
 from .factories import DriverFactory, DriverStartingShiftFactory
-from .models import Driver, EmploymentStatusChoices, DriverStartingShift
+from .models import Driver, EmploymentStatusChoices, DriverStartingShift, DriverShiftDailyRollup, ProfileShiftDailyRollup
 from .serializers import DriverSerializer
+from .services import DriverImportService, ShiftRollupService
 
 
 class DriversListTestCases(APITestCase):
@@ -62,6 +76,19 @@ class DriversListTestCases(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], len(self.drivers))
 
+    def test_successful_drivers_retrieval_with_cursor_pagination(self):
+        driver_ids = []
+        url, data = reverse("drivers"), {"pagination": "cursor", "pageSize": 2}
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, data)
+            self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            driver_ids.extend(driver['id'] for driver in response.data['results'])
+            url, data = response.data['next'], None
+        self.assertEqual(driver_ids, sorted(driver.id for driver in self.drivers))
+
     def test_failed_drivers_retrieval_with_unauthenticated_user(self):
         self.client.cookies["access"] = None
         response = self.client.get(reverse("drivers"))
@@ -597,6 +624,22 @@ class DriverStartingShiftViewPermissionTests(APITestCase):
         for other_shift in other_shifts:
             self.assertNotIn(other_shift.id, shift_ids)
 
+    def test_driver_cannot_write_other_drivers_shifts(self):
+        """Test that the driver of a shift is taken from the token and that other drivers' shifts cannot be changed"""
+        other_shift = DriverStartingShiftFactory.create(driver=self.other_driver)
+        self.client.post(reverse('driver-login'), self.login_data, format='json')
+
+        response = self.client.post(reverse('starting-shift'), {**self.shift_data, "driver": self.other_driver.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['driver'], self.driver.id)
+        self.assertEqual(DriverStartingShift.objects.get(pk=response.data['id']).driver_id, self.driver.id)
+
+        response = self.client.put(reverse('starting-shift-detail', args=[other_shift.id]), self.shift_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.delete(reverse('starting-shift-detail', args=[other_shift.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(DriverStartingShift.objects.filter(pk=other_shift.id, driver=self.other_driver).exists())
+
 
 class DriverStartingShiftViewCRUDTests(APITestCase):
     @classmethod
@@ -690,6 +733,25 @@ class DriverStartingShiftViewCRUDTests(APITestCase):
         dates = [shift['date'] for shift in response.data['results']]
         self.assertEqual(dates, sorted(dates, reverse=True))
 
+    def test_get_shifts_with_cursor_pagination(self):
+        """Test that cursor pagination walks the shifts newest first without repeating any of them"""
+        today = date.today()
+        for days in (3, 0, 1, 1, 2):
+            DriverStartingShiftFactory.create(driver=self.driver, date=today - timedelta(days=days))
+
+        shifts = []
+        url, data = reverse('starting-shift'), {'pagination': 'cursor', 'pageSize': 2}
+        while url:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            shifts.extend(response.data['results'])
+            url, data = response.data['next'], None
+
+        self.assertEqual(len({shift['id'] for shift in shifts}), 5)
+        dates = [shift['date'] for shift in shifts]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
 
 class DriverStartingShiftDetailTests(APITestCase):
     @classmethod
@@ -896,3 +958,473 @@ class DriverOverdueFormsTests(APITestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(len(response.data['missing_dates']) == 30)
+
+
+class DriverPrincipalTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile)
+        cls.driver = DriverFactory.create(profile=cls.user_profile, vehicle=cls.vehicle)
+        DriverStartingShiftFactory.create_batch(driver=cls.driver, size=3)
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.client.cookies['driver_access'] = str(DriverRefreshToken.for_driver(self.driver).access_token)
+
+    @contextmanager
+    def assertDriverQueries(self, count):
+        """Counts the queries of the driver table only, the shared cache being stored in the database during tests."""
+        with CaptureQueriesContext(connection) as context:
+            yield
+        self.assertEqual(sum('FROM "drivers_driver"' in query['sql'] for query in context.captured_queries), count)
+
+    def test_access_token_carries_driver_claims(self):
+        access = DriverRefreshToken.for_driver(self.driver).access_token
+        for claim, value in (('driver_id', self.driver.id), ('first_name', self.driver.first_name), ('last_name', self.driver.last_name),
+                             ('profile_id', self.user_profile.id), ('vehicle_id', self.vehicle.id)):
+            self.assertEqual(access[claim], value)
+
+    def test_driver_requests_do_not_load_the_driver(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('starting-shift'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertFalse(any('FROM "drivers_driver"' in query['sql'] for query in context.captured_queries))
+
+    def test_non_claim_attributes_are_loaded_lazily_and_cached(self):
+        request = type('Request', (), {})()
+        request.driver = DriverPrincipal.from_token(DriverRefreshToken.for_driver(self.driver).access_token)
+        with self.assertNumQueries(0):
+            self.assertEqual((request.driver.id, request.driver.profile_id, request.driver.vehicle_id), (self.driver.id, self.user_profile.id, self.vehicle.id))
+        with self.assertDriverQueries(1):
+            self.assertEqual(request.driver.email, self.driver.email)
+            self.assertEqual(request.driver.access_code, self.driver.access_code)
+
+        # Another request for the same driver, possibly served by another worker, is served by the shared cache until
+        # the driver changes
+        with self.assertDriverQueries(0):
+            self.assertEqual(DriverPrincipal(self.driver.id).email, self.driver.email)
+        self.assertIsNotNone(caches['shared'].get(DriverPrincipal.CACHE_KEY.format(id=self.driver.id)))
+        self.driver.email = 'updated@example.com'
+        self.driver.save()
+        with self.assertDriverQueries(1):
+            self.assertEqual(DriverPrincipal(self.driver.id).email, 'updated@example.com')
+
+
+class DriverJWTAuthenticationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.driver = DriverFactory.create(profile=cls.user_profile)
+        cls.refresh = DriverRefreshToken.for_driver(cls.driver)
+
+    def test_driver_token_is_decoded_once(self):
+        with patch('rest_framework_simplejwt.backends.TokenBackend.decode', autospec=True, side_effect=TokenBackend.decode) as decode:
+            token = DriverJWTAuthentication().get_validated_token(str(self.refresh.access_token).encode())
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(token['driver_id'], self.driver.id)
+
+    def test_manager_token_is_still_accepted(self):
+        token = DriverJWTAuthentication().get_validated_token(str(AccessToken.for_user(self.user_profile.user)).encode())
+        self.assertEqual(token['token_type'], 'access')
+
+    def test_other_token_types_are_rejected(self):
+        for raw_token in (str(RefreshToken.for_user(self.user_profile.user)), 'invalid-token'):
+            with self.assertRaises(InvalidToken):
+                DriverJWTAuthentication().get_validated_token(raw_token.encode())
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_driver_auth', iterations=5, stdout=out)
+        self.assertIn('faster', out.getvalue())
+
+
+class DriverAccessCodeAllocationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.access_token = AccessToken.for_user(cls.user_profile.user)
+        cls.existing_driver = DriverFactory.create(profile=cls.user_profile)
+
+    def setUp(self):
+        self.client.cookies["access"] = self.access_token
+
+    def build_driver_data(self, index):
+        return {
+            "first_name": "Driver",
+            "last_name": str(index),
+            "phone_number": f"+100000{index:04d}",
+            "license_number": f"L{index:08d}",
+            "license_expiry_date": date(2030, 1, 1).isoformat(),
+            "date_of_birth": date(1990, 1, 1).isoformat(),
+            "hire_date": date(2022, 1, 1).isoformat(),
+        }
+
+    def test_only_collisions_are_retried(self):
+        taken_code = self.existing_driver.access_code
+        candidates = iter([taken_code, 'AAAAAA-0', 'BBBBBB-0'])
+        with patch.object(Driver, 'build_access_code', side_effect=lambda: next(candidates)):
+            with self.assertNumQueries(2):
+                codes = Driver.allocate_access_codes(2)
+        self.assertEqual(sorted(codes), ['AAAAAA-0', 'BBBBBB-0'])
+
+    def test_bulk_create_retries_codes_taken_concurrently(self):
+        # The code was free when allocated but another transaction saved it before the insert
+        drivers = [Driver(profile=self.user_profile, access_code=self.existing_driver.access_code, **self.build_driver_data(1))]
+        created = Driver.bulk_create_with_access_codes(drivers)
+        self.assertNotEqual(created[0].access_code, self.existing_driver.access_code)
+        self.assertTrue(Driver.objects.filter(license_number="L00000001").exists())
+
+    def test_successful_bulk_driver_creation(self):
+        data = [self.build_driver_data(index) for index in range(20)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(reverse("drivers"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 20)
+        codes = [driver['access_code'] for driver in response.data]
+        self.assertEqual(len(set(codes)), 20)
+        for code in codes:
+            self.assertTrue(re.match(r'^[2-9A-HJ-NP-Z]{6}-\d$', code))
+        code_queries = [query['sql'] for query in context.captured_queries if '"access_code" IN' in query['sql'] or '"access_code" =' in query['sql']]
+        self.assertEqual(len(code_queries), 1)
+
+    def test_failed_bulk_driver_creation_with_duplicates_in_list(self):
+        data = [self.build_driver_data(1), {**self.build_driver_data(2), "license_number": "L00000001"}]
+        response = self.client.post(reverse("drivers"), data=data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Driver.objects.count(), 1)
+
+
+class DriverImportTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile, other_user_profile = UserProfileFactory.create_batch(size=2)
+        cls.access_token = AccessToken.for_user(cls.user_profile.user)
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile)
+        cls.other_vehicle = VehicleFactory.create(profile=other_user_profile)
+        cls.existing_driver = DriverFactory.create(profile=cls.user_profile, email="taken@example.com")
+
+    def setUp(self):
+        self.client.cookies["access"] = self.access_token
+
+    def build_driver_data(self, index, **kwargs):
+        return {
+            "first_name": "Driver",
+            "last_name": str(index),
+            "phone_number": f"+200000{index:04d}",
+            "license_number": f"I{index:08d}",
+            "license_expiry_date": date(2030, 1, 1).isoformat(),
+            "date_of_birth": date(1990, 1, 1).isoformat(),
+            "hire_date": date(2022, 1, 1).isoformat(),
+            **kwargs,
+        }
+
+    def upload_json(self, rows):
+        content = json.dumps(rows).encode()
+        return self.client.post(reverse("drivers-import"), {'file': SimpleUploadedFile(name='drivers.json', content=content)}, format='multipart')
+
+    def test_successful_json_import(self):
+        rows = [self.build_driver_data(index, vehicle=self.vehicle.id) for index in range(50)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.upload_json(rows)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['error_count']), (50, 0))
+
+        drivers = Driver.objects.filter(profile=self.user_profile, license_number__startswith="I")
+        self.assertEqual(drivers.count(), 50)
+        self.assertEqual(len(set(drivers.values_list('access_code', flat=True))), 50)
+        self.assertFalse(drivers.exclude(vehicle=self.vehicle).exists())
+        # Uniqueness is checked for the whole batch, not once per row and field
+        driver_selects = [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT') and 'FROM "drivers_driver"' in query['sql']]
+        self.assertLessEqual(len(driver_selects), 2)
+
+    def test_successful_csv_import(self):
+        rows = StringIO()
+        writer = csv.DictWriter(rows, fieldnames=list(self.build_driver_data(1)) + ['email'])
+        writer.writeheader()
+        writer.writerow({**self.build_driver_data(1), 'email': ''})
+        writer.writerow({**self.build_driver_data(2), 'email': ''})
+        response = self.client.post(reverse("drivers-import"), {'file': SimpleUploadedFile(name='drivers.csv', content=rows.getvalue().encode())}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['error_count']), (2, 0))
+        self.assertEqual(Driver.objects.filter(profile=self.user_profile, email__isnull=True).count(), 2)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        response = self.upload_json([
+            self.build_driver_data(1),
+            self.build_driver_data(2, license_number=self.existing_driver.license_number),
+            self.build_driver_data(3, email="taken@example.com"),
+            self.build_driver_data(4, phone_number="+2000000001"),
+            self.build_driver_data(5, vehicle=self.other_vehicle.id),
+            {key: value for key, value in self.build_driver_data(6).items() if key != 'hire_date'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 5))
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6])
+        self.assertIn('license_number', errors[2])
+        self.assertIn('email', errors[3])
+        self.assertIn('phone_number', errors[4])
+        self.assertIn('vehicle', errors[5])
+        self.assertIn('hire_date', errors[6])
+        self.assertTrue(Driver.objects.filter(license_number="I00000001").exists())
+
+    def test_duplicates_across_batches_are_reported(self):
+        service = DriverImportService(self.user_profile, batch_size=1)
+        summary = service.import_rows(enumerate([self.build_driver_data(1), self.build_driver_data(2, license_number="I00000001")], start=1))
+        self.assertEqual((summary['created'], summary['error_count']), (1, 1))
+        self.assertIn('license_number', summary['errors'][0]['errors'])
+
+    def test_blank_emails_do_not_collide(self):
+        DriverFactory.create(profile=self.user_profile, email="")
+        response = self.upload_json([self.build_driver_data(1, email=""), self.build_driver_data(2, email="")])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['error_count']), (2, 0))
+
+    def test_failed_import_returns_what_was_imported(self):
+        rows = StringIO()
+        writer = csv.DictWriter(rows, fieldnames=list(self.build_driver_data(1)))
+        writer.writeheader()
+        writer.writerows(self.build_driver_data(index) for index in range(DriverImportService.BATCH_SIZE))
+        # Blank lines keep the invalid byte out of the blocks decoded while the first batch is read
+        content = rows.getvalue().encode() + b'\n' * 2 ** 20 + b'\xff'
+        response = self.client.post(reverse("drivers-import"), {'file': SimpleUploadedFile(name='drivers.csv', content=content)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn('error', response.data)
+        self.assertEqual(response.data['created'], DriverImportService.BATCH_SIZE)
+        self.assertEqual(Driver.objects.filter(profile=self.user_profile, license_number__startswith="I").count(), DriverImportService.BATCH_SIZE)
+
+    def test_failed_import_with_wrong_file_type(self):
+        response = self.client.post(reverse("drivers-import"), {'file': SimpleUploadedFile(name='drivers.txt', content=b'[]')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.data)
+
+
+class DriverMissingShiftsTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile, other_user_profile = UserProfileFactory.create_batch(size=2)
+        cls.access_token = AccessToken.for_user(cls.user_profile.user)
+        cls.driver, cls.compliant_driver = DriverFactory.create_batch(size=2, profile=cls.user_profile)
+        cls.other_driver = DriverFactory.create(profile=other_user_profile)
+        for day in (1, 3):
+            DriverStartingShiftFactory.create(driver=cls.driver, date=date(2024, 5, day))
+        for day in range(1, 6):
+            DriverStartingShiftFactory.create(driver=cls.compliant_driver, date=date(2024, 5, day))
+        DriverStartingShiftFactory.create(driver=cls.other_driver, date=date(2024, 5, 2))
+
+    def setUp(self):
+        self.client.cookies["access"] = self.access_token
+
+    def get_missing_shifts(self, **params):
+        return self.client.get(reverse("missing-shifts"), {"start_date": "2024-05-01", "end_date": "2024-05-05", **params})
+
+    def test_missing_dates_of_all_drivers(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_missing_shifts()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([query for query in context.captured_queries if 'drivers_driverstartingshift' in query['sql']]), 1)
+        missing_dates = {driver['id']: driver['missing_dates'] for driver in response.data['drivers']}
+        self.assertEqual(missing_dates, {
+            self.driver.id: [date(2024, 5, 2), date(2024, 5, 4), date(2024, 5, 5)],
+            self.compliant_driver.id: [],
+        })
+
+    def test_missing_shifts_as_bitmap(self):
+        response = self.get_missing_shifts(output="bitmap")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        bitmaps = {driver['id']: driver['missing'] for driver in response.data['drivers']}
+        self.assertEqual(bitmaps, {self.driver.id: "01011", self.compliant_driver.id: "00000"})
+
+    def test_failed_missing_shifts_with_invalid_window(self):
+        for params in ({"start_date": "2024-05-06"}, {"start_date": "2023-01-01"}, {"end_date": "2024-02-30"}):
+            response = self.get_missing_shifts(**params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_failed_missing_shifts_with_malformed_dates(self):
+        # Unparseable dates are rejected instead of silently falling back to the default window
+        for params in ({"start_date": "yesterday"}, {"end_date": "2024/05/05"}, {"start_date": "2024-05-01T00:00"}):
+            response = self.get_missing_shifts(**params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_failed_missing_shifts_as_driver(self):
+        self.client.cookies.clear()
+        self.client.cookies["driver_access"] = DriverRefreshToken.for_driver(self.driver).access_token
+        response = self.get_missing_shifts()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ShiftRollupTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.access_token = AccessToken.for_user(cls.user_profile.user)
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile)
+        cls.driver = DriverFactory.create(profile=cls.user_profile, vehicle=cls.vehicle)
+        cls.other_driver = DriverFactory.create(profile=cls.user_profile)
+
+    def setUp(self):
+        self.client.cookies["access"] = self.access_token
+
+    def create_shift(self, driver, shift_date, mileage, load=10, **kwargs):
+        return DriverStartingShiftFactory.create(driver=driver, date=shift_date, mileage=mileage, load=load, **kwargs)
+
+    def get_driver_rollups(self, driver):
+        return list(DriverShiftDailyRollup.objects.filter(driver=driver).order_by('date').values_list('date', 'shift_count', 'total_load', 'mileage_delta'))
+
+    def assertRollupsMatchRebuild(self):
+        fields = ('driver_id', 'vehicle_id', 'date', 'shift_count', 'absence_count', 'total_load', 'start_mileage', 'end_mileage', 'mileage_delta')
+        profile_fields = ('profile_id', 'date', 'driver_count', 'shift_count', 'absence_count', 'total_load', 'mileage_delta')
+        incremental = (set(DriverShiftDailyRollup.objects.values_list(*fields)), set(ProfileShiftDailyRollup.objects.values_list(*profile_fields)))
+        ShiftRollupService.rebuild()
+        rebuilt = (set(DriverShiftDailyRollup.objects.values_list(*fields)), set(ProfileShiftDailyRollup.objects.values_list(*profile_fields)))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_rollups_follow_shift_changes(self):
+        self.create_shift(self.driver, date(2024, 5, 1), 1000)
+        shift = self.create_shift(self.driver, date(2024, 5, 2), 1200)
+        self.create_shift(self.driver, date(2024, 5, 3), 1500)
+        self.create_shift(self.driver, date(2024, 5, 3), 1450, absence_type="SICKNESS")
+        self.assertEqual(self.get_driver_rollups(self.driver), [
+            (date(2024, 5, 1), 1, 10, 0), (date(2024, 5, 2), 1, 10, 200), (date(2024, 5, 3), 2, 20, 300),
+        ])
+        self.assertEqual(DriverShiftDailyRollup.objects.get(driver=self.driver, date=date(2024, 5, 3)).absence_count, 1)
+
+        # Moving a shift away from a day changes the distance driven on the next shift day
+        shift.date = date(2024, 5, 4)
+        shift.mileage = 1600
+        shift.save()
+        self.assertEqual(self.get_driver_rollups(self.driver), [
+            (date(2024, 5, 1), 1, 10, 0), (date(2024, 5, 3), 2, 20, 500), (date(2024, 5, 4), 1, 10, 100),
+        ])
+
+        shift.delete()
+        self.assertEqual(self.get_driver_rollups(self.driver), [(date(2024, 5, 1), 1, 10, 0), (date(2024, 5, 3), 2, 20, 500)])
+        self.assertRollupsMatchRebuild()
+
+    def test_profile_rollups_aggregate_drivers(self):
+        self.create_shift(self.driver, date(2024, 5, 1), 1000, load=5)
+        self.create_shift(self.other_driver, date(2024, 5, 1), 3000, load=7)
+        rollup = ProfileShiftDailyRollup.objects.get(profile=self.user_profile, date=date(2024, 5, 1))
+        self.assertEqual((rollup.driver_count, rollup.shift_count, rollup.total_load), (2, 2, 12))
+
+        self.other_driver.delete()
+        rollup = ProfileShiftDailyRollup.objects.get(profile=self.user_profile, date=date(2024, 5, 1))
+        self.assertEqual((rollup.driver_count, rollup.shift_count, rollup.total_load), (1, 1, 5))
+        self.assertRollupsMatchRebuild()
+
+    def test_rebuild_command(self):
+        self.create_shift(self.driver, date(2024, 5, 1), 1000)
+        DriverShiftDailyRollup.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_shift_rollups', stdout=out)
+        self.assertIn("Rebuilt 1 driver and 1 profile shift rollup rows.", out.getvalue())
+        self.assertEqual(DriverShiftDailyRollup.objects.get(driver=self.driver).vehicle, self.vehicle)
+
+    def test_utilization_per_month(self):
+        self.create_shift(self.driver, date(2024, 4, 30), 1000, load=5)
+        self.create_shift(self.driver, date(2024, 5, 1), 1100, load=6)
+        self.create_shift(self.other_driver, date(2024, 5, 2), 3000, load=7)
+        response = self.client.get(reverse("utilization"), {"period": "month", "start_date": "2024-04-01", "end_date": "2024-05-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'period': date(2024, 4, 1), 'shift_count': 1, 'absence_count': 0, 'total_load': 5, 'mileage': 0, 'driver_days': 1},
+            {'period': date(2024, 5, 1), 'shift_count': 2, 'absence_count': 0, 'total_load': 13, 'mileage': 100, 'driver_days': 2},
+        ])
+
+        response = self.client.get(reverse("utilization"), {"period": "week", "driver": self.driver.id, "start_date": "2024-04-01", "end_date": "2024-05-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['period'], row['shift_count']) for row in response.data['results']], [(date(2024, 4, 29), 2)])
+
+    def test_failed_utilization_with_invalid_parameters(self):
+        self.assertEqual(self.client.get(reverse("utilization"), {"period": "year"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(reverse("utilization"), {"start_date": "last-month"}).status_code, status.HTTP_400_BAD_REQUEST)
+        other_driver = DriverFactory.create(profile=UserProfileFactory.create())
+        self.assertEqual(self.client.get(reverse("utilization"), {"driver": other_driver.id}).status_code, status.HTTP_404_NOT_FOUND)
+
+
+@skipUnless(connection.vendor == 'postgresql', "Concurrent transactions are only exercised on PostgreSQL")
+class ShiftRollupConcurrencyTestCases(TransactionTestCase):
+    def test_concurrent_shifts_of_a_profile_day_are_all_rolled_up(self):
+        user_profile = UserProfileFactory.create()
+        driver, other_driver = DriverFactory.create_batch(size=2, profile=user_profile)
+        first_saved, release_first = threading.Event(), threading.Event()
+        errors = []
+
+        def start_shift(shift_driver, load, hold):
+            try:
+                with transaction.atomic():
+                    DriverStartingShiftFactory.create(driver=shift_driver, date=date(2024, 5, 1), mileage=1000, load=load)
+                    if hold:
+                        first_saved.set()
+                        release_first.wait(timeout=10)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=start_shift, args=(driver, 5, True))
+        first.start()
+        first_saved.wait(timeout=10)
+        second = threading.Thread(target=start_shift, args=(other_driver, 7, False))
+        second.start()
+        # The second driver waits for the profile day locked by the first one instead of failing on its unique constraint
+        second.join(timeout=0.5)
+        self.assertTrue(second.is_alive())
+        release_first.set()
+        first.join()
+        second.join()
+
+        self.assertEqual(errors, [])
+        rollup = ProfileShiftDailyRollup.objects.get(profile=user_profile, date=date(2024, 5, 1))
+        self.assertEqual((rollup.driver_count, rollup.shift_count, rollup.total_load), (2, 2, 12))
+
+
+class AsyncDriverShiftViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.driver = DriverFactory.create(profile=cls.user_profile)
+        cls.driver_token = str(DriverRefreshToken.for_driver(cls.driver).access_token)
+        cls.shift_data = {"time": "08:00", "load": 10, "mileage": 1000, "delivery_areas": ["A"]}
+
+    def get_headers(self, token=None):
+        return {"authorization": f"Bearer {token or self.driver_token}"}
+
+    async def test_successful_async_shift_submission(self):
+        response = await self.async_client.post(reverse("async-starting-shift"), self.shift_data, content_type="application/json",
+                                                headers=self.get_headers())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["driver"], self.driver.id)
+        shift = await DriverStartingShift.objects.aget(pk=response.json()["id"])
+        self.assertEqual((shift.driver_id, shift.mileage), (self.driver.id, 1000))
+
+    async def test_failed_async_shift_submission_with_invalid_data(self):
+        response = await self.async_client.post(reverse("async-starting-shift"), {"time": "08:00"}, content_type="application/json",
+                                                headers=self.get_headers())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("mileage", response.json())
+        self.assertEqual(await DriverStartingShift.objects.acount(), 0)
+
+    async def test_failed_async_shift_submission_without_driver_token(self):
+        manager_token = str(AccessToken.for_user(self.user_profile.user))
+        for headers in ({}, self.get_headers(manager_token), self.get_headers("invalid")):
+            response = await self.async_client.post(reverse("async-starting-shift"), self.shift_data, content_type="application/json", headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_failed_async_shift_submission_of_deleted_driver(self):
+        await Driver.objects.filter(pk=self.driver.id).adelete()
+        response = await self.async_client.post(reverse("async-starting-shift"), self.shift_data, content_type="application/json",
+                                                headers=self.get_headers())
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(await DriverStartingShift.objects.acount(), 0)
+
+    async def test_async_overdue_forms(self):
+        today = datetime.now().date()
+        await DriverStartingShift.objects.acreate(driver=self.driver, date=today, time="08:00", load=1, mileage=1)
+        response = await self.async_client.get(reverse("async-overdue-forms"), headers=self.get_headers())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        missing_dates = response.json()["missing_dates"]
+        self.assertEqual(len(missing_dates), 29)
+        self.assertNotIn(today.isoformat(), missing_dates)
@@ -1,20 +1,29 @@
 from django.urls import path
 
+from .async_views import AsyncDriverStartingShiftView, AsyncDriverOverdueFormsView
 from .views import (DriversListView,
                     DriversDetailView,
+                    DriverImportView,
                     DriverLoginView,
                     DriverStartingShiftView,
                     DriverStartingShiftDetailView,
                     DriverAccessCodeView,
 DriverOverdueFormsView,
+                    DriverMissingShiftsView,
+                    DriverUtilizationView,
                     )
 
 urlpatterns = [
     path('', DriversListView.as_view(), name="drivers"),
+    path('import/', DriverImportView.as_view(), name="drivers-import"),
     path('<int:pk>/', DriversDetailView.as_view(), name="driver-detail"),
     path('login/', DriverLoginView.as_view(), name="driver-login"),
     path('starting-shift/', DriverStartingShiftView.as_view(), name="starting-shift"),
     path('starting-shift/<int:pk>/', DriverStartingShiftDetailView.as_view(), name="starting-shift-detail"),
     path('<int:pk>/access-code/', DriverAccessCodeView.as_view(), name='access-code'),
     path('overdue-forms/', DriverOverdueFormsView.as_view(), name='overdue-forms'),
+    path('missing-shifts/', DriverMissingShiftsView.as_view(), name='missing-shifts'),
+    path('utilization/', DriverUtilizationView.as_view(), name='utilization'),
+    path('async/starting-shift/', AsyncDriverStartingShiftView.as_view(), name='async-starting-shift'),
+    path('async/overdue-forms/', AsyncDriverOverdueFormsView.as_view(), name='async-overdue-forms'),
 ]
@@ -1,20 +1,28 @@
 from datetime import datetime, timedelta
+from io import TextIOWrapper
 
 from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.utils.dateparse import parse_date
 from rest_framework import status
-from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import UntypedToken
 
+from core.querysets import optimize_queryset_for_serializer
+from core.views import import_error_response
 from .authentication import DriverRefreshToken, DriverJWTAuthentication
-from .models import Driver, DriverStartingShift
-from .pagination import CustomPageNumberPagination
+from .models import Driver, DriverStartingShift, DriverShiftDailyRollup, ProfileShiftDailyRollup
+from .pagination import ShiftCursorPagination, get_paginator
 from .permissions import IsDriverOwner, IsDriver
-from .serializers import DriverSerializer, DriverStartingShiftSerializer
+from .queries import MISSING_SHIFTS_QUERY
+from .serializers import DriverSerializer, DriverShiftSubmissionSerializer, DriverStartingShiftSerializer
+from .services import DriverImportService, OverdueFormsService
 
 
 class DriversListView(APIView):
@@ -22,14 +30,16 @@ class DriversListView(APIView):
 
     def get(self, request):
         drivers = Driver.objects.filter(profile__user=request.user).order_by("pk")
+        drivers = optimize_queryset_for_serializer(drivers, DriverSerializer)
 
-        paginator = CustomPageNumberPagination()
+        paginator = get_paginator(request)
         paginated_drivers = paginator.paginate_queryset(drivers, request)
         serializer = DriverSerializer(paginated_drivers, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
-        serializer = DriverSerializer(data=request.data, context={"request": request})
+        # A list of drivers is created in bulk
+        serializer = DriverSerializer(data=request.data, many=isinstance(request.data, list), context={"request": request})
 
         if serializer.is_valid():
             serializer.save()
@@ -37,6 +47,26 @@ class DriversListView(APIView):
         raise ValidationError(detail=serializer.errors)
 
 
+class DriverImportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        import_file = request.FILES.get('file')
+        if not import_file or not import_file.name.endswith(('.json', '.csv')):
+            return Response({"error": "Please upload a JSON (.json) or CSV file."}, status=status.HTTP_400_BAD_REQUEST)
+
+        service = DriverImportService(request.user.userprofile)
+        try:
+            decode_file = TextIOWrapper(import_file.file, encoding='utf-8')
+            if import_file.name.endswith('.json'):
+                summary = service.import_json(decode_file)
+            else:
+                summary = service.import_csv(decode_file)
+            return Response(summary, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return import_error_response(service.get_summary(), e)
+
+
 class DriversDetailView(APIView):
     permission_classes = [IsAuthenticated, IsDriverOwner]
 
@@ -180,15 +210,18 @@ class DriverStartingShiftView(APIView):
     permission_classes = [IsDriver]
 
     def post(self, request):
-        serializer = DriverStartingShiftSerializer(data={'driver': request.driver.id, **request.data})
+        serializer = DriverShiftSubmissionSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            # The driver comes from the token claims, which outlive a deleted driver, see AsyncDriverStartingShiftView
+            if not Driver.objects.filter(pk=request.driver.id).exists():
+                raise AuthenticationFailed("Driver not found")
+            serializer.save(driver_id=request.driver.id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request):
-        shifts = DriverStartingShift.objects.filter(driver=request.driver).order_by("-date")
-        paginator = CustomPageNumberPagination()
+        shifts = DriverStartingShift.objects.filter(driver_id=request.driver.id).order_by("-date")
+        paginator = get_paginator(request, cursor_pagination_class=ShiftCursorPagination)
         paginated_shifts = paginator.paginate_queryset(shifts, request)
         serializer = DriverStartingShiftSerializer(paginated_shifts, many=True)
         return paginator.get_paginated_response(serializer.data)
@@ -198,27 +231,27 @@ class DriverStartingShiftDetailView(APIView):
     authentication_classes = [DriverJWTAuthentication]
     permission_classes = [IsDriver]
 
-    def get_object(self, pk):
+    def get_object(self, pk, driver):
         try:
-            return DriverStartingShift.objects.get(pk=pk)
+            return DriverStartingShift.objects.get(pk=pk, driver_id=driver.id)
         except DriverStartingShift.DoesNotExist:
             raise NotFound(detail="Starting shift does not exist.")
 
     def get(self, request, pk):
-        shift = self.get_object(pk)
+        shift = self.get_object(pk, request.driver)
         serializer = DriverStartingShiftSerializer(shift)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def put(self, request, pk):
-        shift = self.get_object(pk)
-        serializer = DriverStartingShiftSerializer(shift, data={'driver': request.driver.id, **request.data})
+        shift = self.get_object(pk, request.driver)
+        serializer = DriverShiftSubmissionSerializer(shift, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(driver_id=request.driver.id)
             return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
-        shift = self.get_object(pk)
+        shift = self.get_object(pk, request.driver)
         shift.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -245,21 +278,98 @@ class DriverOverdueFormsView(APIView):
         """
         Returns a list of dates in the last 30 days that don't have any entries in the table.
         """
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=29)
+        window = OverdueFormsService.get_window()
+        missing_dates = OverdueFormsService.get_missing_dates(window, OverdueFormsService.get_shift_dates(request.driver.id, window))
+        return Response({'missing_dates': missing_dates}, status=status.HTTP_200_OK)
 
-        # Generate all dates in the table for the last 30 days
-        all_dates = [(start_date + timedelta(days=i)) for i in range(30)]
 
-        # Get all dates in the table for the last 30 days
-        existing_dates = DriverStartingShift.objects.filter(
-            driver=request.driver,
-            date__gte=start_date,
-            date__lte=end_date
-        ).values_list('date', flat=True).distinct()
+def get_date_window(request, default_days, max_days):
+    """Returns the `start_date` and `end_date` query parameters, defaulting to the last `default_days` days."""
+    dates = {}
+    for param in ('start_date', 'end_date'):
+        value = request.query_params.get(param, '')
+        try:
+            dates[param] = parse_date(value)
+        except ValueError:
+            dates[param] = None
+        # An empty parameter falls back to the default, anything else must be a date
+        if value and dates[param] is None:
+            raise ValidationError(detail={"error": "Dates must be valid dates in YYYY-MM-DD format."})
+    end_date = dates['end_date'] or datetime.now().date()
+    start_date = dates['start_date'] or end_date - timedelta(days=default_days - 1)
+    if start_date > end_date:
+        raise ValidationError(detail={"error": "Start date cannot be after end date."})
+    if (end_date - start_date).days >= max_days:
+        raise ValidationError(detail={"error": f"The date window cannot be longer than {max_days} days."})
+    return start_date, end_date
+
+
+class DriverMissingShiftsView(APIView):
+    permission_classes = [IsAuthenticated]
+    MAX_DAYS = 366
 
-        existing_dates = set(existing_dates)
-        missing_dates = [date for date in all_dates if date not in existing_dates]
-        return Response({'missing_dates': missing_dates}, status=status.HTTP_200_OK)
+    def get(self, request):
+        """
+        Returns the dates without a starting shift of every driver of the profile, between `start_date` and `end_date`.
+
+        The window defaults to the last 30 days. With `output=bitmap` the dates of each driver are replaced by a
+        string with one character per day of the window, starting at `start_date`: '1' for a missing shift and '0'
+        otherwise.
+        """
+        start_date, end_date = get_date_window(request, default_days=30, max_days=self.MAX_DAYS)
+
+        params = {'profile_id': request.user.userprofile.id, 'start_date': start_date, 'end_date': end_date}
+        with connection.cursor() as cursor:
+            cursor.execute(MISSING_SHIFTS_QUERY, params)
+            rows = cursor.fetchall()
+
+        bitmap = request.query_params.get('output') == 'bitmap'
+        drivers = []
+        for driver_id, first_name, last_name, missing in rows:
+            driver = {'id': driver_id, 'first_name': first_name, 'last_name': last_name}
+            if bitmap:
+                driver['missing'] = missing
+            else:
+                driver['missing_dates'] = [start_date + timedelta(days=day) for day, flag in enumerate(missing) if flag == '1']
+            drivers.append(driver)
+
+        return Response({'start_date': start_date, 'end_date': end_date, 'drivers': drivers}, status=status.HTTP_200_OK)
 
 
+class DriverUtilizationView(APIView):
+    permission_classes = [IsAuthenticated]
+    MAX_DAYS = 731
+    PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+    def get(self, request):
+        """
+        Returns the shift counts, absences, load and distance driven of the profile per day, week or month.
+
+        The figures are read from the daily shift rollups, for the whole fleet or for one driver with `driver`. The
+        window defaults to the last 12 weeks and `period` to `week`.
+        """
+        period = request.query_params.get('period', 'week')
+        if period not in self.PERIODS:
+            raise ValidationError(detail={"error": f"Period must be one of: {', '.join(self.PERIODS)}."})
+        start_date, end_date = get_date_window(request, default_days=84, max_days=self.MAX_DAYS)
+
+        driver_id = request.query_params.get('driver')
+        if driver_id:
+            if not driver_id.isdigit() or not Driver.objects.filter(pk=driver_id, profile__user=request.user).exists():
+                raise NotFound(detail="Driver does not exist.")
+            rollups = DriverShiftDailyRollup.objects.filter(driver_id=driver_id)
+            totals = {}
+        else:
+            rollups = ProfileShiftDailyRollup.objects.filter(profile__user=request.user)
+            totals = {'driver_days': Sum('driver_count')}
+
+        results = (
+            rollups
+            .filter(date__gte=start_date, date__lte=end_date)
+            .annotate(period=self.PERIODS[period]('date'))
+            .values('period')
+            .annotate(shift_count=Sum('shift_count'), absence_count=Sum('absence_count'), total_load=Sum('total_load'),
+                      mileage=Sum('mileage_delta'), **totals)
+            .order_by('period')
+        )
+        return Response({'period': period, 'start_date': start_date, 'end_date': end_date, 'results': list(results)}, status=status.HTTP_200_OK)
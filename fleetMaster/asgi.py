@@ -3,6 +3,15 @@ ASGI config for fleetMaster project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async driver endpoints (drivers/async_views.py) only free their worker while waiting on the database when the
+project is served through this module, for example with:
+
+    gunicorn fleetMaster.asgi:application -k uvicorn_worker.UvicornWorker
+
+The worker class comes from the uvicorn-worker package, uvicorn's own `uvicorn.workers` module is deprecated.
+
+The WSGI entry point keeps serving them, synchronously, when the project runs under a sync server.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
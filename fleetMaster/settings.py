@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'dj_rest_auth',
     'dj_rest_auth.registration',
     # My apps
+    'core',
     'accounts',
     'vehicles',
     'drivers',
@@ -97,10 +98,20 @@ WSGI_APPLICATION = 'fleetMaster.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connections are reused from a per-process pool, see core/backends/postgresql_pool
+DATABASE_ENGINE = 'core.backends.postgresql_pool'
+DATABASE_POOL = {
+    'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+    'MAX_LIFETIME': config('DB_POOL_MAX_LIFETIME', default=1800, cast=int),
+    'TIMEOUT': config('DB_POOL_TIMEOUT', default=10, cast=float),
+    'CHECK_ON_CHECKOUT': config('DB_POOL_CHECK_ON_CHECKOUT', default=True, cast=bool),
+}
+
 if os.environ.get('GITHUB_WORKFLOW'):
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': DATABASE_ENGINE,
+            'POOL': DATABASE_POOL,
             'NAME': "github_actions",
             'USER': 'postgres',
             'PASSWORD': 'postgres',
@@ -111,7 +122,8 @@ if os.environ.get('GITHUB_WORKFLOW'):
 elif 'RENDER' in os.environ:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': DATABASE_ENGINE,
+            'POOL': DATABASE_POOL,
             'NAME': os.environ.get("DB_NAME"),
             "USER": os.environ.get("DB_USER"),
             "PASSWORD": os.environ.get("DB_PASSWORD"),
@@ -122,7 +134,8 @@ elif 'RENDER' in os.environ:
 elif 'RDS_HOSTNAME' in os.environ:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': DATABASE_ENGINE,
+            'POOL': DATABASE_POOL,
             'NAME': config("RDS_DB_NAME"),
             "USER": config("RDS_USERNAME"),
             "PASSWORD": config("RDS_PASSWORD"),
@@ -133,7 +146,8 @@ elif 'RDS_HOSTNAME' in os.environ:
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            'ENGINE': DATABASE_ENGINE,
+            'POOL': DATABASE_POOL,
             'NAME': config("DB_NAME"),
             "USER": config("DB_USER"),
             "PASSWORD": config("DB_PASSWORD"),
@@ -142,6 +156,26 @@ else:
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# The default cache is per process and only holds short-lived, per-request state (throttling, driver lookups).
+# Payloads cached in 'shared' are invalidated by bumping version tokens stored next to them (see maintenance/caching.py),
+# so every worker and instance must see the same entries: REDIS_URL selects Redis, otherwise they live in the database
+# table created by the core migrations.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL'),
+    } if config('REDIS_URL', default='') else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -17,6 +17,8 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import DatabasePoolStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include("accounts.urls")),
@@ -26,4 +28,5 @@ urlpatterns = [
     path('basic/auth/', include("allauth.urls")),
     path('auth/', include("dj_rest_auth.urls")),
     path('auth/registrations/', include('dj_rest_auth.registration.urls')),
+    path('internal/db-pool/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
 ]
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import MaintenanceReport, Part, ServiceProvider, PartsProvider, PartPurchaseEvent, ServiceProviderEvent
+from .models import MaintenanceReport, Part, ServiceProvider, PartsProvider, PartPurchaseEvent, ServiceProviderEvent, MaintenanceCostRollup, PartUsageCounter
 
 # Register your models here.
 
@@ -10,3 +10,5 @@ admin.site.register(ServiceProvider)
 admin.site.register(PartsProvider)
 admin.site.register(PartPurchaseEvent)
 admin.site.register(ServiceProviderEvent)
+admin.site.register(MaintenanceCostRollup)
+admin.site.register(PartUsageCounter)
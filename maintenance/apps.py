@@ -6,4 +6,5 @@ class MaintenanceConfig(AppConfig):
     name = 'maintenance'
 
     def ready(self):
+        import maintenance.checks
         import maintenance.signals
@@ -0,0 +1,123 @@
+from typing import Iterable
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.connection import ConnectionProxy
+
+from maintenance.models import Part, ServiceProvider, PartsProvider
+from maintenance.serializers import PartSerializer, ServiceProviderSerializer, PartsProviderSerializer
+
+GENERAL_DATA_VERSION_CACHE_KEY = 'maintenance:general-data:version'
+GENERAL_DATA_CACHE_KEY = 'maintenance:general-data:{version}'
+GENERAL_DATA_CACHE_TIMEOUT = 60 * 60 * 24
+
+VEHICLE_OVERVIEW_VERSION_CACHE_KEY = 'maintenance:vehicle-overview:{vehicle_id}:version'
+VEHICLE_OVERVIEW_CACHE_KEY = 'maintenance:vehicle-overview:{vehicle_id}:{profile_id}:{version}'
+VEHICLE_OVERVIEW_CACHE_TIMEOUT = 60 * 60 * 24
+VEHICLE_OVERVIEW_STATS_CACHE_KEY = 'maintenance:vehicle-overview:{outcome}'
+
+# The version tokens and the payloads they invalidate must be seen by every worker and instance, see CACHES in settings
+cache = ConnectionProxy(caches, 'shared')
+
+
+def get_general_data_version():
+    """
+    Returns the current version of the general maintenance data (parts, service providers and parts providers).
+
+    The version is an opaque token stored in the cache. It changes every time one of the catalog models is written,
+    which makes every previously cached payload (and every ETag built from it) stale at once.
+    """
+    version = cache.get(GENERAL_DATA_VERSION_CACHE_KEY)
+    if version is None:
+        # add() keeps the token of a concurrent request that got there first
+        cache.add(GENERAL_DATA_VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+        version = cache.get(GENERAL_DATA_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_general_data_version():
+    """Invalidates the cached general maintenance data once the current transaction is committed."""
+    transaction.on_commit(lambda: cache.set(GENERAL_DATA_VERSION_CACHE_KEY, uuid4().hex, timeout=None))
+
+
+def get_general_data(version):
+    """
+    Returns the serialized general maintenance data for the given version, building and caching it on a miss.
+
+    The payload is shared by every user, so it is serialized without a request and `is_owner` is left as None. Use
+    `with_ownership` to fill it in for the current user.
+    """
+    cache_key = GENERAL_DATA_CACHE_KEY.format(version=version)
+    data = cache.get(cache_key)
+    if data is None:
+        data = {
+            "parts": PartSerializer(Part.objects.all(), many=True).data,
+            "service_providers": ServiceProviderSerializer(ServiceProvider.objects.all(), many=True).data,
+            "part_providers": PartsProviderSerializer(PartsProvider.objects.all(), many=True).data,
+        }
+        cache.set(cache_key, data, timeout=GENERAL_DATA_CACHE_TIMEOUT)
+    return data
+
+
+def with_ownership(data, profile_id):
+    """Returns a copy of the cached general maintenance data with `is_owner` computed for the given profile."""
+    return {key: [{**item, 'is_owner': item['profile'] == profile_id} for item in items] for key, items in data.items()}
+
+
+def get_vehicle_overview_version(vehicle_id):
+    """
+    Returns the current version of the maintenance overview of a vehicle.
+
+    Like the general data version, it is an opaque token stored in the cache, replaced every time a report or an event
+    of the vehicle is written, or a part purchased for it is renamed.
+    """
+    version_key = VEHICLE_OVERVIEW_VERSION_CACHE_KEY.format(vehicle_id=vehicle_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid4().hex, timeout=None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_vehicle_overview_versions(vehicle_ids: Iterable[int]):
+    """Invalidates the cached maintenance overviews of the given vehicles once the current transaction is committed."""
+    version_keys = [VEHICLE_OVERVIEW_VERSION_CACHE_KEY.format(vehicle_id=vehicle_id) for vehicle_id in set(vehicle_ids) if vehicle_id]
+    if version_keys:
+        transaction.on_commit(lambda: cache.set_many({version_key: uuid4().hex for version_key in version_keys}, timeout=None))
+
+
+def get_vehicle_overview(vehicle_id, profile_id, build):
+    """
+    Returns the maintenance overview of a vehicle, calling `build` and caching its result on a miss.
+
+    The overview also names and ranks the parts purchased for the vehicle, so writing one of these parts bumps its
+    version, see maintenance/signals.py. Other catalog writes leave it cached.
+    """
+    cache_key = VEHICLE_OVERVIEW_CACHE_KEY.format(vehicle_id=vehicle_id, profile_id=profile_id, version=get_vehicle_overview_version(vehicle_id))
+    overview = cache.get(cache_key)
+    if overview is not None:
+        _count_vehicle_overview_lookup('hits')
+        return overview
+
+    _count_vehicle_overview_lookup('misses')
+    overview = build()
+    cache.set(cache_key, overview, timeout=VEHICLE_OVERVIEW_CACHE_TIMEOUT)
+    return overview
+
+
+def _count_vehicle_overview_lookup(outcome):
+    stats_key = VEHICLE_OVERVIEW_STATS_CACHE_KEY.format(outcome=outcome)
+    cache.add(stats_key, 0, timeout=None)
+    try:
+        cache.incr(stats_key)
+    except ValueError:
+        # The counter was evicted between add() and incr()
+        cache.add(stats_key, 1, timeout=None)
+
+
+def get_vehicle_overview_cache_stats():
+    """Returns the hits and misses of the vehicle overview cache across all workers, with the share of hits in percent."""
+    hits, misses = (cache.get(VEHICLE_OVERVIEW_STATS_CACHE_KEY.format(outcome=outcome), 0) for outcome in ('hits', 'misses'))
+    lookups = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_rate': round(hits / lookups * 100, 2) if lookups else None}
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries are only seen by one process or one host
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Refuses a 'shared' cache that is not shared by every worker and instance.
+
+    The general data and the vehicle overviews are invalidated by bumping version tokens, and the overview hit rate is
+    counted, in the 'shared' cache (see maintenance/caching.py). A local cache would only see the bumps and lookups of
+    the workers that handled them, and keep serving stale payloads to the others.
+    """
+    backend = settings.CACHES.get('shared', {}).get('BACKEND')
+    if backend is None:
+        return [Error(
+            "The 'shared' cache used by maintenance/caching.py is not configured.",
+            hint="Add a 'shared' entry to CACHES, backed by Redis or the database.",
+            id='maintenance.E001',
+        )]
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [Error(
+            f"The 'shared' cache uses {backend}, which is not shared between workers and instances.",
+            hint="Use Redis or the database cache backend.",
+            id='maintenance.E002',
+        )]
+    return []
@@ -63,6 +63,8 @@ class PartPurchaseEventFactory(factory.django.DjangoModelFactory):
             return
         if self.maintenance_report:
             self.maintenance_report.total_cost += self.cost
+            self.maintenance_report.parts_cost += self.cost
+            self.maintenance_report.part_event_count += 1
             self.maintenance_report.save()
 
 class ServiceProviderEventFactory(factory.django.DjangoModelFactory):
@@ -81,4 +83,6 @@ class ServiceProviderEventFactory(factory.django.DjangoModelFactory):
             return
         if self.maintenance_report:
             self.maintenance_report.total_cost += self.cost
+            self.maintenance_report.service_cost += self.cost
+            self.maintenance_report.service_event_count += 1
             self.maintenance_report.save()
@@ -0,0 +1,188 @@
+from datetime import date
+from random import Random
+from timeit import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from accounts.factories import UserProfileFactory
+from maintenance.factories import PartFactory, PartsProviderFactory
+from maintenance.models import MaintenanceReport, PartPurchaseEvent
+from maintenance.queries import COMBINED_YEARLY_DATA_QUERY
+from maintenance.services.fleet_services import VehicleMaintenanceService
+from maintenance.services.part_usage import PartUsageCounterService
+from vehicles.factories import VehicleFactory
+from vehicles.models import Vehicle
+
+# The overview query before the single-scan rewrite, kept to measure against. Its parameters are the vehicle and the
+# profile ids, four times.
+PREVIOUS_COMBINED_YEARLY_DATA_QUERY = """
+                             WITH yearly_costs AS (SELECT EXTRACT(YEAR FROM start_date) AS year, SUM (total_cost) AS total_cost
+                             FROM maintenance_maintenancereport
+                             WHERE vehicle_id = %s
+                               AND profile_id = %s
+                             GROUP BY EXTRACT (YEAR FROM start_date)
+                                 ),
+                                 monthly_costs AS (
+                             SELECT
+                                 EXTRACT (YEAR FROM start_date) AS year, EXTRACT (MONTH FROM start_date) AS month, SUM (total_cost) AS total_cost
+                             FROM maintenance_maintenancereport
+                             WHERE vehicle_id = %s
+                               AND profile_id = %s
+                             GROUP BY EXTRACT (YEAR FROM start_date), EXTRACT (MONTH FROM start_date)
+                                 ),
+                                 monthly_costs_with_lag AS (
+                             SELECT
+                                 year, month, total_cost, LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month) AS previous_month_cost, CASE
+                                 WHEN LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month) = 0 THEN NULL
+                                 ELSE 100.0 * (total_cost - LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month)) /
+                                 LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month)
+                                 END AS mom_change
+                             FROM monthly_costs
+                                 ), yearly_costs_with_lag AS (
+                             SELECT
+                                 year, total_cost, LAG(total_cost, 1, 0) OVER (ORDER BY year) AS previous_year_cost, CASE
+                                 WHEN LAG(total_cost, 1, 0) OVER (ORDER BY year) = 0 THEN NULL
+                                 ELSE 100.0 * (total_cost - LAG(total_cost, 1, 0) OVER (ORDER BY year)) /
+                                 LAG(total_cost, 1, 0) OVER (ORDER BY year)
+                                 END AS yoy_change
+                             FROM yearly_costs
+                                 ), yearly_part_data AS (
+                             SELECT
+                                 EXTRACT (YEAR FROM mr.start_date) AS year, p.name AS part_name, COUNT (ppe.id) AS count, SUM (ppe.cost) AS part_cost
+                             FROM maintenance_partpurchaseevent ppe
+                                 JOIN maintenance_maintenancereport mr
+                             ON ppe.maintenance_report_id = mr.id
+                                 JOIN maintenance_part p ON ppe.part_id = p.id
+                             WHERE mr.vehicle_id = %s
+                               AND mr.profile_id = %s
+                             GROUP BY EXTRACT (YEAR FROM mr.start_date), p.name
+                                 ),
+                                 monthly_part_data AS (
+                             SELECT
+                                 EXTRACT (YEAR FROM mr.start_date) AS year, EXTRACT (MONTH FROM mr.start_date) AS month, p.name AS part_name, COUNT (ppe.id) AS count, SUM (ppe.cost) AS part_cost
+                             FROM maintenance_partpurchaseevent ppe
+                                 JOIN maintenance_maintenancereport mr
+                             ON ppe.maintenance_report_id = mr.id
+                                 JOIN maintenance_part p ON ppe.part_id = p.id
+                             WHERE mr.vehicle_id = %s
+                               AND mr.profile_id = %s
+                             GROUP BY EXTRACT (YEAR FROM mr.start_date), EXTRACT (MONTH FROM mr.start_date), p.name
+                                 ),
+                                 yearly_ranked_parts AS (
+                             SELECT
+                                 year, part_name, count, part_cost, ROW_NUMBER() OVER (PARTITION BY year ORDER BY count DESC) AS rank
+                             FROM yearly_part_data
+                                 ), monthly_ranked_parts AS (
+                             SELECT
+                                 year, month, part_name, count, part_cost, ROW_NUMBER() OVER (PARTITION BY year, month ORDER BY count DESC) AS rank
+                             FROM monthly_part_data
+                                 ) \
+                             SELECT *
+                             FROM (SELECT 'yearly_cost' AS data_type, yc.year, NULL :: numeric AS month, yc.total_cost, yc.previous_year_cost, yc.yoy_change, NULL AS part_name, NULL ::bigint AS part_count, NULL :: numeric AS part_cost, NULL ::bigint AS part_rank
+                                   FROM yearly_costs_with_lag yc
+
+                                   UNION ALL
+
+                                   SELECT 'monthly_cost' AS data_type, mc.year, mc.month, mc.total_cost, mc.previous_month_cost, mc.mom_change, NULL AS part_name, NULL ::bigint AS part_count, NULL :: numeric AS part_cost, NULL ::bigint AS part_rank
+                                   FROM monthly_costs_with_lag mc
+
+                                   UNION ALL
+
+                                   SELECT 'yearly_part' AS data_type, yr.year, NULL :: numeric AS month, NULL :: numeric AS total_cost, NULL :: numeric AS previous_cost, NULL :: numeric AS change_percent, yr.part_name, yr.count::bigint AS part_count, yr.part_cost:: numeric, yr.rank::bigint AS part_rank
+                                   FROM yearly_ranked_parts yr
+                                   WHERE yr.rank <= 3
+
+                                   UNION ALL
+
+                                   SELECT 'monthly_part' AS data_type, mr.year, mr.month, NULL :: numeric AS total_cost, NULL :: numeric AS previous_cost, NULL :: numeric AS change_percent, mr.part_name, mr.count::bigint AS part_count, mr.part_cost:: numeric, mr.rank::bigint AS part_rank
+                                   FROM monthly_ranked_parts mr
+                                   WHERE mr.rank <= 3) AS combined_data
+                             ORDER BY CASE
+                                          WHEN data_type = 'yearly_cost' THEN 1
+                                          WHEN data_type = 'monthly_cost' THEN 2
+                                          WHEN data_type = 'yearly_part' THEN 3
+                                          WHEN data_type = 'monthly_part' THEN 4
+                                          END,
+                                 year,
+                                 month,
+                                 part_rank \
+                             """
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the vehicle overview rows of a vehicle with the previous query, the single-scan query and the portable "
+        "ORM implementation. Without a vehicle, one with ten years of reports is generated and rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehicle', type=int, help="Existing vehicle to measure, instead of a generated one.")
+        parser.add_argument('--years', type=int, default=10, help="Years of history of the generated vehicle.")
+        parser.add_argument('--reports-per-month', type=int, default=20, help="Maintenance reports per month of the generated vehicle.")
+        parser.add_argument('--iterations', type=int, default=20, help="Number of times each implementation is run.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['vehicle']:
+                vehicle_id, profile_id = self.get_vehicle(options['vehicle'])
+            else:
+                vehicle_id, profile_id = self.create_vehicle_history(options['years'], options['reports_per_month'])
+            self.measure(vehicle_id, profile_id, options['iterations'])
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def get_vehicle(vehicle_id):
+        try:
+            vehicle = Vehicle.objects.get(pk=vehicle_id)
+        except Vehicle.DoesNotExist:
+            raise CommandError(f"Vehicle {vehicle_id} does not exist.")
+        return vehicle.id, vehicle.profile_id
+
+    def create_vehicle_history(self, years, reports_per_month):
+        random = Random(0)
+        profile = UserProfileFactory.create()
+        vehicle = VehicleFactory.create(profile=profile)
+        parts = [PartFactory.create(profile=profile, name=f'Benchmark part {index}') for index in range(40)]
+        provider = PartsProviderFactory.create(profile=profile)
+
+        first_year = date.today().year - years
+        reports = MaintenanceReport.objects.bulk_create(
+            MaintenanceReport(profile=profile, vehicle=vehicle, start_date=date(year, month, day), end_date=date(year, month, day), total_cost=0)
+            for year in range(first_year, first_year + years) for month in range(1, 13) for day in range(1, reports_per_month + 1)
+        )
+        events = []
+        for report in reports:
+            report_events = [
+                PartPurchaseEvent(maintenance_report=report, part=random.choice(parts), provider=provider, purchase_date=report.start_date, cost=random.randint(10, 500))
+                for _ in range(3)
+            ]
+            report.total_cost = sum(event.cost for event in report_events)
+            events.extend(report_events)
+        PartPurchaseEvent.objects.bulk_create(events)
+        MaintenanceReport.objects.bulk_update(reports, ['total_cost'], batch_size=1000)
+        PartUsageCounterService.refresh_buckets(PartUsageCounterService.get_report_bucket(report) for report in reports)
+        self.stdout.write(f"Generated {len(reports)} reports and {len(events)} part purchases over {years} years.")
+        return vehicle.id, profile.id
+
+    def measure(self, vehicle_id, profile_id, iterations):
+        def run_query(query, params):
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+
+        implementations = {
+            'previous query': lambda: run_query(PREVIOUS_COMBINED_YEARLY_DATA_QUERY, [vehicle_id, profile_id] * 4),
+            'single-scan query': lambda: run_query(COMBINED_YEARLY_DATA_QUERY, {'vehicle_id': vehicle_id, 'profile_id': profile_id}),
+            'ORM implementation': lambda: VehicleMaintenanceService.aggregate_yearly_maintenance_rows(vehicle_id, profile_id),
+        }
+        timings = {}
+        for label, implementation in implementations.items():
+            implementation()  # Warm the caches before measuring
+            timings[label] = timeit(implementation, number=iterations) / iterations
+            self.stdout.write(f"{label:<20} {timings[label] * 1000:8.2f} ms")
+
+        if implementations['single-scan query']() != implementations['ORM implementation']():
+            raise CommandError("The ORM implementation does not return the same rows as the single-scan query.")
+        before, after = timings['previous query'], timings['single-scan query']
+        self.stdout.write(self.style.SUCCESS(f"The single-scan query is {before / after:.2f}x faster than the previous one."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.services.part_usage import PartUsageCounterService
+from maintenance.services.rollups import MaintenanceCostRollupService
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the monthly maintenance cost rollups and the part usage counters from scratch and verifies them "
+        "against live aggregates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify-only', action='store_true', help="Only compare the rollups with live aggregates, without rebuilding them.")
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            created = MaintenanceCostRollupService.rebuild()
+            self.stdout.write(f"Rebuilt {created} maintenance cost rollup rows.")
+            created = PartUsageCounterService.rebuild()
+            self.stdout.write(f"Rebuilt {created} part usage counter rows.")
+
+        mismatches = MaintenanceCostRollupService.verify()
+        for mismatch in mismatches:
+            self.stderr.write(
+                "Mismatch for profile {profile_id}, {vehicle_type} {year}-{month:02d}: "
+                "expected (total_cost, report_count)={expected}, found {actual}".format(**mismatch)
+            )
+        counter_mismatches = PartUsageCounterService.verify()
+        for mismatch in counter_mismatches:
+            self.stderr.write(
+                "Mismatch for profile {profile_id}, vehicle {vehicle_id}, part {part_id} {year}-{month:02d}: "
+                "expected (count, total_cost)={expected}, found {actual}".format(**mismatch)
+            )
+        if mismatches or counter_mismatches:
+            raise CommandError(
+                f"{len(mismatches)} maintenance cost rollup buckets and {len(counter_mismatches)} part usage counters do not "
+                f"match the live aggregates."
+            )
+        self.stdout.write(self.style.SUCCESS("Maintenance cost rollups and part usage counters match the live aggregates."))
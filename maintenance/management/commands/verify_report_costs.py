@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance.services.report_costs import ReportCostBreakdownService
+
+
+class Command(BaseCommand):
+    help = "Verifies the cost breakdown stored on maintenance reports against their events, and optionally repairs it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help="Recompute the breakdown of the mismatching reports.")
+
+    def handle(self, *args, **options):
+        mismatches = ReportCostBreakdownService.verify()
+        for mismatch in mismatches:
+            self.stderr.write(
+                "Mismatch for report {report_id}: expected (total_cost, parts_cost, service_cost, part_event_count, "
+                "service_event_count)={expected}, found {actual}".format(**mismatch)
+            )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("The cost breakdown of every maintenance report matches its events."))
+            return
+
+        if not options['repair']:
+            raise CommandError(f"{len(mismatches)} maintenance reports have a cost breakdown that does not match their events.")
+        repaired = ReportCostBreakdownService.repair()
+        self.stdout.write(self.style.SUCCESS(f"Repaired the cost breakdown of {repaired} maintenance reports."))
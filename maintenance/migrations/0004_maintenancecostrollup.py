@@ -0,0 +1,47 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:06
+
+from django.db import migrations, models
+from django.db.models import Sum, Count, F
+from django.db.models.functions import ExtractYear, ExtractMonth
+import django.db.models.deletion
+
+
+def populate_cost_rollups(apps, schema_editor):
+    MaintenanceReport = apps.get_model('maintenance', 'MaintenanceReport')
+    MaintenanceCostRollup = apps.get_model('maintenance', 'MaintenanceCostRollup')
+    rows = (
+        MaintenanceReport.objects
+        .annotate(vehicle_type=F('vehicle__type'), year=ExtractYear('start_date'), month=ExtractMonth('start_date'))
+        .values('profile_id', 'vehicle_type', 'year', 'month')
+        .annotate(total_cost=Sum('total_cost'), report_count=Count('id'))
+        .order_by()
+    )
+    MaintenanceCostRollup.objects.bulk_create([MaintenanceCostRollup(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('maintenance', '0003_remove_maintenancereport_part_counter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceCostRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vehicle_type', models.CharField(choices=[('CAR', 'Car'), ('TRUCK', 'Truck'), ('MOTORCYCLE', 'Motorcycle'), ('VAN', 'Van')], max_length=100)),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('total_cost', models.BigIntegerField(default=0)),
+                ('report_count', models.PositiveIntegerField(default=0)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_cost_rollups', to='accounts.userprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='maintenancecostrollup',
+            constraint=models.UniqueConstraint(fields=('profile', 'vehicle_type', 'year', 'month'), name='unique_maintenance_cost_rollup'),
+        ),
+        migrations.RunPython(populate_cost_rollups, migrations.RunPython.noop),
+    ]
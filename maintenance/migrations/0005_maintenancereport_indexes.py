@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0004_maintenancecostrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenancereport',
+            index=models.Index(fields=['profile', 'start_date'], include=('total_cost',), name='report_profile_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancereport',
+            index=models.Index(fields=['profile', 'vehicle', 'start_date'], name='report_profile_vehicle_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenancereport',
+            index=models.Index(fields=['vehicle', '-start_date', '-id'], include=('mileage',), name='report_vehicle_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:57
+
+from django.db import migrations, models
+from django.db.models import Sum, Count, F
+from django.db.models.functions import ExtractYear, ExtractMonth
+import django.db.models.deletion
+
+
+def populate_part_usage_counters(apps, schema_editor):
+    PartPurchaseEvent = apps.get_model('maintenance', 'PartPurchaseEvent')
+    PartUsageCounter = apps.get_model('maintenance', 'PartUsageCounter')
+    rows = (
+        PartPurchaseEvent.objects
+        .annotate(profile_id=F('maintenance_report__profile_id'), vehicle_id=F('maintenance_report__vehicle_id'),
+                  year=ExtractYear('maintenance_report__start_date'), month=ExtractMonth('maintenance_report__start_date'))
+        .values('profile_id', 'vehicle_id', 'part_id', 'year', 'month')
+        .annotate(count=Count('id'), total_cost=Sum('cost'))
+        .order_by()
+    )
+    PartUsageCounter.objects.bulk_create([PartUsageCounter(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('vehicles', '0002_vehicle_indexes'),
+        ('maintenance', '0005_maintenancereport_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartUsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_cost', models.BigIntegerField(default=0)),
+                ('part', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_counters', to='maintenance.part')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_usage_counters', to='accounts.userprofile')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_usage_counters', to='vehicles.vehicle')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['profile', 'year'], include=('part', 'count'), name='part_usage_profile_year_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='partusagecounter',
+            constraint=models.UniqueConstraint(fields=('profile', 'vehicle', 'year', 'month', 'part'), name='unique_part_usage_counter'),
+        ),
+        migrations.RunPython(populate_part_usage_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.16 on 2026-10-17 02:02
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_cost_breakdown(apps, schema_editor):
+    MaintenanceReport = apps.get_model('maintenance', 'MaintenanceReport')
+    PartPurchaseEvent = apps.get_model('maintenance', 'PartPurchaseEvent')
+    ServiceProviderEvent = apps.get_model('maintenance', 'ServiceProviderEvent')
+
+    def aggregate(model, expression):
+        events = model.objects.filter(maintenance_report=OuterRef('pk')).order_by().values('maintenance_report')
+        return Coalesce(Subquery(events.annotate(value=expression).values('value')), Value(0), output_field=IntegerField())
+
+    MaintenanceReport.objects.update(
+        parts_cost=aggregate(PartPurchaseEvent, Sum('cost')),
+        service_cost=aggregate(ServiceProviderEvent, Sum('cost')),
+        part_event_count=aggregate(PartPurchaseEvent, Count('id')),
+        service_event_count=aggregate(ServiceProviderEvent, Count('id')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0006_partusagecounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenancereport',
+            name='part_event_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='maintenancereport',
+            name='parts_cost',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='maintenancereport',
+            name='service_cost',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='maintenancereport',
+            name='service_event_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_cost_breakdown, migrations.RunPython.noop),
+    ]
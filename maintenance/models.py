@@ -3,6 +3,7 @@ from django.db import models
 from django.db.models import Sum
 
 from core.validators import validate_positive_integer
+from vehicles.models import VehicleTypeChoices
 
 
 class ServiceChoices(models.TextChoices):
@@ -55,6 +56,21 @@ class MaintenanceReport(models.Model):
     description = models.TextField(blank=True)
     mileage = models.PositiveIntegerField(blank=True, null=True)
     total_cost = models.IntegerField(validators=[validate_positive_integer])
+    # Breakdown of the events of the report, set by MaintenanceReportSerializer and checked by `verify_report_costs`
+    parts_cost = models.IntegerField(default=0)
+    service_cost = models.IntegerField(default=0)
+    part_event_count = models.PositiveIntegerField(default=0)
+    service_event_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Fleet-wide aggregates of a tenant over a date range
+            models.Index(fields=['profile', 'start_date'], include=['total_cost'], name='report_profile_start_idx'),
+            # Per-vehicle reports, overview and month pagination of a tenant
+            models.Index(fields=['profile', 'vehicle', 'start_date'], name='report_profile_vehicle_idx'),
+            # Latest report of a vehicle, used to sync its mileage
+            models.Index(fields=['vehicle', '-start_date', '-id'], include=['mileage'], name='report_vehicle_latest_idx'),
+        ]
 
     def clean(self):
         if self.end_date < self.start_date:
@@ -77,3 +93,51 @@ class ServiceProviderEvent(models.Model):
     cost = models.IntegerField(validators=[validate_positive_integer])
     receipt = models.ImageField(upload_to='services/%Y/%m/%d/', null=True)
     description = models.TextField(blank=True)
+
+
+class MaintenanceCostRollup(models.Model):
+    """
+    Monthly maintenance cost totals per profile and vehicle type.
+
+    Rows are derived from MaintenanceReport and kept up to date by the handlers in maintenance/signals.py, so the
+    fleet dashboards can aggregate a handful of monthly rows instead of every report. The
+    `rebuild_maintenance_rollups` management command rebuilds the table from scratch.
+    """
+    profile = models.ForeignKey("accounts.UserProfile", on_delete=models.CASCADE, related_name='maintenance_cost_rollups')
+    vehicle_type = models.CharField(max_length=100, choices=VehicleTypeChoices.choices)
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    total_cost = models.BigIntegerField(default=0)
+    report_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile', 'vehicle_type', 'year', 'month'], name='unique_maintenance_cost_rollup'),
+        ]
+
+
+class PartUsageCounter(models.Model):
+    """
+    Monthly purchase count and cost of a part per profile and vehicle.
+
+    Rows are derived from PartPurchaseEvent and kept up to date by the handlers in maintenance/signals.py and by the
+    writers that bulk create events, so the top recurring issues are read from a few counters instead of joining the
+    whole purchase history. The `rebuild_maintenance_rollups` management command rebuilds the table from scratch.
+    """
+    profile = models.ForeignKey("accounts.UserProfile", on_delete=models.CASCADE, related_name='part_usage_counters')
+    vehicle = models.ForeignKey("vehicles.Vehicle", on_delete=models.CASCADE, related_name='part_usage_counters')
+    part = models.ForeignKey(Part, on_delete=models.CASCADE, related_name='usage_counters')
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    total_cost = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves the per-vehicle reads of the overview
+            models.UniqueConstraint(fields=['profile', 'vehicle', 'year', 'month', 'part'], name='unique_part_usage_counter'),
+        ]
+        indexes = [
+            # Fleet-wide top recurring issues of a tenant for a year
+            models.Index(fields=['profile', 'year'], include=['part', 'count'], name='part_usage_profile_year_idx'),
+        ]
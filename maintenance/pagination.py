@@ -1,13 +1,16 @@
-from collections import defaultdict
 from datetime import datetime
 
-from rest_framework.pagination import BasePagination
+from django.db.models.functions import TruncMonth
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
 from rest_framework.response import Response
 
 
 class MonthlyPagination(BasePagination):
     """
     Pagination class that groups maintenance reports by month
+
+    The list of available months comes from a DISTINCT month query and only the requested month's reports are
+    fetched, through a range filter on start_date, so the reports of other months are never loaded.
     """
 
     page_query_param = 'month'
@@ -16,31 +19,35 @@ class MonthlyPagination(BasePagination):
     def paginate_queryset(self, queryset, request, view=None):
         self.request = request
         self.month_param = request.query_params.get(self.page_query_param)
+        self.current_month_data = []
 
-        # Group all reports by month
-        self.reports_by_month = defaultdict(list)
-        for report in queryset:
-            month_key = report.start_date.strftime('%Y-%m')
-            self.reports_by_month[month_key].append(report)
-
-        # Return the list of reports for the current month if requested
+        # Only return the list of available months, not the actual reports
         if not self.month_param:
-            self.available_months = sorted(self.reports_by_month.keys(), reverse=True)
-            self.current_month_data = []
-
-            # Only return the list of available months, not the actual reports
+            self.available_months = self.get_available_months(queryset)
             return []
 
         # Return reports for the requested month
         try:
             # Validate month format
-            datetime.strptime(self.month_param, '%Y-%m')
-            self.current_month_data = self.reports_by_month.get(self.month_param, [])
-            return self.current_month_data
+            month_start = datetime.strptime(self.month_param, '%Y-%m').date()
         except ValueError:
-            self.current_month_data = []
             return []
 
+        next_month_start = month_start.replace(year=month_start.year + 1, month=1) if month_start.month == 12 else month_start.replace(month=month_start.month + 1)
+        self.current_month_data = list(queryset.filter(start_date__gte=month_start, start_date__lt=next_month_start))
+        return self.current_month_data
+
+    def get_available_months(self, queryset):
+        months = (
+            queryset
+            .order_by()
+            .annotate(month=TruncMonth('start_date'))
+            .values_list('month', flat=True)
+            .distinct()
+            .order_by('-month')
+        )
+        return [month.strftime('%Y-%m') for month in months]
+
     def get_paginated_response(self, data):
         if not self.month_param:
             # When no month is specified, return the list of available months
@@ -55,3 +62,20 @@ class MonthlyPagination(BasePagination):
             'count': len(self.current_month_data),
             'results': data
         })
+
+
+class ReportCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the maintenance reports list, used when the client asks for `?pagination=cursor`.
+
+    The cursor is keyed on start_date only, pk just makes the order of reports sharing a start date deterministic.
+    Those reports are skipped with an offset, so a page costs more the more reports of the fleet share its start date.
+    """
+
+    ordering = ('start_date', 'pk')
+
+
+def get_report_paginator(request):
+    if request.query_params.get('pagination') == 'cursor':
+        return ReportCursorPagination()
+    return PageNumberPagination()
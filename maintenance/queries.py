@@ -1,92 +1,115 @@
+# Yearly and monthly costs of a vehicle with their change from the previous period, and its three most purchased parts
+# of every year and month. The reports of the vehicle are read once and its part purchases come from the monthly
+# PartUsageCounter rows. GROUPING SETS computes the yearly and the monthly aggregates of each in the same pass and
+# GROUPING(month) tells them apart (1 for the yearly rows). Changes are percentages rounded to two decimals and parts
+# with the same purchase count are ranked by name, so the top three are deterministic.
+# VehicleMaintenanceService.aggregate_yearly_maintenance_rows returns the same rows on the other backends.
+# Parameters: %(vehicle_id)s, %(profile_id)s
+# Rows: (data_type, year, month, total_cost, previous_cost, change_pct, part_name, part_count, part_cost, part_rank)
 COMBINED_YEARLY_DATA_QUERY = """
-                             WITH yearly_costs AS (SELECT EXTRACT(YEAR FROM start_date) AS year, SUM (total_cost) AS total_cost
-                             FROM maintenance_maintenancereport
-                             WHERE vehicle_id = %s
-                               AND profile_id = %s
-                             GROUP BY EXTRACT (YEAR FROM start_date)
-                                 ),
-                                 monthly_costs AS (
-                             SELECT
-                                 EXTRACT (YEAR FROM start_date) AS year, EXTRACT (MONTH FROM start_date) AS month, SUM (total_cost) AS total_cost
-                             FROM maintenance_maintenancereport
-                             WHERE vehicle_id = %s
-                               AND profile_id = %s
-                             GROUP BY EXTRACT (YEAR FROM start_date), EXTRACT (MONTH FROM start_date)
-                                 ),
-                                 monthly_costs_with_lag AS (
-                             SELECT
-                                 year, month, total_cost, LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month) AS previous_month_cost, CASE
-                                 WHEN LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month) = 0 THEN NULL
-                                 ELSE 100.0 * (total_cost - LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month)) /
-                                 LAG(total_cost, 1, 0) OVER (PARTITION BY year ORDER BY month)
-                                 END AS mom_change
-                             FROM monthly_costs
-                                 ), yearly_costs_with_lag AS (
-                             SELECT
-                                 year, total_cost, LAG(total_cost, 1, 0) OVER (ORDER BY year) AS previous_year_cost, CASE
-                                 WHEN LAG(total_cost, 1, 0) OVER (ORDER BY year) = 0 THEN NULL
-                                 ELSE 100.0 * (total_cost - LAG(total_cost, 1, 0) OVER (ORDER BY year)) /
-                                 LAG(total_cost, 1, 0) OVER (ORDER BY year)
-                                 END AS yoy_change
-                             FROM yearly_costs
-                                 ), yearly_part_data AS (
-                             SELECT
-                                 EXTRACT (YEAR FROM mr.start_date) AS year, p.name AS part_name, COUNT (ppe.id) AS count, SUM (ppe.cost) AS part_cost
-                             FROM maintenance_partpurchaseevent ppe
-                                 JOIN maintenance_maintenancereport mr
-                             ON ppe.maintenance_report_id = mr.id
-                                 JOIN maintenance_part p ON ppe.part_id = p.id
-                             WHERE mr.vehicle_id = %s
-                               AND mr.profile_id = %s
-                             GROUP BY EXTRACT (YEAR FROM mr.start_date), p.name
-                                 ),
-                                 monthly_part_data AS (
-                             SELECT
-                                 EXTRACT (YEAR FROM mr.start_date) AS year, EXTRACT (MONTH FROM mr.start_date) AS month, p.name AS part_name, COUNT (ppe.id) AS count, SUM (ppe.cost) AS part_cost
-                             FROM maintenance_partpurchaseevent ppe
-                                 JOIN maintenance_maintenancereport mr
-                             ON ppe.maintenance_report_id = mr.id
-                                 JOIN maintenance_part p ON ppe.part_id = p.id
-                             WHERE mr.vehicle_id = %s
-                               AND mr.profile_id = %s
-                             GROUP BY EXTRACT (YEAR FROM mr.start_date), EXTRACT (MONTH FROM mr.start_date), p.name
-                                 ),
-                                 yearly_ranked_parts AS (
-                             SELECT
-                                 year, part_name, count, part_cost, ROW_NUMBER() OVER (PARTITION BY year ORDER BY count DESC) AS rank
-                             FROM yearly_part_data
-                                 ), monthly_ranked_parts AS (
-                             SELECT
-                                 year, month, part_name, count, part_cost, ROW_NUMBER() OVER (PARTITION BY year, month ORDER BY count DESC) AS rank
-                             FROM monthly_part_data
-                                 ) \
-                             SELECT *
-                             FROM (SELECT 'yearly_cost' AS data_type, yc.year, NULL :: numeric AS month, yc.total_cost, yc.previous_year_cost, yc.yoy_change, NULL AS part_name, NULL ::bigint AS part_count, NULL :: numeric AS part_cost, NULL ::bigint AS part_rank
-                                   FROM yearly_costs_with_lag yc
+    WITH costs AS (
+        SELECT EXTRACT(YEAR FROM start_date) AS year, EXTRACT(MONTH FROM start_date) AS month,
+               GROUPING(EXTRACT(MONTH FROM start_date)) AS is_yearly, SUM(total_cost) AS total_cost
+        FROM maintenance_maintenancereport
+        WHERE vehicle_id = %(vehicle_id)s
+          AND profile_id = %(profile_id)s
+        GROUP BY GROUPING SETS ((EXTRACT(YEAR FROM start_date)), (EXTRACT(YEAR FROM start_date), EXTRACT(MONTH FROM start_date)))
+    ),
+    costs_with_lag AS (
+        SELECT is_yearly, year, month, total_cost,
+               LAG(total_cost, 1, 0) OVER (PARTITION BY is_yearly, CASE WHEN is_yearly = 0 THEN year END ORDER BY year, month) AS previous_cost
+        FROM costs
+    ),
+    parts AS (
+        SELECT puc.year, puc.month, GROUPING(puc.month) AS is_yearly, p.name AS part_name, SUM(puc.count) AS count, SUM(puc.total_cost) AS part_cost
+        FROM maintenance_partusagecounter puc
+            JOIN maintenance_part p ON puc.part_id = p.id
+        WHERE puc.vehicle_id = %(vehicle_id)s
+          AND puc.profile_id = %(profile_id)s
+        GROUP BY GROUPING SETS ((puc.year, p.name), (puc.year, puc.month, p.name))
+    ),
+    ranked_parts AS (
+        SELECT is_yearly, year, month, part_name, count, part_cost,
+               ROW_NUMBER() OVER (PARTITION BY is_yearly, year, month ORDER BY count DESC, part_name COLLATE "C") AS rank
+        FROM parts
+    )
+    SELECT *
+    FROM (SELECT CASE WHEN is_yearly = 1 THEN 'yearly_cost' ELSE 'monthly_cost' END AS data_type, year, month, total_cost,
+                 previous_cost, CASE WHEN previous_cost = 0 THEN NULL ELSE ROUND(100.0 * (total_cost - previous_cost) / previous_cost, 2) END AS change_percent,
+                 NULL AS part_name, NULL::bigint AS part_count, NULL::numeric AS part_cost, NULL::bigint AS part_rank
+          FROM costs_with_lag
 
-                                   UNION ALL
+          UNION ALL
 
-                                   SELECT 'monthly_cost' AS data_type, mc.year, mc.month, mc.total_cost, mc.previous_month_cost, mc.mom_change, NULL AS part_name, NULL ::bigint AS part_count, NULL :: numeric AS part_cost, NULL ::bigint AS part_rank
-                                   FROM monthly_costs_with_lag mc
+          SELECT CASE WHEN is_yearly = 1 THEN 'yearly_part' ELSE 'monthly_part' END AS data_type, year, month, NULL::numeric AS total_cost,
+                 NULL::numeric AS previous_cost, NULL::numeric AS change_percent, part_name, count::bigint AS part_count,
+                 part_cost::numeric, rank::bigint AS part_rank
+          FROM ranked_parts
+          WHERE rank <= 3) AS combined_data
+    ORDER BY CASE
+                 WHEN data_type = 'yearly_cost' THEN 1
+                 WHEN data_type = 'monthly_cost' THEN 2
+                 WHEN data_type = 'yearly_part' THEN 3
+                 WHEN data_type = 'monthly_part' THEN 4
+                 END,
+             year,
+             month,
+             part_rank
+"""
 
-                                   UNION ALL
+# COMBINED_YEARLY_DATA_QUERY for several vehicles in one round trip: every aggregate, change and rank is partitioned
+# by vehicle, and every row starts with the vehicle id.
+# Parameters: %(vehicle_ids)s (a list), %(profile_id)s
+# Rows: (vehicle_id, data_type, year, month, total_cost, previous_cost, change_pct, part_name, part_count, part_cost, part_rank)
+VEHICLES_YEARLY_DATA_QUERY = """
+    WITH costs AS (
+        SELECT vehicle_id, EXTRACT(YEAR FROM start_date) AS year, EXTRACT(MONTH FROM start_date) AS month,
+               GROUPING(EXTRACT(MONTH FROM start_date)) AS is_yearly, SUM(total_cost) AS total_cost
+        FROM maintenance_maintenancereport
+        WHERE vehicle_id = ANY(%(vehicle_ids)s)
+          AND profile_id = %(profile_id)s
+        GROUP BY GROUPING SETS ((vehicle_id, EXTRACT(YEAR FROM start_date)), (vehicle_id, EXTRACT(YEAR FROM start_date), EXTRACT(MONTH FROM start_date)))
+    ),
+    costs_with_lag AS (
+        SELECT vehicle_id, is_yearly, year, month, total_cost,
+               LAG(total_cost, 1, 0) OVER (PARTITION BY vehicle_id, is_yearly, CASE WHEN is_yearly = 0 THEN year END ORDER BY year, month) AS previous_cost
+        FROM costs
+    ),
+    parts AS (
+        SELECT puc.vehicle_id, puc.year, puc.month, GROUPING(puc.month) AS is_yearly, p.name AS part_name, SUM(puc.count) AS count,
+               SUM(puc.total_cost) AS part_cost
+        FROM maintenance_partusagecounter puc
+            JOIN maintenance_part p ON puc.part_id = p.id
+        WHERE puc.vehicle_id = ANY(%(vehicle_ids)s)
+          AND puc.profile_id = %(profile_id)s
+        GROUP BY GROUPING SETS ((puc.vehicle_id, puc.year, p.name), (puc.vehicle_id, puc.year, puc.month, p.name))
+    ),
+    ranked_parts AS (
+        SELECT vehicle_id, is_yearly, year, month, part_name, count, part_cost,
+               ROW_NUMBER() OVER (PARTITION BY vehicle_id, is_yearly, year, month ORDER BY count DESC, part_name COLLATE "C") AS rank
+        FROM parts
+    )
+    SELECT *
+    FROM (SELECT vehicle_id, CASE WHEN is_yearly = 1 THEN 'yearly_cost' ELSE 'monthly_cost' END AS data_type, year, month, total_cost,
+                 previous_cost, CASE WHEN previous_cost = 0 THEN NULL ELSE ROUND(100.0 * (total_cost - previous_cost) / previous_cost, 2) END AS change_percent,
+                 NULL AS part_name, NULL::bigint AS part_count, NULL::numeric AS part_cost, NULL::bigint AS part_rank
+          FROM costs_with_lag
 
-                                   SELECT 'yearly_part' AS data_type, yr.year, NULL :: numeric AS month, NULL :: numeric AS total_cost, NULL :: numeric AS previous_cost, NULL :: numeric AS change_percent, yr.part_name, yr.count::bigint AS part_count, yr.part_cost:: numeric, yr.rank::bigint AS part_rank
-                                   FROM yearly_ranked_parts yr
-                                   WHERE yr.rank <= 3
+          UNION ALL
 
-                                   UNION ALL
-
-                                   SELECT 'monthly_part' AS data_type, mr.year, mr.month, NULL :: numeric AS total_cost, NULL :: numeric AS previous_cost, NULL :: numeric AS change_percent, mr.part_name, mr.count::bigint AS part_count, mr.part_cost:: numeric, mr.rank::bigint AS part_rank
-                                   FROM monthly_ranked_parts mr
-                                   WHERE mr.rank <= 3) AS combined_data
-                             ORDER BY CASE
-                                          WHEN data_type = 'yearly_cost' THEN 1
-                                          WHEN data_type = 'monthly_cost' THEN 2
-                                          WHEN data_type = 'yearly_part' THEN 3
-                                          WHEN data_type = 'monthly_part' THEN 4
-                                          END,
-                                 year,
-                                 month,
-                                 part_rank \
-                             """
+          SELECT vehicle_id, CASE WHEN is_yearly = 1 THEN 'yearly_part' ELSE 'monthly_part' END AS data_type, year, month,
+                 NULL::numeric AS total_cost, NULL::numeric AS previous_cost, NULL::numeric AS change_percent, part_name,
+                 count::bigint AS part_count, part_cost::numeric, rank::bigint AS part_rank
+          FROM ranked_parts
+          WHERE rank <= 3) AS combined_data
+    ORDER BY vehicle_id,
+             CASE
+                 WHEN data_type = 'yearly_cost' THEN 1
+                 WHEN data_type = 'monthly_cost' THEN 2
+                 WHEN data_type = 'yearly_part' THEN 3
+                 WHEN data_type = 'monthly_part' THEN 4
+                 END,
+             year,
+             month,
+             part_rank
+"""
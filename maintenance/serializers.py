@@ -3,6 +3,8 @@ from rest_framework import serializers
 
 from vehicles.serializers import VehicleSerializer
 from .models import Part, ServiceProvider, PartsProvider, PartPurchaseEvent, MaintenanceReport, ServiceProviderEvent
+from .services.part_usage import PartUsageCounterService
+from .services.report_costs import ReportCostBreakdownService
 
 
 class OwnedResourceSerializer(serializers.ModelSerializer):
@@ -11,7 +13,11 @@ class OwnedResourceSerializer(serializers.ModelSerializer):
 
     def get_is_owner(self, obj):
         """Check if the current user is the owner of the object."""
-        return obj.profile == self.context['request'].user.userprofile
+        # Serialized without a request (e.g. for a cache shared by every user), ownership is unknown
+        if 'request' not in self.context:
+            return None
+        # Compare ids so that rendering a list does not load every owner profile
+        return obj.profile_id == self.context['request'].user.userprofile.id
 
     def create(self, validated_data):
         """Create a new instance owned by the current user."""
@@ -75,16 +81,18 @@ class MaintenanceReportSerializer(serializers.ModelSerializer):
             "description",
             "mileage",
             "total_cost",
+            "parts_cost",
+            "service_cost",
+            "part_event_count",
+            "service_event_count",
             "part_purchase_events",
             "service_provider_events",
         ]
-        read_only_fields = ['profile', 'total_cost']
+        read_only_fields = ['profile', 'total_cost', 'parts_cost', 'service_cost', 'part_event_count', 'service_event_count']
 
-    def _calculate_total_cost(self, part_events, service_events):
-        """Calculate the total cost from part purchases and service events."""
-        part_costs = sum(event.get('cost', 0) for event in part_events)
-        service_costs = sum(event.get('cost', 0) for event in service_events)
-        return part_costs + service_costs
+    def _calculate_costs(self, part_events, service_events):
+        """Calculate the total cost and its breakdown from part purchases and service events."""
+        return ReportCostBreakdownService.get_breakdown(part_events, service_events)
 
     def _validate_service_events(self, service_events):
         """Validate that at least one service provider event exists."""
@@ -97,11 +105,11 @@ class MaintenanceReportSerializer(serializers.ModelSerializer):
         service_provider_events_data = validated_data.pop('service_provider_events', [])
 
         self._validate_service_events(service_provider_events_data)
-        total_cost = self._calculate_total_cost(part_purchase_events_data, service_provider_events_data)
+        costs = self._calculate_costs(part_purchase_events_data, service_provider_events_data)
 
         with transaction.atomic():
             maintenance_report = MaintenanceReport.objects.create(
-                profile=profile, total_cost=total_cost, **validated_data
+                profile=profile, **costs, **validated_data
             )
             # Create related objects
             PartPurchaseEvent.objects.bulk_create(
@@ -112,6 +120,9 @@ class MaintenanceReportSerializer(serializers.ModelSerializer):
                 [ServiceProviderEvent(maintenance_report=maintenance_report, **service_event)
                  for service_event in service_provider_events_data]
             )
+            # bulk_create does not send post_save, so the part usage counters are refreshed here
+            if part_purchase_events_data:
+                PartUsageCounterService.schedule_refresh({PartUsageCounterService.get_report_bucket(maintenance_report)})
 
         return maintenance_report
 
@@ -121,13 +132,12 @@ class MaintenanceReportSerializer(serializers.ModelSerializer):
         validated_data.pop('vehicle_details', None)
 
         self._validate_service_events(service_provider_events_data)
-        total_cost = self._calculate_total_cost(part_purchase_events_data, service_provider_events_data)
+        costs = self._calculate_costs(part_purchase_events_data, service_provider_events_data)
 
         with transaction.atomic():
             # Update main instance fields
-            for attr, value in validated_data.items():
+            for attr, value in {**validated_data, **costs}.items():
                 setattr(instance, attr, value)
-            instance.total_cost = total_cost
             instance.save()
 
             # Update related objects
@@ -143,6 +153,9 @@ class MaintenanceReportSerializer(serializers.ModelSerializer):
                 service_provider_events_data,
                 instance
             )
+            # Removed part purchases refresh the counters through post_delete, the created ones are bulk created
+            if any("id" not in event for event in part_purchase_events_data):
+                PartUsageCounterService.schedule_refresh({PartUsageCounterService.get_report_bucket(instance)})
 
         return instance
 
@@ -177,3 +190,48 @@ class MaintenanceReportSerializer(serializers.ModelSerializer):
             model(maintenance_report=maintenance_report_instance, **event_data)
             for event_data in events_to_create
         ])
+
+
+class PartPurchaseEventImportSerializer(serializers.ModelSerializer):
+    """Validates a part purchase event of a bulk import. Foreign keys are plain ids, checked once per batch."""
+    part = serializers.IntegerField(source='part_id')
+    provider = serializers.IntegerField(source='provider_id')
+
+    class Meta:
+        model = PartPurchaseEvent
+        fields = ["part", "provider", "purchase_date", "cost"]
+
+
+class ServiceProviderEventImportSerializer(serializers.ModelSerializer):
+    """Validates a service provider event of a bulk import. Foreign keys are plain ids, checked once per batch."""
+    service_provider = serializers.IntegerField(source='service_provider_id')
+
+    class Meta:
+        model = ServiceProviderEvent
+        fields = ["service_provider", "service_date", "cost", "description"]
+
+
+class MaintenanceReportImportSerializer(serializers.ModelSerializer):
+    """
+    Validates a maintenance report of a bulk import without touching the database.
+
+    The vehicle, part and provider ids are only checked for their type here: the import service resolves them for a
+    whole batch at once instead of running one query per related field and row.
+    """
+    vehicle = serializers.IntegerField(source='vehicle_id')
+    part_purchase_events = PartPurchaseEventImportSerializer(many=True, required=False)
+    service_provider_events = ServiceProviderEventImportSerializer(many=True)
+
+    class Meta:
+        model = MaintenanceReport
+        fields = ["vehicle", "maintenance_type", "start_date", "end_date", "description", "mileage", "part_purchase_events", "service_provider_events"]
+
+    def validate_service_provider_events(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one service provider event is required")
+        return value
+
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({"end_date": "End date cannot be before start date."})
+        return attrs
@@ -1,13 +1,16 @@
 from collections import defaultdict, OrderedDict
-from datetime import timedelta, datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
 from typing import Optional, DefaultDict, Any, Union
 
-from django.db.models import Sum, F, Q, ExpressionWrapper, DurationField, Avg, Case, When, FloatField, Value, CharField, Count
-from django.db.models.functions import Round, ExtractYear, ExtractQuarter, ExtractMonth
+from django.db import connection
+from django.db.models import Sum, Q, Count, F, ExpressionWrapper, IntegerField
+from django.db.models.functions import ExtractYear, ExtractQuarter, ExtractMonth
 from django.utils.timezone import now
 from rest_framework.exceptions import ValidationError
 
-from maintenance.models import MaintenanceReport, PartPurchaseEvent
+from maintenance.models import MaintenanceReport, MaintenanceCostRollup, PartUsageCounter
+from maintenance.queries import COMBINED_YEARLY_DATA_QUERY, VEHICLES_YEARLY_DATA_QUERY
 from maintenance.utils import has_gap_between_periods
 from vehicles.models import Vehicle
 
@@ -24,6 +27,9 @@ class FleetHealthService:
         into three health levels: good, warning, and critical. The computed metrics
         are returned in a formatted structure.
 
+        The fleet is read with a single query that pulls only the date columns needed to compute the gaps, and one
+        pass over the rows produces both the percentages and the warning/critical vehicle lists.
+
         Returns:
             tuple[dict, dict]: A tuple containing:
                 1. A dictionary with aggregated health metrics for vehicles, categorized into service
@@ -33,83 +39,70 @@ class FleetHealthService:
                    each health category and status
         """
         current = now().date()
-        thirty = timedelta(days=30)
-        zero = timedelta(days=0)
         filters = Q(profile__user=user)
         filters &= Q(type=vehicle_type) if vehicle_type else Q()
-        raw_health_metrics = Vehicle.objects.filter(filters).annotate(
-            service_gap=ExpressionWrapper(
-                F('next_service_due') - F('last_service_date'), output_field=DurationField()
-            ),
-            insurance_gap=ExpressionWrapper(
-                F('insurance_expiry_date') - current, output_field=DurationField()
-            ),
-            license_gap=ExpressionWrapper(
-                F('license_expiry_date') - current, output_field=DurationField()
-            ),
-        )
-
-        # Get aggregated percentages
-        health_percentages = raw_health_metrics.aggregate(
-            # Service health metrics
-            vehicle_avg_health__good=Round(Avg(Case(When(service_gap__gt=thirty, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-            vehicle_avg_health__warning=Round(Avg(Case(When(service_gap__gt=zero, service_gap__lte=thirty, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-            vehicle_avg_health__critical=Round(Avg(Case(When(service_gap__lte=zero, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-
-            # Insurance health metrics
-            vehicle_insurance_health__good=Round(Avg(Case(When(insurance_gap__gt=thirty, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-            vehicle_insurance_health__warning=Round(Avg(Case(When(insurance_gap__gt=zero, insurance_gap__lte=thirty, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-            vehicle_insurance_health__critical=Round(Avg(Case(When(insurance_gap__lte=zero, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-
-            # License health metrics
-            vehicle_license_health__good=Round(Avg(Case(When(license_gap__gt=thirty, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-            vehicle_license_health__warning=Round(Avg(Case(When(license_gap__gt=zero, license_gap__lte=thirty, then=1), default=0.0, output_field=FloatField())) * 100, precision=2),
-            vehicle_license_health__critical=Round(Avg(Case(When(license_gap__lte=zero, then=1), default=0.0, output_field=FloatField())) * 100, precision=2)
+        vehicles = Vehicle.objects.filter(filters).values_list(
+            'registration_number', 'make', 'model', 'year', 'last_service_date', 'next_service_due', 'insurance_expiry_date', 'license_expiry_date'
         )
 
-        # Categorize vehicles by their health status and get their IDs
-        with_health_annotation = raw_health_metrics.annotate(
-            service_health=Case(
-                When(service_gap__gt=thirty, then=Value("good")),
-                When(service_gap__gt=zero, service_gap__lte=thirty, then=Value("warning")),
-                default=Value("critical"),
-                output_field=CharField()
-            ),
-            insurance_health=Case(
-                When(insurance_gap__gt=thirty, then=Value("good")),
-                When(insurance_gap__gt=zero, insurance_gap__lte=thirty, then=Value("warning")),
-                default=Value("critical"),
-                output_field=CharField()
-            ),
-            license_health=Case(
-                When(license_gap__gt=thirty, then=Value("good")),
-                When(license_gap__gt=zero, license_gap__lte=thirty, then=Value("warning")),
-                default=Value("critical"),
-                output_field=CharField()
+        # A single scan over the fleet feeds both the percentages and the alert lists
+        health_types = ('vehicle_avg_health', 'vehicle_insurance_health', 'vehicle_license_health')
+        status_counts = {health_type: {'good': 0, 'warning': 0, 'critical': 0} for health_type in health_types}
+        health_vehicles = {health_type: {'warning': [], 'critical': []} for health_type in health_types}
+        vehicles_count = 0
+        for registration_number, make, model, year, last_service_date, next_service_due, insurance_expiry_date, license_expiry_date in vehicles:
+            vehicles_count += 1
+            gaps = (
+                FleetHealthService._get_gap(last_service_date, next_service_due),
+                FleetHealthService._get_gap(current, insurance_expiry_date),
+                FleetHealthService._get_gap(current, license_expiry_date),
             )
-        )
-
-        # Get lists of vehicle names and IDs for each health category
-        health_vehicles = {
-            'vehicle_avg_health': {
-                # 'good': list(with_health_annotation.filter(service_health="good").values_list('registration_number', 'make', 'model', 'year')),
-                'warning': list(with_health_annotation.filter(service_health="warning").values_list('registration_number', 'make', 'model', 'year')),
-                'critical': list(with_health_annotation.filter(service_health="critical").values_list('registration_number', 'make', 'model', 'year'))
-            },
-            'vehicle_insurance_health': {
-                # 'good': list(with_health_annotation.filter(insurance_health="good").values_list('registration_number', 'make', 'model', 'year')),
-                'warning': list(with_health_annotation.filter(insurance_health="warning").values_list('registration_number', 'make', 'model', 'year')),
-                'critical': list(with_health_annotation.filter(insurance_health="critical").values_list('registration_number', 'make', 'model', 'year'))
-            },
-            'vehicle_license_health': {
-                # 'good': list(with_health_annotation.filter(license_health="good").values_list('registration_number', 'make', 'model', 'year')),
-                'warning': list(with_health_annotation.filter(license_health="warning").values_list('registration_number', 'make', 'model', 'year')),
-                'critical': list(with_health_annotation.filter(license_health="critical").values_list('registration_number', 'make', 'model', 'year'))
-            }
+            for health_type, gap in zip(health_types, gaps):
+                health_status = FleetHealthService._get_health_status(gap)
+                if gap is not None:
+                    status_counts[health_type][health_status] += 1
+                if health_status != 'good':
+                    health_vehicles[health_type][health_status].append((registration_number, make, model, year))
+
+        health_percentages = {
+            f'{health_type}__{health_status}': FleetHealthService._get_percentage(count, vehicles_count)
+            for health_type in health_types for health_status, count in status_counts[health_type].items()
         }
 
         return FleetHealthService.format_health_metrics(health_percentages), health_vehicles
 
+    @staticmethod
+    def _get_gap(start: Optional[date], end: Optional[date]) -> Optional[int]:
+        """Returns the number of days between two dates, or None when either date is missing."""
+        if start is None or end is None:
+            return None
+        return (end - start).days
+
+    @staticmethod
+    def _get_health_status(gap: Optional[int]) -> str:
+        """
+        Maps a gap in days to a health status. More than thirty days is good, between one and thirty days is a warning
+        and anything else (including a missing gap) is critical.
+        """
+        if gap is not None and gap > 30:
+            return 'good'
+        if gap is not None and gap > 0:
+            return 'warning'
+        return 'critical'
+
+    @staticmethod
+    def _get_percentage(count: int, total: int) -> Optional[float]:
+        """
+        Returns count / total as a percentage rounded to two decimals, or None for an empty fleet.
+
+        Rounding goes through Decimal with ROUND_HALF_UP on the 15 significant digits PostgreSQL keeps when casting a
+        double to numeric, so the values match what ROUND(AVG(...) * 100, 2) used to return from the database.
+        """
+        if not total:
+            return None
+        percentage = Decimal(f'{count / total * 100:.15g}')
+        return float(percentage.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
     @staticmethod
     def format_health_metrics(raw_health_metrics):
         """
@@ -154,7 +147,8 @@ class FleetMaintenanceService:
             - top_recurring_issues: A list of the top three most frequent maintenance issues.
 
         Notes:
-        Caching of metrics using Redis could be implemented in the future to optimize performance.
+        Maintenance costs come from MaintenanceCostRollup and top recurring issues from PartUsageCounter, rather than
+        from the raw reports and part purchase events.
 
         Raises:
         KeyError
@@ -162,26 +156,26 @@ class FleetMaintenanceService:
         ZeroDivisionError
             If previous year's data is zero when calculating YoY percentage change.
         """
-        # Consider implementing caching using Redis in the future.
+        # Costs are read from the monthly rollups, so this touches at most 24 rows per vehicle type.
         current_year = now().year
         current_month = now().month
         current_quarter = (current_month - 1) // 3
         start_month = current_quarter * 3 + 1
         end_month = start_month + 2
-        filters = Q(profile__user=user, start_date__year=current_year)
-        filters &= Q(vehicle__type=vehicle_type) if vehicle_type else Q()
-        maintenance_cost_metrics = MaintenanceReport.objects.filter(filters).aggregate(
-            total_maintenance_cost__year=Sum('total_cost', default=0),
-            total_maintenance_cost__quarter=Sum('total_cost', filter=Q(start_date__month__range=(start_month, end_month)), default=0),
-            total_maintenance_cost__month=Sum('total_cost', filter=Q(start_date__month=current_month), default=0),
+        filters = Q(profile__user=user, year__in=(current_year, current_year - 1))
+        filters &= Q(vehicle_type=vehicle_type) if vehicle_type else Q()
+        maintenance_cost_metrics = MaintenanceCostRollup.objects.filter(filters).aggregate(
+            total_maintenance_cost__year=Sum('total_cost', filter=Q(year=current_year), default=0),
+            total_maintenance_cost__quarter=Sum('total_cost', filter=Q(year=current_year, month__range=(start_month, end_month)), default=0),
+            total_maintenance_cost__month=Sum('total_cost', filter=Q(year=current_year, month=current_month), default=0),
+            previous_year_total_cost=Sum('total_cost', filter=Q(year=current_year - 1), default=0),
         )
-        filters = Q(maintenance_report__profile__user=user, maintenance_report__start_date__year=current_year)
-        filters &= Q(maintenance_report__vehicle__type=vehicle_type) if vehicle_type else Q()
-        top_recurring_issues = PartPurchaseEvent.objects.filter(filters).values('part__name').annotate(count=Count('id')).order_by('-count', 'part__name')[:3]
+        previous_year_total_cost = maintenance_cost_metrics.pop('previous_year_total_cost')
 
-        filters = Q(profile__user=user, start_date__year=current_year - 1)
+        filters = Q(profile__user=user, year=current_year)
         filters &= Q(vehicle__type=vehicle_type) if vehicle_type else Q()
-        previous_year_total_cost = MaintenanceReport.objects.filter(filters).aggregate(Sum('total_cost', default=0))['total_cost__sum']
+        top_recurring_issues = PartUsageCounter.objects.filter(filters).values('part__name').annotate(count=Sum('count')).order_by('-count', 'part__name')[:3]
+
         yoy = round((maintenance_cost_metrics['total_maintenance_cost__year'] - previous_year_total_cost) / previous_year_total_cost * 100,
                     2) if previous_year_total_cost else 0.0
 
@@ -244,34 +238,21 @@ class FleetMaintenanceService:
         if vehicle_count <= 0:
             raise ValidationError("Cannot process request: No vehicles found in your fleet.")
 
-        # Build filters
-        filters = Q(profile__user=user)
+        # Parse the date range
         if start_date and end_date:
             start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
             end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-            filters &= Q(start_date__gte=start_date, start_date__lte=end_date)
-
-        if vehicle_type:
-            filters &= Q(vehicle__type=vehicle_type)
+        else:
+            start_date = end_date = None
 
-        # Define grouping strategies
-        grouping_strategies = {
-            "yearly": (ExtractYear('start_date'), "yoy_change"),
-            "quarterly": (ExtractQuarter('start_date'), "qoq_change"),
-            "monthly": (ExtractMonth('start_date'), "mom_change")
-        }
+        # Whole months can be answered from the monthly rollups, any other range needs the raw reports
+        if start_date is None or FleetMaintenanceService.covers_whole_months(start_date, end_date):
+            grouped_data = FleetMaintenanceService.get_grouped_costs_from_rollups(user, start_date, end_date, group_by, vehicle_type)
+        else:
+            grouped_data = FleetMaintenanceService.get_grouped_costs_from_reports(user, start_date, end_date, group_by, vehicle_type)
 
-        date_extractor, change_metric_key = grouping_strategies[group_by]
+        change_metric_key = {"yearly": "yoy_change", "quarterly": "qoq_change", "monthly": "mom_change"}[group_by]
 
-        # Get base data
-        grouped_data = list(
-            MaintenanceReport.objects
-            .filter(filters)
-            .annotate(time_period=date_extractor, year=ExtractYear('start_date'))
-            .values('time_period', 'year')
-            .annotate(total_cost=Sum('total_cost'))
-            .order_by('year', 'time_period')
-        )
         grouped_data = FleetMaintenanceService.format_grouped_data(grouped_data, group_by)
         # Calculate derived metrics
         returned_data = defaultdict(lambda: defaultdict(float))
@@ -290,6 +271,70 @@ class FleetMaintenanceService:
             returned_data[time_period][change_metric_key] = change_pct
         return returned_data
 
+    @staticmethod
+    def covers_whole_months(start_date: date, end_date: date) -> bool:
+        """Returns True when the range starts on the first day of a month and ends on the last day of a month."""
+        return start_date.day == 1 and (end_date + timedelta(days=1)).day == 1
+
+    @staticmethod
+    def get_grouped_costs_from_rollups(user, start_date: Optional[date], end_date: Optional[date], group_by: str, vehicle_type: Optional[str]) -> list[dict]:
+        """
+        Sums the monthly cost rollups by time period.
+
+        The date range, when given, must cover whole months (see covers_whole_months).
+
+        Returns:
+            list[dict]: Rows with 'time_period', 'year' and 'total_cost', ordered by year and time period.
+        """
+        filters = Q(profile__user=user)
+        if start_date and end_date:
+            filters &= Q(month_index__gte=start_date.year * 12 + start_date.month, month_index__lte=end_date.year * 12 + end_date.month)
+        if vehicle_type:
+            filters &= Q(vehicle_type=vehicle_type)
+
+        period_extractors = {
+            "yearly": F('year'),
+            "quarterly": ExpressionWrapper((F('month') - 1) / 3 + 1, output_field=IntegerField()),
+            "monthly": F('month'),
+        }
+        return list(
+            MaintenanceCostRollup.objects
+            .annotate(month_index=ExpressionWrapper(F('year') * 12 + F('month'), output_field=IntegerField()))
+            .filter(filters)
+            .annotate(time_period=period_extractors[group_by])
+            .values('time_period', 'year')
+            .annotate(total_cost=Sum('total_cost'))
+            .order_by('year', 'time_period')
+        )
+
+    @staticmethod
+    def get_grouped_costs_from_reports(user, start_date: Optional[date], end_date: Optional[date], group_by: str, vehicle_type: Optional[str]) -> list[dict]:
+        """
+        Sums the maintenance reports by time period.
+
+        Returns:
+            list[dict]: Rows with 'time_period', 'year' and 'total_cost', ordered by year and time period.
+        """
+        filters = Q(profile__user=user)
+        if start_date and end_date:
+            filters &= Q(start_date__gte=start_date, start_date__lte=end_date)
+        if vehicle_type:
+            filters &= Q(vehicle__type=vehicle_type)
+
+        period_extractors = {
+            "yearly": ExtractYear('start_date'),
+            "quarterly": ExtractQuarter('start_date'),
+            "monthly": ExtractMonth('start_date'),
+        }
+        return list(
+            MaintenanceReport.objects
+            .filter(filters)
+            .annotate(time_period=period_extractors[group_by], year=ExtractYear('start_date'))
+            .values('time_period', 'year')
+            .annotate(total_cost=Sum('total_cost'))
+            .order_by('year', 'time_period')
+        )
+
     @staticmethod
     def format_grouped_data(grouped_data, group_by):
         """
@@ -319,6 +364,122 @@ class FleetMaintenanceService:
 
 
 class VehicleMaintenanceService:
+    TOP_PARTS = 3
+
+    @staticmethod
+    def get_yearly_maintenance_rows(vehicle_id: int, profile_id: int) -> list[tuple]:
+        """
+        Returns the yearly and monthly maintenance rows of a vehicle, from COMBINED_YEARLY_DATA_QUERY on PostgreSQL and
+        from aggregate_yearly_maintenance_rows on the other backends.
+        """
+        if connection.vendor != 'postgresql':
+            return VehicleMaintenanceService.aggregate_yearly_maintenance_rows(vehicle_id, profile_id)
+        with connection.cursor() as cursor:
+            cursor.execute(COMBINED_YEARLY_DATA_QUERY, {'vehicle_id': vehicle_id, 'profile_id': profile_id})
+            return cursor.fetchall()
+
+    @staticmethod
+    def get_vehicles_yearly_maintenance_rows(vehicle_ids: list[int], profile_id: int) -> dict[int, list[tuple]]:
+        """
+        Returns the rows of get_yearly_maintenance_rows of several vehicles by vehicle id, computed in a single query.
+        Vehicles without reports have no entry.
+        """
+        if connection.vendor != 'postgresql':
+            return VehicleMaintenanceService.aggregate_vehicles_yearly_maintenance_rows(vehicle_ids, profile_id)
+        rows = defaultdict(list)
+        with connection.cursor() as cursor:
+            cursor.execute(VEHICLES_YEARLY_DATA_QUERY, {'vehicle_ids': list(vehicle_ids), 'profile_id': profile_id})
+            for vehicle_id, *row in cursor.fetchall():
+                rows[vehicle_id].append(tuple(row))
+        return dict(rows)
+
+    @staticmethod
+    def aggregate_yearly_maintenance_rows(vehicle_id: int, profile_id: int) -> list[tuple]:
+        """
+        Builds the rows of COMBINED_YEARLY_DATA_QUERY from the monthly costs and part usage counters, for any database backend.
+
+        The yearly figures, the changes from the previous period and the part ranks are computed in Python, and the
+        numbers are Decimals like the ones PostgreSQL returns, so both implementations return identical rows.
+        """
+        return VehicleMaintenanceService.aggregate_vehicles_yearly_maintenance_rows([vehicle_id], profile_id).get(vehicle_id, [])
+
+    @staticmethod
+    def aggregate_vehicles_yearly_maintenance_rows(vehicle_ids: list[int], profile_id: int) -> dict[int, list[tuple]]:
+        """Builds the rows of aggregate_yearly_maintenance_rows of several vehicles by vehicle id, with the same two queries."""
+        monthly_costs = (
+            MaintenanceReport.objects.filter(vehicle_id__in=vehicle_ids, profile_id=profile_id)
+            .annotate(year=ExtractYear('start_date'), month=ExtractMonth('start_date'))
+            .values('vehicle_id', 'year', 'month')
+            .annotate(total_cost=Sum('total_cost'))
+            .order_by()
+        )
+        monthly_parts = (
+            PartUsageCounter.objects.filter(vehicle_id__in=vehicle_ids, profile_id=profile_id)
+            .values('vehicle_id', 'year', 'month', 'part__name')
+            .annotate(count=Sum('count'), part_cost=Sum('total_cost'))
+            .order_by()
+        )
+
+        costs_by_vehicle, parts_by_vehicle = defaultdict(list), defaultdict(list)
+        for entry in monthly_costs:
+            costs_by_vehicle[entry['vehicle_id']].append(entry)
+        for entry in monthly_parts:
+            parts_by_vehicle[entry['vehicle_id']].append(entry)
+        return {vehicle_id: VehicleMaintenanceService._build_yearly_rows(costs, parts_by_vehicle[vehicle_id])
+                for vehicle_id, costs in costs_by_vehicle.items()}
+
+    @staticmethod
+    def _build_yearly_rows(monthly_costs: list[dict], monthly_parts: list[dict]) -> list[tuple]:
+        """Builds the rows of a vehicle from its monthly costs and its monthly purchases of every part."""
+        yearly_totals, monthly_totals = defaultdict(int), defaultdict(dict)
+        for entry in monthly_costs:
+            yearly_totals[entry['year']] += entry['total_cost']
+            monthly_totals[entry['year']][entry['month']] = entry['total_cost']
+
+        yearly_part_totals, monthly_part_totals = defaultdict(lambda: defaultdict(lambda: [0, 0])), defaultdict(list)
+        for entry in monthly_parts:
+            totals = yearly_part_totals[entry['year']][entry['part__name']]
+            totals[0] += entry['count']
+            totals[1] += entry['part_cost']
+            monthly_part_totals[(entry['year'], entry['month'])].append((entry['part__name'], entry['count'], entry['part_cost']))
+
+        rows = [('yearly_cost', Decimal(year), None, *VehicleMaintenanceService._get_cost_columns(total_cost, previous_cost), None, None, None, None)
+                for year, total_cost, previous_cost in VehicleMaintenanceService._with_previous(sorted(yearly_totals.items()))]
+        for year in sorted(monthly_totals):
+            rows.extend(
+                ('monthly_cost', Decimal(year), Decimal(month), *VehicleMaintenanceService._get_cost_columns(total_cost, previous_cost), None, None, None, None)
+                for month, total_cost, previous_cost in VehicleMaintenanceService._with_previous(sorted(monthly_totals[year].items()))
+            )
+        for year in sorted(yearly_part_totals):
+            parts = [(part_name, count, part_cost) for part_name, (count, part_cost) in yearly_part_totals[year].items()]
+            rows.extend(('yearly_part', Decimal(year), None, None, None, None, *part) for part in VehicleMaintenanceService._rank_parts(parts))
+        for year, month in sorted(monthly_part_totals):
+            parts = monthly_part_totals[(year, month)]
+            rows.extend(('monthly_part', Decimal(year), Decimal(month), None, None, None, *part) for part in VehicleMaintenanceService._rank_parts(parts))
+        return rows
+
+    @staticmethod
+    def _with_previous(totals):
+        """Yields (key, total, previous total) for (key, total) pairs, with a previous total of 0 for the first one."""
+        previous_total = 0
+        for key, total in totals:
+            yield key, total, previous_total
+            previous_total = total
+
+    @staticmethod
+    def _get_cost_columns(total_cost: int, previous_cost: int) -> tuple:
+        """Returns the total_cost, previous_cost and change_pct columns, with no change when there is no previous cost."""
+        change_pct = None
+        if previous_cost:
+            change_pct = (Decimal(100) * (total_cost - previous_cost) / previous_cost).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        return Decimal(total_cost), Decimal(previous_cost), change_pct
+
+    @staticmethod
+    def _rank_parts(parts: list[tuple]) -> list[tuple]:
+        """Returns the most purchased (part_name, count, part_cost) entries with their rank, ties broken by part name."""
+        ranked = sorted(parts, key=lambda part: (-part[1], part[0]))[:VehicleMaintenanceService.TOP_PARTS]
+        return [(part_name, count, Decimal(part_cost), rank) for rank, (part_name, count, part_cost) in enumerate(ranked, start=1)]
+
     @staticmethod
     def format_yearly_maintenance_data(cursor_results):
         """
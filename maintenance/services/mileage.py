@@ -0,0 +1,56 @@
+import threading
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from maintenance.models import MaintenanceReport
+from vehicles.models import Vehicle
+
+_pending = threading.local()
+
+
+def refresh_vehicle_mileage(vehicle_ids: Iterable[int]) -> int:
+    """
+    Sets the mileage of the given vehicles from their latest maintenance report, in a single UPDATE.
+
+    This is the set-based equivalent of the mileage signals in maintenance/signals.py: a vehicle takes the mileage of
+    its latest report by start_date, keeps its own mileage if that report has none, and falls back to 0 when it has no
+    report left.
+
+    Returns:
+        int: The number of vehicles updated.
+    """
+    vehicle_ids = set(vehicle_ids)
+    if not vehicle_ids:
+        return 0
+
+    reports = MaintenanceReport.objects.filter(vehicle=OuterRef('pk'))
+    latest_mileage = reports.order_by('-start_date', '-pk').values('mileage')[:1]
+    return Vehicle.objects.filter(pk__in=vehicle_ids).update(
+        mileage=Case(
+            When(Exists(reports), then=Coalesce(Subquery(latest_mileage), F('mileage'))),
+            default=Value(0),
+        )
+    )
+
+
+def schedule_vehicle_mileage_refresh(vehicle_id: int) -> None:
+    """
+    Marks a vehicle's mileage as stale and refreshes it once the current transaction is committed.
+
+    The vehicle ids marked during a transaction are coalesced: the first callback that runs after the commit refreshes
+    all of them with a single `refresh_vehicle_mileage` call and the others find nothing left to do. Ids left over by
+    a rolled back transaction are refreshed with the next commit, which is harmless since the refresh is idempotent.
+    Outside of a transaction the refresh runs immediately.
+    """
+    if not hasattr(_pending, 'vehicle_ids'):
+        _pending.vehicle_ids = set()
+    _pending.vehicle_ids.add(vehicle_id)
+    transaction.on_commit(_refresh_pending_vehicle_mileage)
+
+
+def _refresh_pending_vehicle_mileage() -> None:
+    vehicle_ids, _pending.vehicle_ids = _pending.vehicle_ids, set()
+    refresh_vehicle_mileage(vehicle_ids)
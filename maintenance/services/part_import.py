@@ -0,0 +1,110 @@
+import csv
+from itertools import islice
+from typing import Iterable
+
+from django.db import IntegrityError, transaction
+
+from maintenance.caching import bump_general_data_version
+from maintenance.models import Part
+
+
+class PartCSVImportService:
+    """
+    Imports parts from a CSV file with `name` and `description` columns.
+
+    Rows are streamed from the file and handled in chunks: every chunk is deduplicated against the database with a
+    single lookup on the unique `Part.name` index and inserted with one `bulk_create`, so memory stays bounded by the
+    chunk size whatever the size of the file. Invalid rows are reported instead of aborting the import.
+
+    Every chunk is committed on its own, so `get_summary` still describes what was imported if a later chunk fails.
+    """
+    CHUNK_SIZE = 1000
+    MAX_REPORTED_ERRORS = 1000
+    MAX_ATTEMPTS = 3
+    REQUIRED_COLUMNS = ('name', 'description')
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+    def import_file(self, text_file) -> dict:
+        """
+        Imports every row of the given text file.
+
+        Args:
+            text_file: A file-like object opened in text mode.
+
+        Returns:
+            dict: The number of created and skipped parts, the number of invalid rows and the first
+            `MAX_REPORTED_ERRORS` row errors.
+
+        Raises:
+            ValueError: If the file has no header or is missing one of the required columns.
+        """
+        reader = csv.DictReader(text_file)
+        missing_columns = [column for column in self.REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+        rows = ((reader.line_num, row) for row in reader)
+        while chunk := list(islice(rows, self.chunk_size)):
+            self.import_chunk(chunk)
+
+        return self.get_summary()
+
+    def get_summary(self) -> dict:
+        return {"created": self.created, "skipped": self.skipped, "error_count": self.error_count, "errors": self.errors}
+
+    def import_chunk(self, chunk: Iterable[tuple[int, dict]]):
+        parts_by_name = {}
+        for line, row in chunk:
+            error = self.validate_row(row)
+            if error:
+                self.add_error(line, error)
+            elif row['name'] in parts_by_name:
+                self.skipped += 1
+            else:
+                parts_by_name[row['name']] = Part(name=row['name'], description=row['description'])
+
+        existing_names = self.get_existing_names(parts_by_name)
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            parts_to_create = [part for name, part in parts_by_name.items() if name not in existing_names]
+            try:
+                with transaction.atomic():
+                    Part.objects.bulk_create(parts_to_create, batch_size=self.chunk_size)
+                break
+            except IntegrityError:
+                # Parts created concurrently since the lookup are skipped like the existing ones, and only the parts that
+                # were actually inserted are counted as created
+                taken = self.get_existing_names(parts_by_name) - existing_names
+                if not taken or attempt == self.MAX_ATTEMPTS:
+                    raise
+                existing_names |= taken
+
+        if parts_to_create:
+            # bulk_create does not send post_save, so the cached general data is invalidated here
+            bump_general_data_version()
+        self.created += len(parts_to_create)
+        self.skipped += len(existing_names)
+
+    @staticmethod
+    def get_existing_names(names: Iterable[str]) -> set:
+        return set(Part.objects.filter(name__in=names).values_list('name', flat=True))
+
+    def validate_row(self, row: dict):
+        name, description = row.get('name'), row.get('description')
+        if not name:
+            return "Name is required."
+        if not description:
+            return "Description is required."
+        if len(name) > Part._meta.get_field('name').max_length:
+            return f"Name must be at most {Part._meta.get_field('name').max_length} characters long."
+        return None
+
+    def add_error(self, line: int, error: str):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "error": error})
@@ -0,0 +1,150 @@
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Sum, Count, Q, F
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+from maintenance.models import PartPurchaseEvent, PartUsageCounter
+from vehicles.models import Vehicle
+
+# A bucket holds the PartUsageCounter rows of every part for one (profile_id, vehicle_id, year, month)
+Bucket = tuple[int, int, int, int]
+
+_pending = threading.local()
+
+
+class PartUsageCounterService:
+    @staticmethod
+    def get_bucket(profile_id: int, vehicle_id: int, start_date) -> Bucket:
+        return profile_id, vehicle_id, start_date.year, start_date.month
+
+    @staticmethod
+    def get_report_bucket(report) -> Bucket:
+        return PartUsageCounterService.get_bucket(report.profile_id, report.vehicle_id, report.start_date)
+
+    @staticmethod
+    def aggregate_events(filters: Optional[Q] = None):
+        """
+        Aggregates part purchase events into usage counters.
+
+        Args:
+            filters: Optional filters applied to the events before grouping.
+
+        Returns:
+            QuerySet of dictionaries with the keys profile_id, vehicle_id, part_id, year, month, count and total_cost.
+        """
+        events = PartPurchaseEvent.objects.all()
+        if filters is not None:
+            events = events.filter(filters)
+        return (
+            events
+            .annotate(profile_id=F('maintenance_report__profile_id'), vehicle_id=F('maintenance_report__vehicle_id'),
+                      year=ExtractYear('maintenance_report__start_date'), month=ExtractMonth('maintenance_report__start_date'))
+            .values('profile_id', 'vehicle_id', 'part_id', 'year', 'month')
+            .annotate(count=Count('id'), total_cost=Sum('cost'))
+            .order_by()
+        )
+
+    @staticmethod
+    def refresh_buckets(buckets: Iterable[Bucket]) -> None:
+        """
+        Recomputes the usage counters of the given buckets from the live part purchase events.
+
+        Only the events of the reports in the buckets are aggregated, so a refresh is bounded by the purchases of one
+        vehicle in one month. Counters of parts that are no longer purchased in a bucket are removed.
+
+        A bucket has no row of its own to lock, so refreshes are serialized on the rows of its vehicles, taken with FOR
+        NO KEY UPDATE so that the reports and events referencing them are not blocked. The events are only aggregated
+        once the locks are held and the counters are upserted, so concurrent refreshes of a bucket neither fail on
+        `unique_part_usage_counter` nor lose each other's purchases.
+        """
+        buckets = set(buckets)
+        if not buckets:
+            return
+
+        event_filters = reduce(or_, (
+            Q(maintenance_report__profile_id=profile_id, maintenance_report__vehicle_id=vehicle_id,
+              maintenance_report__start_date__year=year, maintenance_report__start_date__month=month)
+            for profile_id, vehicle_id, year, month in buckets
+        ))
+
+        with transaction.atomic():
+            vehicle_ids = sorted({vehicle_id for _, vehicle_id, _, _ in buckets})
+            list(Vehicle.objects.select_for_update(no_key=True).filter(pk__in=vehicle_ids).order_by('pk').values_list('pk', flat=True))
+
+            counters = sorted(
+                (PartUsageCounter(**row) for row in PartUsageCounterService.aggregate_events(event_filters)),
+                key=lambda counter: (counter.profile_id, counter.vehicle_id, counter.year, counter.month, counter.part_id),
+            )
+            if counters:
+                PartUsageCounter.objects.bulk_create(
+                    counters, update_conflicts=True, unique_fields=['profile', 'vehicle', 'year', 'month', 'part'], update_fields=['count', 'total_cost']
+                )
+
+            purchased_parts = defaultdict(set)
+            for counter in counters:
+                purchased_parts[(counter.profile_id, counter.vehicle_id, counter.year, counter.month)].add(counter.part_id)
+            PartUsageCounter.objects.filter(reduce(or_, (
+                Q(profile_id=profile_id, vehicle_id=vehicle_id, year=year, month=month)
+                & ~Q(part_id__in=purchased_parts[(profile_id, vehicle_id, year, month)])
+                for profile_id, vehicle_id, year, month in buckets
+            ))).delete()
+
+    @staticmethod
+    def schedule_refresh(buckets: Iterable[Bucket]) -> None:
+        """
+        Marks buckets as stale and refreshes them once the current transaction is committed.
+
+        Report and event writes call this rather than `refresh_buckets`, so that the vehicle locks of the refresh are
+        never taken inside their transaction: these only lock the report, then its events, then the cost rollups, and
+        cannot deadlock with each other on the vehicle rows. Like the mileage refresh, the buckets marked during a
+        transaction are coalesced into one refresh and a refresh outside of a transaction runs immediately.
+        """
+        buckets = set(buckets) - {None}
+        if not buckets:
+            return
+        if not hasattr(_pending, 'buckets'):
+            _pending.buckets = set()
+        _pending.buckets |= buckets
+        transaction.on_commit(_refresh_pending_buckets)
+
+    @staticmethod
+    def rebuild() -> int:
+        """Rebuilds the whole counter table from the live part purchase events and returns the number of rows created."""
+        counters = [PartUsageCounter(**row) for row in PartUsageCounterService.aggregate_events().iterator()]
+        with transaction.atomic():
+            PartUsageCounter.objects.all().delete()
+            PartUsageCounter.objects.bulk_create(counters, batch_size=1000)
+        return len(counters)
+
+    @staticmethod
+    def verify() -> list[dict]:
+        """
+        Compares the counter table against live aggregates.
+
+        Returns:
+            list[dict]: One entry per mismatching counter with the expected (live) and actual (counter) values.
+        """
+        fields = ('profile_id', 'vehicle_id', 'part_id', 'year', 'month')
+        expected = {
+            tuple(row[field] for field in fields): (row['count'], row['total_cost'])
+            for row in PartUsageCounterService.aggregate_events().iterator()
+        }
+        actual = {
+            tuple(row[field] for field in fields): (row['count'], row['total_cost'])
+            for row in PartUsageCounter.objects.values(*fields, 'count', 'total_cost').iterator()
+        }
+        mismatches = []
+        for key in sorted(expected.keys() | actual.keys()):
+            if expected.get(key) != actual.get(key):
+                mismatches.append({**dict(zip(fields, key)), 'expected': expected.get(key, (0, 0)), 'actual': actual.get(key, (0, 0))})
+        return mismatches
+
+
+def _refresh_pending_buckets() -> None:
+    buckets, _pending.buckets = _pending.buckets, set()
+    PartUsageCounterService.refresh_buckets(buckets)
@@ -0,0 +1,121 @@
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from maintenance.models import MaintenanceReport, PartPurchaseEvent, ServiceProviderEvent
+from maintenance.services.rollups import MaintenanceCostRollupService
+
+
+class ReportCostBreakdownService:
+    """
+    Keeps the denormalized cost breakdown of maintenance reports (total_cost, parts_cost, service_cost,
+    part_event_count and service_event_count) in line with their events. The total cost is always the sum of the parts
+    and service costs.
+    """
+    FIELDS = ('total_cost', 'parts_cost', 'service_cost', 'part_event_count', 'service_event_count')
+
+    @staticmethod
+    def get_breakdown(part_purchase_events: list[dict], service_provider_events: list[dict]) -> dict:
+        """Returns the breakdown of a report from the data of its events, without querying them."""
+        parts_cost = sum(event.get('cost', 0) for event in part_purchase_events)
+        service_cost = sum(event.get('cost', 0) for event in service_provider_events)
+        return {
+            'total_cost': parts_cost + service_cost,
+            'parts_cost': parts_cost,
+            'service_cost': service_cost,
+            'part_event_count': len(part_purchase_events),
+            'service_event_count': len(service_provider_events),
+        }
+
+    @staticmethod
+    def get_live_breakdown() -> dict:
+        """Returns the breakdown computed from the event tables, as expressions over MaintenanceReport rows."""
+        def aggregate(model, expression):
+            events = model.objects.filter(maintenance_report=OuterRef('pk')).order_by().values('maintenance_report')
+            return Coalesce(Subquery(events.annotate(value=expression).values('value')), Value(0), output_field=IntegerField())
+
+        parts_cost, service_cost = aggregate(PartPurchaseEvent, Sum('cost')), aggregate(ServiceProviderEvent, Sum('cost'))
+        return {
+            'total_cost': parts_cost + service_cost,
+            'parts_cost': parts_cost,
+            'service_cost': service_cost,
+            'part_event_count': aggregate(PartPurchaseEvent, Count('id')),
+            'service_event_count': aggregate(ServiceProviderEvent, Count('id')),
+        }
+
+    @staticmethod
+    def get_stale_reports(report_ids: Optional[Iterable[int]] = None):
+        """Returns the reports whose stored breakdown differs from their events, annotated with the live values."""
+        reports = MaintenanceReport.objects.all()
+        if report_ids is not None:
+            reports = reports.filter(pk__in=set(report_ids))
+        live_breakdown = {f'live_{field}': expression for field, expression in ReportCostBreakdownService.get_live_breakdown().items()}
+        up_to_date = Q(**{field: F(f'live_{field}') for field in ReportCostBreakdownService.FIELDS})
+        return reports.annotate(**live_breakdown).exclude(up_to_date)
+
+    @staticmethod
+    def refresh_reports(report_ids: Iterable[int]) -> int:
+        """
+        Recomputes the breakdown of the given reports from their events, in a single UPDATE.
+
+        The UPDATE does not send the report signals, so the cost rollups of the reports are refreshed here as well.
+
+        Returns:
+            int: The number of reports updated.
+        """
+        report_ids = set(report_ids) - {None}
+        if not report_ids:
+            return 0
+        return ReportCostBreakdownService.update_reports(MaintenanceReport.objects.filter(pk__in=report_ids))
+
+    @staticmethod
+    def lock_reports(report_ids: Iterable[int]) -> None:
+        """
+        Locks the rows of the given reports, in primary key order, until the end of the current transaction.
+
+        Every write to a report or its events locks the report rows first, so the event rows of a report are only locked
+        by the transaction holding it, and the cost rollup rows, locked in key order, cannot be waited on in a cycle.
+        Report updates lock their report with their UPDATE, which comes first; event writes and report deletions, which
+        would otherwise reach the report after its events, call this beforehand.
+        """
+        report_ids = sorted(set(report_ids) - {None})
+        if report_ids:
+            list(MaintenanceReport.objects.select_for_update().filter(pk__in=report_ids).order_by('pk').values_list('pk', flat=True))
+
+    @staticmethod
+    def verify() -> list[dict]:
+        """
+        Compares the stored breakdown of every report against its events.
+
+        Returns:
+            list[dict]: One entry per mismatching report with the expected (live) and actual (stored) values.
+        """
+        fields = ReportCostBreakdownService.FIELDS
+        stale_reports = ReportCostBreakdownService.get_stale_reports().order_by('pk').values('pk', *fields, *(f'live_{field}' for field in fields))
+        return [
+            {
+                'report_id': report['pk'],
+                'expected': tuple(report[f'live_{field}'] for field in fields),
+                'actual': tuple(report[field] for field in fields),
+            }
+            for report in stale_reports.iterator()
+        ]
+
+    @staticmethod
+    def repair() -> int:
+        """Recomputes the breakdown of every stale report in a single UPDATE and returns the number of reports repaired."""
+        stale_report_ids = list(ReportCostBreakdownService.get_stale_reports().values_list('pk', flat=True))
+        return ReportCostBreakdownService.update_reports(MaintenanceReport.objects.filter(pk__in=stale_report_ids))
+
+    @staticmethod
+    def update_reports(reports) -> int:
+        """Writes the live breakdown of the given reports and refreshes the cost rollup buckets their totals fall into."""
+        with transaction.atomic():
+            updated = reports.update(**ReportCostBreakdownService.get_live_breakdown())
+            MaintenanceCostRollupService.refresh_buckets(
+                MaintenanceCostRollupService.get_bucket(profile_id, vehicle_type, start_date)
+                for profile_id, vehicle_type, start_date in reports.values_list('profile_id', 'vehicle__type', 'start_date')
+            )
+        return updated
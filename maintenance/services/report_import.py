@@ -0,0 +1,175 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from maintenance.caching import bump_vehicle_overview_versions
+from maintenance.models import MaintenanceReport, PartPurchaseEvent, ServiceProviderEvent, Part, PartsProvider, ServiceProvider
+from maintenance.serializers import MaintenanceReportImportSerializer
+from maintenance.services.mileage import refresh_vehicle_mileage
+from maintenance.services.part_usage import PartUsageCounterService
+from maintenance.services.report_costs import ReportCostBreakdownService
+from maintenance.services.rollups import MaintenanceCostRollupService
+from vehicles.models import Vehicle
+
+
+class MaintenanceReportImportService:
+    """
+    Imports historical maintenance reports, with their part purchase and service provider events, for a profile.
+
+    Rows are streamed from a JSON Lines or CSV file and handled in batches. Each batch is validated without per-row
+    queries, its foreign keys are resolved with one query per related model, and it is inserted in its own transaction
+    with one `bulk_create` per table. bulk_create does not send signals, so the vehicle mileage, the cost rollups, the
+    part usage counters and the cached overviews of everything that was imported are refreshed once at the end
+    instead of once per report, in slices of `refresh_chunk_size` vehicles or buckets with a transaction each.
+
+    In CSV files, `part_purchase_events` and `service_provider_events` hold JSON arrays of events.
+    """
+    BATCH_SIZE = 500
+    REFRESH_CHUNK_SIZE = 200
+    MAX_REPORTED_ERRORS = 1000
+    EVENT_COLUMNS = ('part_purchase_events', 'service_provider_events')
+
+    def __init__(self, profile, batch_size: int = BATCH_SIZE, refresh_chunk_size: int = REFRESH_CHUNK_SIZE):
+        self.profile = profile
+        self.batch_size = batch_size
+        self.refresh_chunk_size = refresh_chunk_size
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.vehicle_ids = set()
+        self.buckets = set()
+        self.part_usage_buckets = set()
+
+    def import_jsonl(self, text_file) -> dict:
+        return self.import_rows(self.read_jsonl(text_file))
+
+    def import_csv(self, text_file) -> dict:
+        return self.import_rows(self.read_csv(text_file))
+
+    def import_rows(self, rows) -> dict:
+        """
+        Imports `(line, data)` rows and returns a summary of the import.
+
+        Batches that were inserted stay inserted if a later one fails, and the vehicle mileage, cost rollups, part usage
+        counters and cached overviews are refreshed for them in any case. `get_summary` then describes what was imported.
+        """
+        try:
+            while batch := list(islice(rows, self.batch_size)):
+                self.import_batch(batch)
+        finally:
+            self.refresh_in_chunks(refresh_vehicle_mileage, self.vehicle_ids)
+            self.refresh_in_chunks(MaintenanceCostRollupService.refresh_buckets, self.buckets)
+            self.refresh_in_chunks(PartUsageCounterService.refresh_buckets, self.part_usage_buckets)
+            bump_vehicle_overview_versions(self.vehicle_ids)
+
+        return self.get_summary()
+
+    def refresh_in_chunks(self, refresh, keys):
+        """
+        Calls `refresh` on sorted slices of `keys`, each in its own transaction, so that a large import neither builds
+        one filter over every vehicle or bucket it touched nor holds the locks of all of them at once.
+        """
+        keys = sorted(keys)
+        for start in range(0, len(keys), self.refresh_chunk_size):
+            with transaction.atomic():
+                refresh(keys[start:start + self.refresh_chunk_size])
+
+    def get_summary(self) -> dict:
+        return {"created": self.created, "error_count": self.error_count, "errors": self.errors}
+
+    def read_jsonl(self, text_file):
+        for line, content in enumerate(text_file, start=1):
+            if not content.strip():
+                continue
+            try:
+                yield line, json.loads(content)
+            except json.JSONDecodeError as e:
+                self.add_error(line, {"non_field_errors": [f"Invalid JSON: {e.msg}"]})
+
+    def read_csv(self, text_file):
+        reader = csv.DictReader(text_file)
+        for row in reader:
+            # Empty cells are treated as missing values so that optional columns fall back to their defaults
+            data = {key: value for key, value in row.items() if key and value not in ('', None)}
+            try:
+                for column in self.EVENT_COLUMNS:
+                    if column in data:
+                        data[column] = json.loads(data[column])
+            except json.JSONDecodeError as e:
+                self.add_error(reader.line_num, {column: [f"Invalid JSON: {e.msg}"]})
+                continue
+            yield reader.line_num, data
+
+    def import_batch(self, batch):
+        validated_rows = []
+        for line, data in batch:
+            serializer = MaintenanceReportImportSerializer(data=data)
+            if serializer.is_valid():
+                validated_rows.append((line, serializer.validated_data))
+            else:
+                self.add_error(line, serializer.errors)
+
+        vehicle_types = dict(
+            Vehicle.objects.filter(profile=self.profile, pk__in={data['vehicle_id'] for _, data in validated_rows}).values_list('pk', 'type')
+        )
+        part_ids = self.get_existing_ids(Part, validated_rows, 'part_purchase_events', 'part_id')
+        provider_ids = self.get_existing_ids(PartsProvider, validated_rows, 'part_purchase_events', 'provider_id')
+        service_provider_ids = self.get_existing_ids(ServiceProvider, validated_rows, 'service_provider_events', 'service_provider_id')
+
+        rows_to_create = []
+        for line, data in validated_rows:
+            errors = {}
+            if data['vehicle_id'] not in vehicle_types:
+                errors['vehicle'] = ["Vehicle does not exist."]
+            for event in data.get('part_purchase_events', []):
+                if event['part_id'] not in part_ids:
+                    errors.setdefault('part_purchase_events', []).append(f"Part {event['part_id']} does not exist.")
+                if event['provider_id'] not in provider_ids:
+                    errors.setdefault('part_purchase_events', []).append(f"Parts provider {event['provider_id']} does not exist.")
+            for event in data['service_provider_events']:
+                if event['service_provider_id'] not in service_provider_ids:
+                    errors.setdefault('service_provider_events', []).append(f"Service provider {event['service_provider_id']} does not exist.")
+            if errors:
+                self.add_error(line, errors)
+            else:
+                rows_to_create.append(data)
+
+        if not rows_to_create:
+            return
+
+        with transaction.atomic():
+            reports = MaintenanceReport.objects.bulk_create([self.build_report(data) for data in rows_to_create])
+            PartPurchaseEvent.objects.bulk_create([
+                PartPurchaseEvent(maintenance_report=report, **event)
+                for report, data in zip(reports, rows_to_create) for event in data.get('part_purchase_events', [])
+            ])
+            ServiceProviderEvent.objects.bulk_create([
+                ServiceProviderEvent(maintenance_report=report, **event)
+                for report, data in zip(reports, rows_to_create) for event in data['service_provider_events']
+            ])
+
+        self.created += len(reports)
+        for report, data in zip(reports, rows_to_create):
+            self.vehicle_ids.add(report.vehicle_id)
+            self.buckets.add(MaintenanceCostRollupService.get_bucket(self.profile.id, vehicle_types[report.vehicle_id], report.start_date))
+            if data.get('part_purchase_events'):
+                self.part_usage_buckets.add(PartUsageCounterService.get_report_bucket(report))
+
+    def build_report(self, data):
+        report_data = {key: value for key, value in data.items() if key not in self.EVENT_COLUMNS}
+        breakdown = ReportCostBreakdownService.get_breakdown(data.get('part_purchase_events', []), data['service_provider_events'])
+        return MaintenanceReport(profile=self.profile, **breakdown, **report_data)
+
+    @staticmethod
+    def get_existing_ids(model, validated_rows, events_key, id_key):
+        ids = {event[id_key] for _, data in validated_rows for event in data.get(events_key, [])}
+        if not ids:
+            return set()
+        return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line, "errors": errors})
@@ -0,0 +1,104 @@
+from functools import reduce
+from operator import or_
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Sum, Count, Q, F
+from django.db.models.functions import ExtractYear, ExtractMonth
+
+from core.rollups import refresh_rollup_rows
+from maintenance.models import MaintenanceReport, MaintenanceCostRollup
+
+# A bucket is the key of a MaintenanceCostRollup row: (profile_id, vehicle_type, year, month)
+Bucket = tuple[int, str, int, int]
+
+
+class MaintenanceCostRollupService:
+    @staticmethod
+    def get_bucket(profile_id: int, vehicle_type: str, start_date) -> Bucket:
+        return profile_id, vehicle_type, start_date.year, start_date.month
+
+    @staticmethod
+    def aggregate_reports(filters: Optional[Q] = None):
+        """
+        Aggregates maintenance reports into rollup buckets.
+
+        Args:
+            filters: Optional filters applied to the reports before grouping.
+
+        Returns:
+            QuerySet of dictionaries with the keys profile_id, vehicle_type, year, month, total_cost and report_count.
+        """
+        reports = MaintenanceReport.objects.all()
+        if filters is not None:
+            reports = reports.filter(filters)
+        return (
+            reports
+            .annotate(vehicle_type=F('vehicle__type'), year=ExtractYear('start_date'), month=ExtractMonth('start_date'))
+            .values('profile_id', 'vehicle_type', 'year', 'month')
+            .annotate(total_cost=Sum('total_cost'), report_count=Count('id'))
+            .order_by()
+        )
+
+    @staticmethod
+    def refresh_buckets(buckets: Iterable[Bucket]) -> None:
+        """
+        Recomputes the given rollup buckets from the live reports.
+
+        Only the reports that fall into the buckets are aggregated, so the cost of a refresh is bounded by the number of
+        reports a tenant has for one vehicle type in one month. Buckets that no longer have any report are removed.
+        The buckets are locked before they are aggregated, see `refresh_rollup_rows`, so concurrent report saves in
+        the same month neither fail nor overwrite each other's totals.
+        """
+        buckets = set(buckets)
+        if not buckets:
+            return
+
+        report_filters = reduce(or_, (
+            Q(profile_id=profile_id, vehicle__type=vehicle_type, start_date__year=year, start_date__month=month)
+            for profile_id, vehicle_type, year, month in buckets
+        ))
+        refresh_rollup_rows(
+            MaintenanceCostRollup,
+            unique_fields=('profile_id', 'vehicle_type', 'year', 'month'),
+            empty_rows=[
+                MaintenanceCostRollup(profile_id=profile_id, vehicle_type=vehicle_type, year=year, month=month)
+                for profile_id, vehicle_type, year, month in buckets
+            ],
+            compute_rows=lambda: [MaintenanceCostRollup(**row) for row in MaintenanceCostRollupService.aggregate_reports(report_filters)],
+        )
+
+    @staticmethod
+    def rebuild() -> int:
+        """Rebuilds the whole rollup table from the live reports and returns the number of rows created."""
+        rollups = [MaintenanceCostRollup(**row) for row in MaintenanceCostRollupService.aggregate_reports().iterator()]
+        with transaction.atomic():
+            MaintenanceCostRollup.objects.all().delete()
+            MaintenanceCostRollup.objects.bulk_create(rollups, batch_size=1000)
+        return len(rollups)
+
+    @staticmethod
+    def verify() -> list[dict]:
+        """
+        Compares the rollup table against live aggregates.
+
+        Returns:
+            list[dict]: One entry per mismatching bucket with the expected (live) and actual (rollup) values.
+        """
+        expected = {
+            (row['profile_id'], row['vehicle_type'], row['year'], row['month']): (row['total_cost'], row['report_count'])
+            for row in MaintenanceCostRollupService.aggregate_reports().iterator()
+        }
+        actual = {
+            (row['profile_id'], row['vehicle_type'], row['year'], row['month']): (row['total_cost'], row['report_count'])
+            for row in MaintenanceCostRollup.objects.values('profile_id', 'vehicle_type', 'year', 'month', 'total_cost', 'report_count').iterator()
+        }
+        mismatches = []
+        for bucket in sorted(expected.keys() | actual.keys()):
+            if expected.get(bucket) != actual.get(bucket):
+                profile_id, vehicle_type, year, month = bucket
+                mismatches.append({
+                    'profile_id': profile_id, 'vehicle_type': vehicle_type, 'year': year, 'month': month,
+                    'expected': expected.get(bucket, (0, 0)), 'actual': actual.get(bucket, (0, 0)),
+                })
+        return mismatches
@@ -1,29 +1,170 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
 from django.dispatch import receiver
 
-from .models import MaintenanceReport
+from vehicles.models import Vehicle
+from .caching import bump_general_data_version, bump_vehicle_overview_versions
+from .models import MaintenanceReport, Part, ServiceProvider, PartsProvider, PartPurchaseEvent, ServiceProviderEvent
+from .services.mileage import schedule_vehicle_mileage_refresh
+from .services.part_usage import PartUsageCounterService
+from .services.rollups import MaintenanceCostRollupService
 
 
-# Sync mileage from the latest MaintenanceReport to Vehicle
+# Sync mileage from the latest MaintenanceReport to Vehicle, once per vehicle and transaction
 @receiver(post_save, sender=MaintenanceReport)
 def sync_latest_mileage_to_vehicle(sender, instance, created, **kwargs):
-    vehicle = instance.vehicle
-    # Get the latest report by start_date for this vehicle
-    latest_report = vehicle.maintenance_reports.order_by('-start_date').first()
-    if latest_report == instance:
-        if vehicle.mileage != instance.mileage:
-            vehicle.mileage = instance.mileage
-            vehicle.save()
+    schedule_vehicle_mileage_refresh(instance.vehicle_id)
+    # A report moved to another vehicle also changes the latest report of its previous vehicle
+    previous_vehicle_id = getattr(instance, '_previous_vehicle_id', None)
+    if previous_vehicle_id and previous_vehicle_id != instance.vehicle_id:
+        schedule_vehicle_mileage_refresh(previous_vehicle_id)
 
 
 # Handle the case where a Maintenance is deleted
 @receiver(post_delete, sender=MaintenanceReport)
 def handle_maintenance_report_deleted(sender, instance, **kwargs):
-    vehicle = instance.vehicle
-    latest_report = vehicle.maintenance_reports.order_by('-start_date').first()
-    if latest_report:
-        vehicle.mileage = latest_report.mileage
+    schedule_vehicle_mileage_refresh(instance.vehicle_id)
+
+
+# Remember the vehicle, the cost rollup bucket and the part usage bucket a report belonged to before it is updated
+@receiver(pre_save, sender=MaintenanceReport)
+def remember_previous_report_state(sender, instance, **kwargs):
+    instance._previous_vehicle_id = None
+    instance._previous_cost_rollup_bucket = None
+    instance._previous_part_usage_bucket = None
+    if instance.pk is None:
+        return
+    previous = MaintenanceReport.objects.filter(pk=instance.pk).values_list('vehicle_id', 'profile_id', 'vehicle__type', 'start_date').first()
+    if previous:
+        vehicle_id, profile_id, vehicle_type, start_date = previous
+        instance._previous_vehicle_id = vehicle_id
+        instance._previous_cost_rollup_bucket = MaintenanceCostRollupService.get_bucket(profile_id, vehicle_type, start_date)
+        instance._previous_part_usage_bucket = PartUsageCounterService.get_bucket(profile_id, vehicle_id, start_date)
+
+
+# Keep the monthly cost rollups in sync with the saved report
+@receiver(post_save, sender=MaintenanceReport)
+def update_cost_rollup_on_save(sender, instance, **kwargs):
+    buckets = {MaintenanceCostRollupService.get_bucket(instance.profile_id, instance.vehicle.type, instance.start_date)}
+    previous_bucket = getattr(instance, '_previous_cost_rollup_bucket', None)
+    if previous_bucket:
+        buckets.add(previous_bucket)
+    MaintenanceCostRollupService.refresh_buckets(buckets)
+
+
+@receiver(post_delete, sender=MaintenanceReport)
+def update_cost_rollup_on_delete(sender, instance, **kwargs):
+    MaintenanceCostRollupService.refresh_buckets({MaintenanceCostRollupService.get_bucket(instance.profile_id, instance.vehicle.type, instance.start_date)})
+
+
+# Reports are rolled up under their vehicle's type, so a type change moves them between buckets. The type is
+# remembered when a vehicle is loaded, so that saving it only needs a query if the type was deferred
+@receiver(post_init, sender=Vehicle)
+def remember_loaded_vehicle_type(sender, instance, **kwargs):
+    instance._previous_type = instance.__dict__.get('type') if instance.pk is not None else None
+
+
+@receiver(pre_save, sender=Vehicle)
+def remember_previous_vehicle_type(sender, instance, **kwargs):
+    if instance.pk is not None and getattr(instance, '_previous_type', None) is None:
+        instance._previous_type = Vehicle.objects.filter(pk=instance.pk).values_list('type', flat=True).first()
+
+
+@receiver(post_save, sender=Vehicle)
+def update_cost_rollup_on_vehicle_type_change(sender, instance, created, **kwargs):
+    previous_type, instance._previous_type = getattr(instance, '_previous_type', None), instance.type
+    if created or previous_type is None or previous_type == instance.type:
+        return
+    buckets = set()
+    for profile_id, start_date in instance.maintenance_reports.values_list('profile_id', 'start_date'):
+        buckets.add(MaintenanceCostRollupService.get_bucket(profile_id, previous_type, start_date))
+        buckets.add(MaintenanceCostRollupService.get_bucket(profile_id, instance.type, start_date))
+    MaintenanceCostRollupService.refresh_buckets(buckets)
+
+
+# Any write to the catalog served by GeneralMaintenanceDataView invalidates its cached payload
+@receiver(post_save, sender=Part)
+@receiver(post_delete, sender=Part)
+@receiver(post_save, sender=ServiceProvider)
+@receiver(post_delete, sender=ServiceProvider)
+@receiver(post_save, sender=PartsProvider)
+@receiver(post_delete, sender=PartsProvider)
+def invalidate_general_data_cache(sender, **kwargs):
+    bump_general_data_version()
+
+
+# The cached overview of a vehicle is built from its reports and their events
+@receiver(post_save, sender=MaintenanceReport)
+@receiver(post_delete, sender=MaintenanceReport)
+def invalidate_vehicle_overview_on_report_change(sender, instance, **kwargs):
+    bump_vehicle_overview_versions([instance.vehicle_id, getattr(instance, '_previous_vehicle_id', None)])
+
+
+@receiver(post_save, sender=PartPurchaseEvent)
+@receiver(post_delete, sender=PartPurchaseEvent)
+@receiver(post_save, sender=ServiceProviderEvent)
+@receiver(post_delete, sender=ServiceProviderEvent)
+def invalidate_vehicle_overview_on_event_change(sender, instance, **kwargs):
+    if sender.maintenance_report.is_cached(instance):
+        vehicle_id = instance.maintenance_report.vehicle_id
     else:
-        vehicle.mileage = 0
+        vehicle_id = MaintenanceReport.objects.filter(pk=instance.maintenance_report_id).values_list('vehicle_id', flat=True).first()
+    bump_vehicle_overview_versions([vehicle_id])
+
+
+# The overview names and ranks the parts purchased for the vehicle, so a part write only invalidates the overviews of
+# the vehicles it was purchased for. Deleted parts take their purchases along, which invalidate them through the above
+@receiver(post_save, sender=Part)
+def invalidate_vehicle_overviews_on_part_change(sender, instance, created, **kwargs):
+    if not created:
+        bump_vehicle_overview_versions(
+            PartPurchaseEvent.objects.filter(part=instance).values_list('maintenance_report__vehicle_id', flat=True).distinct()
+        )
+
+
+# A report moved to another vehicle or month takes the usage counters of its part purchases along
+@receiver(post_save, sender=MaintenanceReport)
+def update_part_usage_on_report_save(sender, instance, **kwargs):
+    previous_bucket = getattr(instance, '_previous_part_usage_bucket', None)
+    bucket = PartUsageCounterService.get_report_bucket(instance)
+    if previous_bucket and previous_bucket != bucket:
+        PartUsageCounterService.schedule_refresh({previous_bucket, bucket})
+
+
+@receiver(post_delete, sender=MaintenanceReport)
+def update_part_usage_on_report_delete(sender, instance, **kwargs):
+    PartUsageCounterService.schedule_refresh({PartUsageCounterService.get_report_bucket(instance)})
+
+
+def get_part_usage_bucket(event):
+    """Returns the part usage bucket of a part purchase event, or None if its report no longer exists."""
+    if PartPurchaseEvent.maintenance_report.is_cached(event):
+        return PartUsageCounterService.get_report_bucket(event.maintenance_report)
+    report = MaintenanceReport.objects.filter(pk=event.maintenance_report_id).values_list('profile_id', 'vehicle_id', 'start_date').first()
+    return PartUsageCounterService.get_bucket(*report) if report else None
+
+
+@receiver(pre_save, sender=PartPurchaseEvent)
+def remember_previous_part_usage_bucket(sender, instance, **kwargs):
+    instance._previous_part_usage_bucket = None
+    if instance.pk is not None:
+        previous = PartPurchaseEvent.objects.filter(pk=instance.pk).values_list(
+            'maintenance_report__profile_id', 'maintenance_report__vehicle_id', 'maintenance_report__start_date').first()
+        if previous:
+            instance._previous_part_usage_bucket = PartUsageCounterService.get_bucket(*previous)
+
+
+@receiver(post_save, sender=PartPurchaseEvent)
+def update_part_usage_on_event_save(sender, instance, **kwargs):
+    buckets = {get_part_usage_bucket(instance), getattr(instance, '_previous_part_usage_bucket', None)}
+    PartUsageCounterService.schedule_refresh(buckets)
+
 
-    vehicle.save()
+@receiver(post_delete, sender=PartPurchaseEvent)
+def update_part_usage_on_event_delete(sender, instance, origin=None, **kwargs):
+    # Events deleted along with their report, vehicle, part or profile are handled by the report handler or by the
+    # cascade that deletes the counters
+    if not isinstance(origin, PartPurchaseEvent) and getattr(origin, 'model', None) is not PartPurchaseEvent:
+        return
+    bucket = get_part_usage_bucket(instance)
+    if bucket:
+        PartUsageCounterService.schedule_refresh({bucket})
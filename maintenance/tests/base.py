@@ -0,0 +1,117 @@
+import threading
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.factories import UserProfileFactory
+from maintenance.factories import (MaintenanceReportFactory, PartFactory, PartsProviderFactory, PartPurchaseEventFactory,
+                                   ServiceProviderFactory, ServiceProviderEventFactory)
+from vehicles.factories import VehicleFactory
+from vehicles.models import VehicleTypeChoices
+
+
+class MaintenanceReportTestCase(APITestCase):
+    """
+    Base class of the tests of the data derived from maintenance reports: a tenant with a truck and a car, two parts
+    and a provider of each kind, and helpers creating reports through the API or the factories.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.truck = VehicleFactory.create(profile=cls.user_profile, type=VehicleTypeChoices.TRUCK)
+        cls.car = VehicleFactory.create(profile=cls.user_profile, type=VehicleTypeChoices.CAR)
+        cls.oil, cls.tyres = PartFactory.create_batch(size=2, profile=cls.user_profile)
+        cls.parts_provider = PartsProviderFactory.create(profile=cls.user_profile)
+        cls.service_provider = ServiceProviderFactory.create(profile=cls.user_profile)
+
+    def setUp(self):
+        self.client.cookies['access'] = AccessToken.for_user(self.user_profile.user)
+
+    def get_report_data(self, vehicle, start_date, parts=(), service_costs=(10,)):
+        """Returns the API payload of a report, with one purchase per (part, cost) pair and one service event per cost."""
+        return {
+            "vehicle": vehicle.id,
+            "start_date": start_date.isoformat(),
+            "end_date": start_date.isoformat(),
+            "part_purchase_events": [
+                {"part": part.id, "provider": self.parts_provider.id, "purchase_date": start_date.isoformat(), "cost": cost} for part, cost in parts
+            ],
+            "service_provider_events": [
+                {"service_provider": self.service_provider.id, "service_date": start_date.isoformat(), "cost": cost} for cost in service_costs
+            ],
+        }
+
+    def post_report(self, vehicle, start_date, parts=(), service_costs=(10,)):
+        """Creates a report through the API, runs what it deferred to its commit and returns its id."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('reports'), data=self.get_report_data(vehicle, start_date, parts, service_costs), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def create_report(self, vehicle, start_date, parts=(), service_costs=()):
+        """
+        Creates a report and its events with the factories, which keep its cost breakdown in line with the events, and
+        runs what they deferred to their commit.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            report = MaintenanceReportFactory.create(profile=self.user_profile, vehicle=vehicle, start_date=start_date, end_date=start_date)
+            for part, cost in parts:
+                PartPurchaseEventFactory.create(maintenance_report=report, part=part, provider=self.parts_provider, cost=cost)
+            for cost in service_costs:
+                ServiceProviderEventFactory.create(maintenance_report=report, service_provider=self.service_provider, cost=cost)
+        return report
+
+    def run_command(self, *args):
+        """Runs a management command without printing, and returns its standard output."""
+        stdout = StringIO()
+        call_command(*args, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def assertCommandFails(self, *args):
+        with self.assertRaises(CommandError):
+            self.run_command(*args)
+
+
+class ConcurrentWritesTestCase(TransactionTestCase):
+    """Base class of the tests of writes that lock the rows they derive, so that concurrent writes queue up."""
+
+    def run_concurrently(self, write, first_args, second_args):
+        """
+        Runs `write(*first_args)` and `write(*second_args)` in two transactions of their own threads, the first one
+        staying open until the second one has been seen waiting for its locks, and fails if either write raised.
+        """
+        first_written, release_first = threading.Event(), threading.Event()
+        errors = []
+
+        def run(args, hold):
+            try:
+                with transaction.atomic():
+                    write(*args)
+                    if hold:
+                        first_written.set()
+                        release_first.wait(timeout=10)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        first = threading.Thread(target=run, args=(first_args, True))
+        first.start()
+        first_written.wait(timeout=10)
+        second = threading.Thread(target=run, args=(second_args, False))
+        second.start()
+        # The second write waits for the rows locked by the first one instead of failing on the unique constraint
+        second.join(timeout=0.5)
+        self.assertTrue(second.is_alive())
+        release_first.set()
+        first.join()
+        second.join()
+        self.assertEqual(errors, [])
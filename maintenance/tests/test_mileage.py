@@ -0,0 +1,58 @@
+from datetime import date
+
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.factories import UserProfileFactory
+from maintenance.factories import MaintenanceReportFactory
+from maintenance.services.mileage import refresh_vehicle_mileage
+from vehicles.factories import VehicleFactory
+
+
+class VehicleMileageSyncTestCases(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile, mileage=100)
+        cls.other_vehicle = VehicleFactory.create(profile=cls.user_profile, mileage=200)
+
+    def create_report(self, vehicle, start_date, mileage):
+        return MaintenanceReportFactory.create(profile=self.user_profile, vehicle=vehicle, start_date=start_date, end_date=start_date, mileage=mileage)
+
+    def get_mileage(self, vehicle):
+        vehicle.refresh_from_db(fields=['mileage'])
+        return vehicle.mileage
+
+    def test_mileage_is_synced_once_per_transaction(self):
+        with CaptureQueriesContext(connection) as context, self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for day, mileage in ((1, 5000), (3, 7000), (2, 6000)):
+                    self.create_report(self.vehicle, date(2024, 5, day), mileage)
+                self.create_report(self.other_vehicle, date(2024, 5, 1), 9000)
+                self.assertEqual(self.get_mileage(self.vehicle), 100)
+
+        vehicle_updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "vehicles_vehicle"')]
+        self.assertEqual(len(vehicle_updates), 1)
+        self.assertEqual(self.get_mileage(self.vehicle), 7000)
+        self.assertEqual(self.get_mileage(self.other_vehicle), 9000)
+
+    def test_mileage_follows_report_updates_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first_report = self.create_report(self.vehicle, date(2024, 5, 1), 5000)
+            latest_report = self.create_report(self.vehicle, date(2024, 6, 1), 6000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            latest_report.vehicle = self.other_vehicle
+            latest_report.save()
+        self.assertEqual(self.get_mileage(self.vehicle), 5000)
+        self.assertEqual(self.get_mileage(self.other_vehicle), 6000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first_report.delete()
+        self.assertEqual(self.get_mileage(self.vehicle), 0)
+
+    def test_latest_report_without_mileage_keeps_vehicle_mileage(self):
+        self.create_report(self.vehicle, date(2024, 5, 1), None)
+        refresh_vehicle_mileage([self.vehicle.id])
+        self.assertEqual(self.get_mileage(self.vehicle), 100)
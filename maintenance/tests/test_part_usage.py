@@ -0,0 +1,109 @@
+from datetime import date
+from unittest import skipUnless
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from accounts.factories import UserProfileFactory
+from maintenance.factories import MaintenanceReportFactory, PartFactory, PartsProviderFactory, PartPurchaseEventFactory
+from maintenance.models import PartUsageCounter, PartPurchaseEvent
+from maintenance.services.part_usage import PartUsageCounterService
+from maintenance.tests.base import ConcurrentWritesTestCase, MaintenanceReportTestCase
+from vehicles.factories import VehicleFactory
+
+
+class PartUsageCounterTestCases(MaintenanceReportTestCase):
+    def get_counters(self):
+        return set(PartUsageCounter.objects.values_list('vehicle_id', 'part_id', 'year', 'month', 'count', 'total_cost'))
+
+    def test_counters_are_updated_when_reports_are_created(self):
+        self.post_report(self.truck, date(2025, 3, 1), [(self.oil, 100), (self.oil, 50), (self.tyres, 400)])
+        self.post_report(self.truck, date(2025, 3, 20), [(self.oil, 70)])
+        self.post_report(self.car, date(2025, 4, 2), [(self.oil, 30)])
+        self.assertEqual(self.get_counters(), {
+            (self.truck.id, self.oil.id, 2025, 3, 3, 220),
+            (self.truck.id, self.tyres.id, 2025, 3, 1, 400),
+            (self.car.id, self.oil.id, 2025, 4, 1, 30),
+        })
+
+    def test_counters_follow_report_updates(self):
+        report_id = self.post_report(self.truck, date(2025, 3, 1), [(self.oil, 100), (self.tyres, 400)])
+        kept_event = PartPurchaseEvent.objects.get(maintenance_report_id=report_id, part=self.oil)
+
+        # The tyres purchase is removed, one is added and the report moves to another vehicle and month
+        data = self.get_report_data(self.car, date(2025, 5, 2), [(self.oil, 60)])
+        data['part_purchase_events'].append({"id": kept_event.id, "part": self.oil.id, "provider": self.parts_provider.id,
+                                             "purchase_date": "2025-03-01", "cost": 100})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse('reports-details', args=[report_id]), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.get_counters(), {(self.car.id, self.oil.id, 2025, 5, 2, 160)})
+
+    def test_counters_are_updated_when_events_and_reports_are_deleted(self):
+        report_id = self.post_report(self.truck, date(2025, 3, 1), [(self.oil, 100), (self.tyres, 400)])
+        self.post_report(self.truck, date(2025, 3, 2), [(self.oil, 20)])
+
+        event = PartPurchaseEvent.objects.get(maintenance_report_id=report_id, part=self.tyres)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('part-purchase-event-details', args=[event.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_counters(), {(self.truck.id, self.oil.id, 2025, 3, 2, 120)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('reports-details', args=[report_id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_counters(), {(self.truck.id, self.oil.id, 2025, 3, 1, 20)})
+
+    def test_counters_follow_event_updates(self):
+        report = self.create_report(self.truck, date(2025, 3, 1), parts=[(self.oil, 100)])
+        other_report = self.create_report(self.car, date(2025, 6, 1))
+        event = PartPurchaseEvent.objects.get(maintenance_report=report)
+
+        event.part, event.maintenance_report = self.tyres, other_report
+        with self.captureOnCommitCallbacks(execute=True):
+            event.save()
+        self.assertEqual(self.get_counters(), {(self.car.id, self.tyres.id, 2025, 6, 1, 100)})
+
+    def test_vehicles_are_only_locked_once_the_report_is_committed(self):
+        with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+            data = self.get_report_data(self.truck, date(2025, 3, 1), [(self.oil, 100)])
+            response = self.client.post(reverse('reports'), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse([query['sql'] for query in queries if 'FOR NO KEY UPDATE' in query['sql']])
+        self.assertFalse(PartUsageCounter.objects.exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertTrue([query['sql'] for query in queries if 'FOR NO KEY UPDATE' in query['sql']])
+        self.assertEqual(self.get_counters(), {(self.truck.id, self.oil.id, 2025, 3, 1, 100)})
+
+    def test_rebuild_command_restores_and_verifies_counters(self):
+        self.post_report(self.truck, date(2025, 3, 1), [(self.oil, 100)])
+        counters = self.get_counters()
+        PartUsageCounter.objects.all().delete()
+        self.assertCommandFails('rebuild_maintenance_rollups', '--verify-only')
+
+        self.run_command('rebuild_maintenance_rollups')
+        self.assertEqual(self.get_counters(), counters)
+        self.assertEqual(PartUsageCounterService.verify(), [])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Concurrent transactions are only exercised on PostgreSQL")
+class PartUsageCounterConcurrencyTestCases(ConcurrentWritesTestCase):
+    def test_concurrent_purchases_of_a_bucket_are_all_counted(self):
+        user_profile = UserProfileFactory.create()
+        vehicle = VehicleFactory.create(profile=user_profile)
+        oil, tyres = PartFactory.create_batch(size=2, profile=user_profile)
+        parts_provider = PartsProviderFactory.create(profile=user_profile)
+        reports = MaintenanceReportFactory.create_batch(size=2, profile=user_profile, vehicle=vehicle, start_date=date(2025, 3, 1))
+
+        def purchase(report, parts):
+            for part in parts:
+                PartPurchaseEventFactory.create(maintenance_report=report, part=part, provider=parts_provider, cost=100)
+
+        self.run_concurrently(purchase, (reports[0], [oil]), (reports[1], [oil, tyres]))
+        self.assertEqual(set(PartUsageCounter.objects.values_list('part_id', 'count', 'total_cost')), {(oil.id, 2, 200), (tyres.id, 1, 100)})
+        self.assertEqual(PartUsageCounterService.verify(), [])
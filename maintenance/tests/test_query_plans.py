@@ -0,0 +1,118 @@
+from datetime import date, time, timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from factory import Iterator
+
+from accounts.factories import UserProfileFactory
+from drivers.factories import DriverFactory, DriverStartingShiftFactory
+from drivers.models import Driver, DriverStartingShift
+from maintenance.factories import MaintenanceReportFactory, PartFactory, PartsProviderFactory, ServiceProviderFactory, PartPurchaseEventFactory
+from maintenance.factories import ServiceProviderEventFactory
+from maintenance.models import MaintenanceReport, Part, PartUsageCounter
+from maintenance.queries import COMBINED_YEARLY_DATA_QUERY, VEHICLES_YEARLY_DATA_QUERY
+from vehicles.factories import VehicleFactory
+from vehicles.models import Vehicle, VehicleTypeChoices
+
+
+@skipUnless(connection.vendor == 'postgresql', "Query plans are checked against PostgreSQL only")
+class HotQueryPlanTestCases(TestCase):
+    """
+    Runs EXPLAIN on the tenant-scoped hot queries and checks which index serves each of them.
+
+    Another tenant gets a few thousand rows in every table the queries read, and the tables are analyzed, so the
+    planner weighs the indexes against sequential scans with realistic statistics instead of being forbidden to scan.
+    """
+    NOISE_SIZE = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile, other_user_profile = UserProfileFactory.create_batch(size=2)
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile, type=VehicleTypeChoices.TRUCK)
+        VehicleFactory.create_batch(size=3, profile=other_user_profile)
+        part = PartFactory.create(profile=cls.user_profile)
+        parts_provider = PartsProviderFactory.create(profile=cls.user_profile)
+        service_provider = ServiceProviderFactory.create(profile=cls.user_profile)
+        reports = MaintenanceReportFactory.create_batch(size=6, profile=cls.user_profile, vehicle=cls.vehicle,
+                                                        start_date=Iterator([date(2024, month, 1) for month in range(1, 7)]))
+        for report in reports:
+            PartPurchaseEventFactory.create(maintenance_report=report, part=part, provider=parts_provider)
+            ServiceProviderEventFactory.create(maintenance_report=report, service_provider=service_provider)
+        cls.driver = DriverFactory.create(profile=cls.user_profile, vehicle=cls.vehicle)
+        DriverStartingShiftFactory.create_batch(size=5, driver=cls.driver)
+        cls.create_other_tenant_rows(other_user_profile)
+
+    @classmethod
+    def create_other_tenant_rows(cls, profile):
+        vehicles = Vehicle.objects.bulk_create(VehicleFactory.build_batch(size=cls.NOISE_SIZE // 2, profile=profile))
+        parts = Part.objects.bulk_create(Part(profile=profile, name=f"Noise part {index}") for index in range(cls.NOISE_SIZE // 2))
+        MaintenanceReport.objects.bulk_create(MaintenanceReportFactory.build_batch(size=cls.NOISE_SIZE, profile=profile, vehicle=Iterator(vehicles)))
+        PartUsageCounter.objects.bulk_create(
+            PartUsageCounter(profile=profile, vehicle=vehicles[index % len(vehicles)], part=parts[index % len(parts)], year=2024,
+                             month=index // len(vehicles) + 1, count=1, total_cost=100)
+            for index in range(cls.NOISE_SIZE)
+        )
+        drivers = Driver.objects.bulk_create(
+            Driver(profile=profile, first_name="Driver", last_name=str(index), phone_number=f"+3000{index:06d}", license_number=f"Q{index:08d}",
+                   license_expiry_date=date(2030, 1, 1), date_of_birth=date(1990, 1, 1), hire_date=date(2022, 1, 1))
+            for index in range(200)
+        )
+        DriverStartingShift.objects.bulk_create(
+            DriverStartingShift(driver=drivers[index % len(drivers)], date=date(2024, 1, 1) + timedelta(days=index // len(drivers)),
+                                time=time(8), load=1, mileage=index)
+            for index in range(cls.NOISE_SIZE)
+        )
+        with connection.cursor() as cursor:
+            for model in (MaintenanceReport, Part, PartUsageCounter, Vehicle, DriverStartingShift):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def assertNoSequentialScan(self, plan, tables):
+        for table in tables:
+            self.assertNotIn(f"Seq Scan on {table}", plan, f"Sequential scan on {table}:\n{plan}")
+
+    def assertUsesIndex(self, plan, *index_names):
+        """Fails unless the plan reads through one of the given indexes."""
+        self.assertTrue(any(f" {index_name} " in f"{plan} " for index_name in index_names), f"None of {index_names} is used:\n{plan}")
+
+    def test_fleet_reports_in_date_range(self):
+        reports = MaintenanceReport.objects.filter(profile=self.user_profile, start_date__gte=date(2024, 1, 1), start_date__lt=date(2025, 1, 1))
+        self.assertUsesIndex(reports.values('total_cost').explain(), 'report_profile_start_idx')
+
+    def test_vehicle_reports_of_a_month(self):
+        reports = MaintenanceReport.objects.filter(profile=self.user_profile, vehicle=self.vehicle, start_date__gte=date(2024, 3, 1),
+                                                   start_date__lt=date(2024, 4, 1)).order_by('start_date')
+        # Both indexes lead with the vehicle's rows in date order, the planner picks either
+        self.assertUsesIndex(reports.explain(), 'report_profile_vehicle_idx', 'report_vehicle_latest_idx')
+
+    def test_latest_report_of_a_vehicle(self):
+        latest_report = MaintenanceReport.objects.filter(vehicle=self.vehicle).order_by('-start_date', '-pk').values('mileage')[:1]
+        self.assertUsesIndex(latest_report.explain(), 'report_vehicle_latest_idx')
+
+    def test_shifts_of_a_driver(self):
+        shifts = DriverStartingShift.objects.filter(driver=self.driver).order_by('-date', '-pk')[:20]
+        self.assertUsesIndex(shifts.explain(), 'shift_driver_date_idx')
+
+    def test_fleet_vehicles_of_a_type(self):
+        vehicles = Vehicle.objects.filter(profile=self.user_profile, type=VehicleTypeChoices.TRUCK)
+        self.assertUsesIndex(vehicles.explain(), 'vehicle_profile_type_idx')
+
+    def test_fleet_top_recurring_issues(self):
+        counters = PartUsageCounter.objects.filter(profile=self.user_profile, year=2024).values('part__name').annotate(count=Sum('count'))
+        self.assertNoSequentialScan(counters.explain(), ['maintenance_partusagecounter'])
+
+    def test_vehicle_yearly_overview(self):
+        params = {'vehicle_id': self.vehicle.id, 'profile_id': self.user_profile.id}
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {COMBINED_YEARLY_DATA_QUERY}", params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertNoSequentialScan(plan, ['maintenance_maintenancereport', 'maintenance_partusagecounter', 'maintenance_part'])
+        self.assertUsesIndex(plan, 'report_profile_vehicle_idx')
+
+    def test_vehicles_yearly_overview(self):
+        params = {'vehicle_ids': [self.vehicle.id], 'profile_id': self.user_profile.id}
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {VEHICLES_YEARLY_DATA_QUERY}", params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertNoSequentialScan(plan, ['maintenance_maintenancereport', 'maintenance_partusagecounter', 'maintenance_part'])
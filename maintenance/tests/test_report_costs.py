@@ -0,0 +1,117 @@
+import re
+from datetime import date
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from maintenance.models import MaintenanceCostRollup, MaintenanceReport, PartPurchaseEvent, ServiceProviderEvent
+from maintenance.services.report_costs import ReportCostBreakdownService
+from maintenance.services.rollups import MaintenanceCostRollupService
+from maintenance.tests.base import MaintenanceReportTestCase
+
+
+class ReportCostBreakdownTestCases(MaintenanceReportTestCase):
+    def get_breakdown(self, report_id):
+        return MaintenanceReport.objects.values(*ReportCostBreakdownService.FIELDS).get(pk=report_id)
+
+    def create_report_with_events(self):
+        return self.create_report(self.truck, date(2025, 3, 1), parts=[(self.oil, 100)], service_costs=[40, 40])
+
+    def test_breakdown_is_set_when_reports_are_created_and_updated(self):
+        response = self.client.post(reverse('reports'), data=self.get_report_data(self.truck, date(2025, 3, 1), [(self.oil, 100), (self.oil, 250)], [40]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        report_id = response.data['id']
+        self.assertEqual(response.data['parts_cost'], 350)
+        self.assertEqual(self.get_breakdown(report_id), {
+            'total_cost': 390, 'parts_cost': 350, 'service_cost': 40, 'part_event_count': 2, 'service_event_count': 1
+        })
+
+        response = self.client.put(reverse('reports-details', args=[report_id]), data=self.get_report_data(self.truck, date(2025, 3, 1), [], [30, 20]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.get_breakdown(report_id), {
+            'total_cost': 50, 'parts_cost': 0, 'service_cost': 50, 'part_event_count': 0, 'service_event_count': 2
+        })
+        self.assertEqual(ReportCostBreakdownService.verify(), [])
+
+    def test_breakdown_follows_event_updates_and_deletions(self):
+        report, other_report = self.create_report_with_events(), self.create_report_with_events()
+        part_event = PartPurchaseEvent.objects.get(maintenance_report=report)
+
+        data = {"part": self.oil.id, "provider": self.parts_provider.id, "purchase_date": "2025-03-01", "cost": 70,
+                "maintenance_report": other_report.id}
+        response = self.client.put(reverse('part-purchase-event-details', args=[part_event.id]), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.get_breakdown(report.id)['part_event_count'], 0)
+        self.assertEqual(self.get_breakdown(other_report.id)['parts_cost'], 170)
+
+        service_event = ServiceProviderEvent.objects.filter(maintenance_report=report).first()
+        response = self.client.delete(reverse('service-provider-event-details', args=[service_event.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_breakdown(report.id)['service_cost'], 40)
+        self.assertEqual(self.get_breakdown(report.id)['service_event_count'], 1)
+
+        response = self.client.delete(reverse('part-purchase-event-details', args=[part_event.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_breakdown(other_report.id)['parts_cost'], 100)
+        self.assertEqual(ReportCostBreakdownService.verify(), [])
+
+    def test_total_cost_and_rollups_follow_event_updates(self):
+        report = self.create_report_with_events()
+        service_event = ServiceProviderEvent.objects.filter(maintenance_report=report).first()
+        data = {"service_provider": self.service_provider.id, "service_date": "2025-03-01", "cost": 100, "maintenance_report": report.id}
+        response = self.client.put(reverse('service-provider-event-details', args=[service_event.id]), data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.get_breakdown(report.id)['total_cost'], 240)
+        self.assertEqual(MaintenanceCostRollup.objects.get(profile=self.user_profile, year=2025, month=3).total_cost, 240)
+        self.assertEqual(MaintenanceCostRollupService.verify(), [])
+
+    def get_locked_tables(self, queries):
+        """Returns the tables whose rows the given queries write or lock, in the order they are first locked."""
+        tables = []
+        for query in queries:
+            match = re.match(r'(?:UPDATE|DELETE FROM|INSERT INTO) "(\w+)"', query['sql'])
+            if not match and re.search(r' FOR (NO KEY )?UPDATE', query['sql']):
+                match = re.search(r' FROM "(\w+)"', query['sql'])
+            if match and match.group(1) not in tables:
+                tables.append(match.group(1))
+        return tables
+
+    def test_report_and_event_writes_lock_the_report_first(self):
+        report, other_report = self.create_report_with_events(), self.create_report_with_events()
+        part_event = PartPurchaseEvent.objects.get(maintenance_report=report)
+        service_event = ServiceProviderEvent.objects.filter(maintenance_report=report).first()
+        part_event_data = {"part": self.tyres.id, "provider": self.parts_provider.id, "purchase_date": "2025-03-01", "cost": 70,
+                           "maintenance_report": other_report.id}
+        writes = [
+            ('put', reverse('part-purchase-event-details', args=[part_event.id]), part_event_data),
+            ('delete', reverse('service-provider-event-details', args=[service_event.id]), None),
+            ('delete', reverse('part-purchase-event-details', args=[part_event.id]), None),
+            ('put', reverse('reports-details', args=[report.id]), self.get_report_data(self.car, date(2025, 4, 1), [(self.oil, 30)])),
+            ('delete', reverse('reports-details', args=[other_report.id]), None),
+        ]
+        for method, url, data in writes:
+            with self.subTest(method=method, url=url), CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(url, data=data, format='json')
+                self.assertIn(response.status_code, (status.HTTP_202_ACCEPTED, status.HTTP_204_NO_CONTENT))
+                # The vehicle rows are only locked by the part usage refresh, once the transaction is committed
+                locked_tables = self.get_locked_tables(queries)
+                self.assertEqual(locked_tables[0], MaintenanceReport._meta.db_table)
+                self.assertIn(MaintenanceCostRollup._meta.db_table, locked_tables)
+                self.assertNotIn('vehicles_vehicle', locked_tables)
+
+    def test_verify_command_reports_and_repairs_mismatches(self):
+        report, other_report = self.create_report_with_events(), self.create_report_with_events()
+        MaintenanceReport.objects.filter(pk=report.pk).update(parts_cost=0, service_event_count=5)
+        MaintenanceReport.objects.filter(pk=other_report.pk).update(total_cost=90)
+        self.assertEqual(ReportCostBreakdownService.verify(), [
+            {'report_id': report.pk, 'expected': (180, 100, 80, 1, 2), 'actual': (180, 0, 80, 1, 5)},
+            {'report_id': other_report.pk, 'expected': (180, 100, 80, 1, 2), 'actual': (90, 100, 80, 1, 2)},
+        ])
+        self.assertCommandFails('verify_report_costs')
+
+        self.assertIn("Repaired the cost breakdown of 2 maintenance reports", self.run_command('verify_report_costs', '--repair'))
+        self.assertEqual(self.get_breakdown(report.pk), self.get_breakdown(other_report.pk))
+        self.run_command('verify_report_costs')
+        self.assertEqual(MaintenanceCostRollupService.verify(), [])
@@ -0,0 +1,42 @@
+from django.test import TestCase
+
+from accounts.factories import UserProfileFactory
+from maintenance.factories import MaintenanceReportFactory, ServiceProviderEventFactory, ServiceProviderFactory
+from maintenance.models import MaintenanceReport
+from maintenance.utils import ReportSummarizer
+from vehicles.factories import VehicleFactory
+
+
+class ReportSummarizerTestCases(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile)
+        cls.service_providers = ServiceProviderFactory.create_batch(size=3, profile=cls.user_profile)
+
+    def create_reports(self, size):
+        reports = MaintenanceReportFactory.create_batch(size=size, profile=self.user_profile, vehicle=self.vehicle)
+        for index, report in enumerate(reports):
+            for service_provider in self.service_providers[:index % 3 + 1]:
+                ServiceProviderEventFactory.create(maintenance_report=report, service_provider=service_provider)
+        return MaintenanceReport.objects.filter(profile=self.user_profile)
+
+    def test_summarize_queryset_matches_summarize_reports(self):
+        reports = self.create_reports(size=6)
+        summarizer = ReportSummarizer()
+        self.assertEqual(summarizer.summarize_queryset(reports), summarizer.summarize_reports(reports))
+
+    def test_summarize_queryset_uses_a_constant_number_of_queries(self):
+        summarizer = ReportSummarizer()
+        reports = self.create_reports(size=2)
+        with self.assertNumQueries(2):
+            summarizer.summarize_queryset(reports)
+
+        reports = self.create_reports(size=10)
+        with self.assertNumQueries(2):
+            summary = summarizer.summarize_queryset(reports)
+        self.assertEqual(summary[ReportSummarizer.TOTAL_MAINTENANCE], 12)
+
+    def test_summarize_queryset_on_empty_queryset(self):
+        summarizer = ReportSummarizer()
+        self.assertEqual(summarizer.summarize_queryset(MaintenanceReport.objects.none()), summarizer.initialize_report_summary())
@@ -0,0 +1,75 @@
+from datetime import date
+from unittest import skipUnless
+
+from django.db import connection
+
+from accounts.factories import UserProfileFactory
+from maintenance.factories import MaintenanceReportFactory
+from maintenance.models import MaintenanceCostRollup
+from maintenance.services.rollups import MaintenanceCostRollupService
+from maintenance.tests.base import ConcurrentWritesTestCase, MaintenanceReportTestCase
+from vehicles.factories import VehicleFactory
+from vehicles.models import Vehicle, VehicleTypeChoices
+
+
+class MaintenanceCostRollupTestCases(MaintenanceReportTestCase):
+    def get_rollup(self, vehicle_type, year, month):
+        return MaintenanceCostRollup.objects.filter(profile=self.user_profile, vehicle_type=vehicle_type, year=year, month=month).values_list('total_cost', 'report_count').first()
+
+    def test_rollup_is_updated_when_reports_are_created(self):
+        self.create_report(self.truck, date(2025, 3, 1), service_costs=[100])
+        self.create_report(self.truck, date(2025, 3, 20), service_costs=[250])
+        self.create_report(self.car, date(2025, 3, 5), service_costs=[40])
+        self.assertEqual(self.get_rollup(VehicleTypeChoices.TRUCK, 2025, 3), (350, 2))
+        self.assertEqual(self.get_rollup(VehicleTypeChoices.CAR, 2025, 3), (40, 1))
+
+    def test_rollup_follows_report_updates(self):
+        report = self.create_report(self.truck, date(2025, 3, 1), service_costs=[100])
+        report.start_date = date(2025, 4, 2)
+        report.total_cost = 300
+        report.save()
+        self.assertIsNone(self.get_rollup(VehicleTypeChoices.TRUCK, 2025, 3))
+        self.assertEqual(self.get_rollup(VehicleTypeChoices.TRUCK, 2025, 4), (300, 1))
+
+    def test_rollup_is_updated_when_reports_are_deleted(self):
+        report = self.create_report(self.truck, date(2025, 3, 1), service_costs=[100])
+        self.create_report(self.truck, date(2025, 3, 2), service_costs=[50])
+        report.delete()
+        self.assertEqual(self.get_rollup(VehicleTypeChoices.TRUCK, 2025, 3), (50, 1))
+
+    def test_rollup_follows_vehicle_type_changes(self):
+        self.create_report(self.truck, date(2025, 3, 1), service_costs=[100])
+        self.truck.type = VehicleTypeChoices.VAN
+        self.truck.save()
+        self.assertIsNone(self.get_rollup(VehicleTypeChoices.TRUCK, 2025, 3))
+        self.assertEqual(self.get_rollup(VehicleTypeChoices.VAN, 2025, 3), (100, 1))
+
+    def test_saving_a_loaded_vehicle_does_not_query_its_previous_type(self):
+        vehicle = Vehicle.objects.get(pk=self.truck.pk)
+        vehicle.mileage += 1
+        with self.assertNumQueries(1):
+            vehicle.save()
+
+    def test_rebuild_command_restores_and_verifies_rollups(self):
+        self.create_report(self.truck, date(2025, 3, 1), service_costs=[100])
+        self.create_report(self.car, date(2024, 12, 1), service_costs=[70])
+        MaintenanceCostRollup.objects.all().delete()
+        self.assertCommandFails('rebuild_maintenance_rollups', '--verify-only')
+
+        self.run_command('rebuild_maintenance_rollups')
+        self.assertEqual(self.get_rollup(VehicleTypeChoices.TRUCK, 2025, 3), (100, 1))
+        self.assertEqual(self.get_rollup(VehicleTypeChoices.CAR, 2024, 12), (70, 1))
+        self.assertEqual(MaintenanceCostRollupService.verify(), [])
+
+
+@skipUnless(connection.vendor == 'postgresql', "Concurrent transactions are only exercised on PostgreSQL")
+class MaintenanceCostRollupConcurrencyTestCases(ConcurrentWritesTestCase):
+    def test_concurrent_reports_of_a_bucket_are_all_rolled_up(self):
+        user_profile = UserProfileFactory.create()
+        truck = VehicleFactory.create(profile=user_profile, type=VehicleTypeChoices.TRUCK)
+
+        def create_report(total_cost):
+            MaintenanceReportFactory.create(profile=user_profile, vehicle=truck, start_date=date(2025, 3, 1), end_date=date(2025, 3, 1), total_cost=total_cost)
+
+        self.run_concurrently(create_report, (100,), (50,))
+        self.assertEqual(MaintenanceCostRollup.objects.values_list('total_cost', 'report_count').get(profile=user_profile), (150, 2))
@@ -3,15 +3,24 @@ from collections import Counter, defaultdict
 from datetime import datetime, date, timedelta
 
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken
 
 from accounts.factories import UserProfileFactory
-from maintenance.factories import PartFactory, ServiceProviderFactory, PartsProviderFactory
-from maintenance.models import MaintenanceReport
+from maintenance.caching import cache, GENERAL_DATA_VERSION_CACHE_KEY
+from maintenance.checks import check_shared_cache
+from maintenance.factories import PartFactory, ServiceProviderFactory, PartsProviderFactory, MaintenanceReportFactory, PartPurchaseEventFactory
+from maintenance.factories import ServiceProviderEventFactory
+from maintenance.models import MaintenanceReport, PartPurchaseEvent
+from maintenance.services.fleet_services import FleetHealthService
 from maintenance.utils import has_gap_between_periods, period_key_comparator
+from vehicles.factories import VehicleFactory
 from vehicles.models import Vehicle
 
 PATH = 'maintenance/tests/fixtures/'
@@ -22,6 +31,7 @@ class VehicleMaintenanceReportOverviewTests(APITestCase):
                 f'{PATH}events_fixture']
 
     def setUp(self):
+        cache.clear()
         access_token = AccessToken.for_user(User.objects.get(pk=1))  # Picked a user from our loaded fixture
         self.vehicle = Vehicle.objects.filter(profile__user__pk=1, pk=1).first()
         self.client.cookies['access'] = access_token
@@ -35,6 +45,143 @@ class VehicleMaintenanceReportOverviewTests(APITestCase):
                 self.assertIn(key, item)
 
 
+class VehicleOverviewCacheTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.vehicle, cls.other_vehicle = VehicleFactory.create_batch(size=2, profile=cls.user_profile)
+        cls.part = PartFactory.create(profile=cls.user_profile)
+        cls.parts_provider = PartsProviderFactory.create(profile=cls.user_profile)
+        cls.service_provider = ServiceProviderFactory.create(profile=cls.user_profile)
+        # The part usage counters the overview ranks parts from are refreshed on commit
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.report = MaintenanceReportFactory.create(profile=cls.user_profile, vehicle=cls.vehicle, start_date=date(2024, 3, 1), end_date=date(2024, 3, 2))
+            cls.part_purchase_event = PartPurchaseEventFactory.create(maintenance_report=cls.report, part=cls.part, provider=cls.parts_provider, cost=100)
+
+    def setUp(self):
+        cache.clear()
+        self.client.cookies['access'] = AccessToken.for_user(self.user_profile.user)
+
+    def get_overview(self):
+        response = self.client.get(reverse('overview', args=[self.vehicle.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return dict(response.data)
+
+    def get_stats(self):
+        self.client.cookies['access'] = AccessToken.for_user(User.objects.create_superuser('admin', password='password'))
+        response = self.client.get(reverse('overview-cache-stats'))
+        self.client.cookies['access'] = AccessToken.for_user(self.user_profile.user)
+        return response.data
+
+    def test_overview_is_served_from_the_cache(self):
+        overview = self.get_overview()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_overview(), overview)
+        self.assertFalse([query for query in queries if 'maintenance_maintenancereport' in query['sql']])
+        self.assertEqual(self.get_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 50.0})
+
+    def test_overview_is_invalidated_by_writes_to_the_vehicle(self):
+        overview = self.get_overview()
+        self.assertEqual(overview[2024]['total_cost'], 100)
+        self.assertEqual([issue['part_name'] for issue in overview[2024]['top_recurring_issues']], [self.part.name])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceProviderEventFactory.create(maintenance_report=self.report, service_provider=self.service_provider, cost=50)
+        self.assertEqual(self.get_overview()[2024]['total_cost'], 150)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PartPurchaseEvent.objects.filter(pk=self.part_purchase_event.pk).delete()
+        self.assertEqual(self.get_overview()[2024]['top_recurring_issues'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.report.vehicle = self.other_vehicle
+            self.report.save()
+        self.assertEqual(self.get_overview(), {})
+        self.assertEqual(self.get_stats()['misses'], 4)
+
+    def test_writes_to_other_vehicles_keep_the_overview_cached(self):
+        self.get_overview()
+        with self.captureOnCommitCallbacks(execute=True):
+            MaintenanceReportFactory.create(profile=self.user_profile, vehicle=self.other_vehicle)
+        self.get_overview()
+        self.assertEqual(self.get_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 50.0})
+
+    def test_overview_is_invalidated_by_renaming_its_parts(self):
+        self.get_overview()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.part.name = 'Renamed part'
+            self.part.save()
+        self.assertEqual([issue['part_name'] for issue in self.get_overview()[2024]['top_recurring_issues']], ['Renamed part'])
+        self.assertEqual(self.get_stats(), {'hits': 0, 'misses': 2, 'hit_rate': 0.0})
+
+    def test_other_catalog_writes_keep_the_overview_cached(self):
+        self.get_overview()
+        with self.captureOnCommitCallbacks(execute=True):
+            PartFactory.create(profile=self.user_profile).save()
+            self.parts_provider.save()
+            self.service_provider.save()
+        self.get_overview()
+        self.assertEqual(self.get_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 50.0})
+
+    def test_cache_stats_are_for_admins_only(self):
+        response = self.client.get(reverse('overview-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def test_configured_shared_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_missing_shared_cache_is_refused(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['maintenance.E001'])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                               'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_shared_cache_is_refused(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['maintenance.E002'])
+
+
+class VehiclesMaintenanceOverviewTests(APITestCase):
+    fixtures = [f'{PATH}user_and_userprofile_fixture', f'{PATH}parts_fixture', f'{PATH}providers_fixture', f'{PATH}vehicles_fixture', f'{PATH}reports_fixture',
+                f'{PATH}events_fixture']
+
+    def setUp(self):
+        cache.clear()
+        self.client.cookies['access'] = AccessToken.for_user(User.objects.get(pk=1))
+
+    def test_overview_of_each_vehicle_matches_the_vehicle_overview(self):
+        vehicle_ids = list(Vehicle.objects.filter(profile__user__pk=1).order_by('id').values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('vehicles-overview'), {'vehicle_ids': ','.join(map(str, vehicle_ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The portable fallback reads the part usage counters with a separate query that does not touch the reports
+        self.assertEqual(len([query for query in queries if 'maintenance_maintenancereport' in query['sql']]), 1)
+
+        self.assertEqual([entry['vehicle'] for entry in response.data], vehicle_ids)
+        for entry in response.data:
+            self.assertEqual(entry['overview'], self.client.get(reverse('overview', args=[entry['vehicle']])).data)
+
+    def test_vehicles_are_selected_by_type(self):
+        response = self.client.get(reverse('vehicles-overview'), {'vehicle_type': 'TRUCK'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry['vehicle'] for entry in response.data], [2, 6])
+
+    def test_vehicles_without_reports_have_an_empty_overview(self):
+        MaintenanceReport.objects.filter(vehicle_id=3).delete()
+        response = self.client.get(reverse('vehicles-overview'), {'vehicle_ids': '3,1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0], {'vehicle': 1, 'overview': self.client.get(reverse('overview', args=[1])).data})
+        self.assertEqual(response.data[1], {'vehicle': 3, 'overview': []})
+
+    def test_invalid_selections_are_rejected(self):
+        other_vehicle = VehicleFactory.create(profile=UserProfileFactory.create())
+        for params in ({}, {'vehicle_ids': '1,a'}, {'vehicle_ids': f'1,{other_vehicle.id}'}, {'vehicle_type': 'PLANE'},
+                       {'vehicle_ids': ','.join(map(str, range(1, 202)))}):
+            response = self.client.get(reverse('vehicles-overview'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
 class GeneralMaintenanceDataTests(APITestCase):
 
     @classmethod
@@ -48,6 +195,7 @@ class GeneralMaintenanceDataTests(APITestCase):
         cls.parts_providers = PartsProviderFactory.create_batch(size=5, profile=cls.user_profile)
 
     def setUp(self):
+        cache.clear()
         self.client.cookies['access'] = self.access_token
 
     def test_successful_data_retrieval(self):
@@ -62,6 +210,54 @@ class GeneralMaintenanceDataTests(APITestCase):
         for part in response.data['parts']:
             print(part)
 
+    def test_is_owner_is_computed_per_user(self):
+        response = self.client.get(reverse("general-data"))
+        own_part_ids = {part.id for part in self.parts}
+        for part in response.data['parts']:
+            self.assertEqual(part['is_owner'], part['id'] in own_part_ids)
+
+        # The other user is served from the same cached payload
+        self.client.cookies['access'] = AccessToken.for_user(self.other_user_profile.user)
+        response = self.client.get(reverse("general-data"))
+        for part in response.data['parts']:
+            self.assertEqual(part['is_owner'], part['id'] not in own_part_ids)
+        self.assertFalse(any(provider['is_owner'] for provider in response.data['service_providers']))
+
+    def test_unchanged_data_is_not_modified(self):
+        etag = self.client.get(reverse("general-data"))['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("general-data"), HTTP_IF_NONE_MATCH=etag)
+        # Only the authenticated user and the cached version are looked up, the catalog is not loaded
+        self.assertEqual([query['sql'] for query in queries if 'maintenance_' in query['sql']], [])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # The ETag is bound to the user since is_owner differs between users
+        self.client.cookies['access'] = AccessToken.for_user(self.other_user_profile.user)
+        response = self.client.get(reverse("general-data"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_version_is_shared_between_processes(self):
+        self.client.get(reverse("general-data"))
+        # A version kept in the per-process cache would not see the bumps of writes handled by other workers
+        self.assertIsNotNone(caches['shared'].get(GENERAL_DATA_VERSION_CACHE_KEY))
+        self.assertIsNone(caches['default'].get(GENERAL_DATA_VERSION_CACHE_KEY))
+
+    def test_cached_data_is_invalidated_on_writes(self):
+        etag = self.client.get(reverse("general-data"))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            part = PartFactory.create(profile=self.user_profile)
+
+        response = self.client.get(reverse("general-data"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(part.id, [item['id'] for item in response.data['parts']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service_providers[0].delete()
+        response = self.client.get(reverse("general-data"))
+        self.assertEqual(len(response.data['service_providers']), len(self.service_providers) - 1)
+
 
 class FleetWideOverviewViewTestCases(APITestCase):
     fixtures = [f'{PATH}user_and_userprofile_fixture', f'{PATH}parts_fixture', f'{PATH}providers_fixture', f'{PATH}vehicles_fixture', f'{PATH}reports_fixture',
@@ -217,6 +413,13 @@ class FleetWideOverviewViewTestCases(APITestCase):
                 for vehicle in vehicles:
                     self.assertIn(vehicle, response.data['health_alerts'][key][condition], f'{key} alert with {condition} is not correct')
 
+    def test_health_metrics_are_computed_in_a_single_query(self):
+        user = User.objects.get(pk=1)
+        for vehicle_type in (None, "TRUCK"):
+            with self.assertNumQueries(1):
+                vehicle_health_metrics, health_alerts = FleetHealthService.get_health_metrics(user, vehicle_type)
+            self.assertEqual(set(vehicle_health_metrics.keys()), set(health_alerts.keys()))
+
     def test_top_recurring_part_issues(self):
         def is_current_year(date_str: str) -> bool:
             return datetime.strptime(date_str, "%Y-%m-%d").year == 2025  # Fixed year due to the nature of our fixtures
@@ -260,6 +463,10 @@ class FleetWideOverviewViewTestCases(APITestCase):
     def test_correct_metrics_when_time_range_is_given(self):
         self._calculate_metrics_and_assert_response(start_date="2024-10-01", end_date="2025-5-01")
 
+    def test_correct_metrics_when_time_range_covers_whole_months(self):
+        for grouping_type in ('monthly', 'quarterly', 'yearly'):
+            self._calculate_metrics_and_assert_response(group_by=grouping_type, start_date="2024-10-01", end_date="2025-04-30")
+
     def test_empty_metrics_when_range_is_out_of_reports_range(self):
         self._calculate_metrics_and_assert_response(start_date="2026-12-01", end_date="2027-12-01")
 
@@ -1,16 +1,29 @@
 import copy
+import csv
+import json
 import random
 from datetime import date
+from io import StringIO
+from unittest.mock import patch
 
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken
 
-from maintenance.factories import PartPurchaseEventFactory
+from accounts.factories import UserProfileFactory
+from maintenance.factories import PartPurchaseEventFactory, MaintenanceReportFactory, PartFactory, PartsProviderFactory, ServiceProviderFactory
 from maintenance.factories import ServiceProviderEventFactory
+from vehicles.factories import VehicleFactory
 from maintenance.models import MaintenanceReport, PartPurchaseEvent, ServiceProviderEvent, Part, PartsProvider, ServiceProvider
+from maintenance.pagination import ReportCursorPagination
+from maintenance.services.part_usage import PartUsageCounterService
+from maintenance.services.report_import import MaintenanceReportImportService
+from maintenance.services.rollups import MaintenanceCostRollupService
 from vehicles.models import Vehicle
 
 PATH = 'maintenance/tests/fixtures/'
@@ -81,7 +94,8 @@ class MaintenanceReportListViewTestCases(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_sync_latest_maintenance_report_to_vehicle(self):
-        self.client.post(reverse("reports"), data=self.maintenance_report_data, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("reports"), data=self.maintenance_report_data, format="json")
         latest_report = MaintenanceReport.objects.filter(profile__user__pk=1).order_by("-start_date").first()
         self.assertEqual(latest_report.mileage, Vehicle.objects.filter(pk=self.vehicle.id).first().mileage)
 
@@ -383,4 +397,212 @@ class VehicleReportsListTestCases(APITestCase):
         self.assertFalse(response.data['results'])
 
 
+class VehicleReportsMonthBoundariesTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.access_token = AccessToken.for_user(cls.user_profile.user)
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile)
+        for start_date in (date(2024, 11, 30), date(2024, 12, 1), date(2024, 12, 31), date(2025, 1, 1), date(2025, 1, 31)):
+            MaintenanceReportFactory.create(profile=cls.user_profile, vehicle=cls.vehicle, start_date=start_date, end_date=start_date)
 
+    def setUp(self):
+        self.client.cookies['access'] = self.access_token
+
+    def test_available_months_are_distinct_and_descending(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("vehicle-reports-list", args=[self.vehicle.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['available_months'], ['2025-01', '2024-12', '2024-11'])
+        self.assertTrue(any('DISTINCT' in query['sql'] for query in context.captured_queries))
+
+    def test_month_includes_first_and_last_day_only(self):
+        response = self.client.get(reverse("vehicle-reports-list", args=[self.vehicle.id]), data={"month": "2024-12"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(sorted(report['start_date'] for report in response.data['results']), ['2024-12-01', '2024-12-31'])
+
+    def test_month_without_reports_is_empty(self):
+        response = self.client.get(reverse("vehicle-reports-list", args=[self.vehicle.id]), data={"month": "2023-06"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+        self.assertFalse(response.data['results'])
+
+
+class MaintenanceReportListQueryCountTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.access_token = AccessToken.for_user(cls.user_profile.user)
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile)
+        cls.parts = PartFactory.create_batch(size=3, profile=cls.user_profile)
+        cls.parts_provider = PartsProviderFactory.create(profile=cls.user_profile)
+        cls.service_provider = ServiceProviderFactory.create(profile=cls.user_profile)
+
+    def setUp(self):
+        self.client.cookies['access'] = self.access_token
+
+    def create_reports(self, size):
+        for _ in range(size):
+            report = MaintenanceReportFactory.create(profile=self.user_profile, vehicle=self.vehicle, start_date=date(2025, 1, 15), end_date=date(2025, 1, 20))
+            for part in self.parts:
+                PartPurchaseEventFactory.create(maintenance_report=report, part=part, provider=self.parts_provider)
+            ServiceProviderEventFactory.create(maintenance_report=report, service_provider=self.service_provider)
+
+    def count_queries(self, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_reports_list_query_count_does_not_grow_with_page_size(self):
+        self.create_reports(size=1)
+        baseline = self.count_queries(reverse("reports"))
+        self.create_reports(size=10)
+        with self.assertNumQueries(baseline):
+            response = self.client.get(reverse("reports"))
+        self.assertEqual(len(response.data['results']), 11)
+
+    def test_reports_list_with_cursor_pagination(self):
+        self.create_reports(size=3)
+        report_ids = []
+        url, data = reverse("reports"), {"pagination": "cursor"}
+        while url:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            report_ids.extend(report['id'] for report in response.data['results'])
+            url, data = response.data['next'], None
+        self.assertEqual(sorted(report_ids), list(MaintenanceReport.objects.filter(profile=self.user_profile).order_by('pk').values_list('pk', flat=True)))
+
+    def test_cursor_pages_reports_sharing_a_start_date(self):
+        # Every report has the same start date, so each page after the first skips the previous ones with an offset
+        self.create_reports(size=5)
+        report_ids = []
+        url, data = reverse("reports"), {"pagination": "cursor"}
+        with patch.object(ReportCursorPagination, 'page_size', 2):
+            while url:
+                response = self.client.get(url, data)
+                report_ids.extend(report['id'] for report in response.data['results'])
+                url, data = response.data['next'], None
+        self.assertEqual(report_ids, list(MaintenanceReport.objects.filter(profile=self.user_profile).order_by('pk').values_list('pk', flat=True)))
+
+    def test_vehicle_reports_list_query_count_does_not_grow_with_month_size(self):
+        self.create_reports(size=1)
+        baseline = self.count_queries(reverse("vehicle-reports-list", args=[self.vehicle.id]), {"month": "2025-01"})
+        self.create_reports(size=10)
+        with self.assertNumQueries(baseline):
+            response = self.client.get(reverse("vehicle-reports-list", args=[self.vehicle.id]), {"month": "2025-01"})
+        self.assertEqual(response.data['count'], 11)
+
+
+class MaintenanceReportImportTestCases(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile = UserProfileFactory.create()
+        cls.other_user_profile = UserProfileFactory.create()
+        cls.access_token = AccessToken.for_user(cls.user_profile.user)
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile, mileage=100)
+        cls.other_vehicle = VehicleFactory.create(profile=cls.other_user_profile)
+        cls.part = PartFactory.create(profile=cls.user_profile)
+        cls.parts_provider = PartsProviderFactory.create(profile=cls.user_profile)
+        cls.service_provider = ServiceProviderFactory.create(profile=cls.user_profile)
+
+    def setUp(self):
+        self.client.cookies['access'] = self.access_token
+
+    def build_report(self, start_date, mileage, vehicle=None, **kwargs):
+        return {
+            "vehicle": (vehicle or self.vehicle).id,
+            "start_date": start_date.isoformat(),
+            "end_date": start_date.isoformat(),
+            "mileage": mileage,
+            "part_purchase_events": [{"part": self.part.id, "provider": self.parts_provider.id, "purchase_date": start_date.isoformat(), "cost": 300}],
+            "service_provider_events": [{"service_provider": self.service_provider.id, "service_date": start_date.isoformat(), "cost": 200}],
+            **kwargs,
+        }
+
+    def upload_jsonl(self, lines):
+        content = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+        return self.client.post(reverse("reports-import"), {'file': SimpleUploadedFile(name='reports.jsonl', content=content.encode())}, format='multipart')
+
+    def test_successful_jsonl_import(self):
+        response = self.upload_jsonl([self.build_report(date(2024, 5, 1), 5000), self.build_report(date(2024, 7, 1), 9000), self.build_report(date(2024, 6, 1), 7000)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['error_count']), (3, 0))
+
+        reports = MaintenanceReport.objects.filter(profile=self.user_profile)
+        self.assertEqual(reports.count(), 3)
+        self.assertEqual(set(reports.values_list('total_cost', flat=True)), {500})
+        self.assertEqual(PartPurchaseEvent.objects.filter(maintenance_report__in=reports).count(), 3)
+        self.assertEqual(ServiceProviderEvent.objects.filter(maintenance_report__in=reports).count(), 3)
+        # Mileage comes from the latest report, not the last imported row
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.mileage, 9000)
+        self.assertEqual(MaintenanceCostRollupService.verify(), [])
+
+    def test_successful_csv_import(self):
+        report = self.build_report(date(2024, 5, 1), 5000)
+        rows = StringIO()
+        writer = csv.DictWriter(rows, fieldnames=["vehicle", "maintenance_type", "start_date", "end_date", "description", "mileage", "part_purchase_events", "service_provider_events"])
+        writer.writeheader()
+        writer.writerow({**report, "maintenance_type": "", "description": "", "part_purchase_events": json.dumps(report["part_purchase_events"]),
+                         "service_provider_events": json.dumps(report["service_provider_events"])})
+        response = self.client.post(reverse("reports-import"), {'file': SimpleUploadedFile(name='reports.csv', content=rows.getvalue().encode())}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 0))
+        self.assertEqual(MaintenanceReport.objects.get(profile=self.user_profile).total_cost, 500)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        unknown_part = self.build_report(date(2024, 5, 3), 5000)
+        unknown_part["part_purchase_events"][0]["part"] = 0
+        response = self.upload_jsonl([
+            self.build_report(date(2024, 5, 1), 5000),
+            self.build_report(date(2024, 5, 2), 5000, vehicle=self.other_vehicle),
+            unknown_part,
+            self.build_report(date(2024, 5, 4), 5000, service_provider_events=[]),
+            "{not json",
+            self.build_report(date(2024, 5, 6), 5000, end_date=date(2024, 5, 1).isoformat()),
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['error_count']), (1, 5))
+        self.assertEqual(sorted(error['row'] for error in response.data['errors']), [2, 3, 4, 5, 6])
+        self.assertEqual(MaintenanceReport.objects.filter(profile=self.user_profile).count(), 1)
+        self.assertFalse(MaintenanceReport.objects.filter(vehicle=self.other_vehicle).exists())
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        with CaptureQueriesContext(connection) as context:
+            self.upload_jsonl([self.build_report(date(2024, 5, 1), 5000)])
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.upload_jsonl([self.build_report(date(2024, 5, day), 5000 + day) for day in range(1, 21)])
+        self.assertEqual(response.data['created'], 20)
+
+    def test_derived_data_is_refreshed_in_chunks(self):
+        reports = [self.build_report(date(2024, month, 1), 1000 * month) for month in range(1, 6)]
+        service = MaintenanceReportImportService(self.user_profile, batch_size=2, refresh_chunk_size=2)
+        with patch.object(MaintenanceCostRollupService, 'refresh_buckets', wraps=MaintenanceCostRollupService.refresh_buckets) as refresh_buckets:
+            summary = service.import_rows(enumerate(reports, start=1))
+        self.assertEqual(summary['created'], 5)
+        # The five monthly buckets are refreshed once each, in sorted slices of two
+        self.assertEqual([[bucket[3] for bucket in call.args[0]] for call in refresh_buckets.call_args_list], [[1, 2], [3, 4], [5]])
+        self.assertEqual(MaintenanceCostRollupService.verify(), [])
+        self.assertEqual(PartUsageCounterService.verify(), [])
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.mileage, 5000)
+
+    def test_failed_import_returns_what_was_imported(self):
+        lines = [json.dumps(self.build_report(date(2024, 5, 1), 5000)) for _ in range(MaintenanceReportImportService.BATCH_SIZE)]
+        # Blank lines keep the invalid byte out of the blocks decoded while the first batch is read
+        content = '\n'.join(lines).encode() + b'\n' * 2 ** 20 + b'\xff'
+        response = self.client.post(reverse("reports-import"), {'file': SimpleUploadedFile(name='reports.jsonl', content=content)}, format='multipart')
+        # The first batch was committed before the decoding error, and its rollups are up to date
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn('error', response.data)
+        self.assertEqual(response.data['created'], MaintenanceReportImportService.BATCH_SIZE)
+        self.assertEqual(MaintenanceReport.objects.filter(profile=self.user_profile).count(), MaintenanceReportImportService.BATCH_SIZE)
+        self.assertEqual(MaintenanceCostRollupService.verify(), [])
+
+    def test_failed_import_with_unsupported_file(self):
+        response = self.client.post(reverse("reports-import"), {'file': SimpleUploadedFile(name='reports.txt', content=b'{}')}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.data)
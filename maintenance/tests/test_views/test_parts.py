@@ -1,3 +1,6 @@
+from io import StringIO
+from unittest.mock import patch
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from faker import Faker
@@ -8,6 +11,7 @@ from rest_framework_simplejwt.tokens import AccessToken
 from accounts.factories import UserProfileFactory
 from maintenance.factories import PartFactory
 from maintenance.models import Part
+from maintenance.services.part_import import PartCSVImportService
 
 fake = Faker()
 
@@ -198,3 +202,54 @@ class CSVImportViewTestCases(APITestCase):
         response = self.client.post(reverse('upload-parts'), {'file': self.csv_file}, format='multipart')
         print(response.data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['skipped']), (1, 2))
+
+    def test_csv_import_reports_row_errors(self):
+        content = f'name,description\npart1,description1\n,no name\npart2,\n{"x" * 101},too long\npart1,duplicate\npart3,description3'
+        response = self.client.post(reverse('upload-parts'), {'file': SimpleUploadedFile(
+            name='errors.csv',
+            content=content.encode(),
+            content_type='text/csv'
+        )}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['skipped'], response.data['error_count']), (2, 1, 3))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5])
+        self.assertEqual(set(Part.objects.values_list('name', flat=True)), {'part1', 'part3'})
+
+    def test_csv_import_deduplicates_across_chunks(self):
+        PartFactory.create(name='part_3')
+        rows = ''.join(f'part_{i % 7},description_{i}\n' for i in range(20))
+        summary = PartCSVImportService(chunk_size=4).import_file(StringIO(f'name,description\n{rows}'))
+        self.assertEqual((summary['created'], summary['skipped'], summary['error_count']), (6, 14, 0))
+        self.assertEqual(Part.objects.count(), 7)
+
+    def test_csv_import_without_required_columns(self):
+        response = self.client.post(reverse('upload-parts'), {'file': SimpleUploadedFile(
+            name='columns.csv',
+            content=b'title,notes\npart1,notes1',
+            content_type='text/csv'
+        )}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.data)
+
+    def test_csv_import_counts_only_inserted_parts(self):
+        PartFactory.create(name='part2')
+        # part2 is created by a concurrent import between the lookup and the insert
+        with patch.object(PartCSVImportService, 'get_existing_names', side_effect=[set(), {'part2'}]):
+            response = self.client.post(reverse('upload-parts'), {'file': self.csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['skipped']), (2, 1))
+        self.assertEqual(Part.objects.count(), 3)
+
+    def test_failed_csv_import_returns_what_was_imported(self):
+        content = b'name,description\n' + b''.join(f'part_{i},description_{i}\n'.encode() for i in range(3000)) + b'\xff,invalid\n'
+        response = self.client.post(reverse('upload-parts'), {'file': SimpleUploadedFile(
+            name='partial.csv',
+            content=content,
+            content_type='text/csv'
+        )}, format='multipart')
+        # The chunks imported before the decoding error stay imported and are reported as such
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertIn('error', response.data)
+        self.assertGreater(response.data['created'], 0)
+        self.assertEqual(response.data['created'], Part.objects.count())
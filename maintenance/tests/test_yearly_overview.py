@@ -0,0 +1,95 @@
+from datetime import date
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from accounts.factories import UserProfileFactory
+from maintenance.factories import MaintenanceReportFactory, PartFactory, PartsProviderFactory, PartPurchaseEventFactory
+from maintenance.services.fleet_services import VehicleMaintenanceService
+from vehicles.factories import VehicleFactory
+
+
+class YearlyMaintenanceRowsTestCases(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_profile, other_user_profile = UserProfileFactory.create_batch(size=2)
+        cls.vehicle = VehicleFactory.create(profile=cls.user_profile)
+        cls.parts = {name: PartFactory.create(profile=cls.user_profile, name=name) for name in ('brakes', 'Filter', 'oil', 'tyres', 'wipers')}
+        cls.provider = PartsProviderFactory.create(profile=cls.user_profile)
+
+        # 2022 has no report, so the change of 2023 is computed from 2021. The part usage counters are refreshed on commit
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.create_report(date(2021, 5, 3), ['oil'], costs=[100])
+            cls.create_report(date(2023, 1, 10), ['oil', 'tyres'], costs=[50, 150])
+            cls.create_report(date(2023, 1, 20), ['oil', 'brakes'], costs=[50, 100])
+            cls.create_report(date(2023, 3, 2), ['wipers', 'Filter', 'brakes', 'tyres'], costs=[10, 20, 30, 40])
+            cls.create_report(date(2023, 4, 15), [], costs=[])
+        # Reports of another vehicle and of another profile are not part of the overview
+        MaintenanceReportFactory.create(profile=cls.user_profile, vehicle=VehicleFactory.create(profile=cls.user_profile), start_date=date(2023, 1, 5), total_cost=999)
+        MaintenanceReportFactory.create(profile=other_user_profile, vehicle=cls.vehicle, start_date=date(2023, 1, 5), total_cost=999)
+
+    @classmethod
+    def create_report(cls, start_date, part_names, costs):
+        # The part purchases add their cost to the report, a report without any stands for services costing 70
+        report = MaintenanceReportFactory.create(profile=cls.user_profile, vehicle=cls.vehicle, start_date=start_date, end_date=start_date,
+                                                 total_cost=0 if costs else 70)
+        for part_name, cost in zip(part_names, costs):
+            PartPurchaseEventFactory.create(maintenance_report=report, part=cls.parts[part_name], provider=cls.provider, cost=cost)
+
+    def get_rows(self, data_type):
+        rows = VehicleMaintenanceService.aggregate_yearly_maintenance_rows(self.vehicle.id, self.user_profile.id)
+        return [row[1:] for row in rows if row[0] == data_type]
+
+    def test_yearly_costs_and_changes(self):
+        self.assertEqual(self.get_rows('yearly_cost'), [
+            (Decimal(2021), None, Decimal(100), Decimal(0), None, None, None, None, None),
+            (Decimal(2023), None, Decimal(520), Decimal(100), Decimal('420.00'), None, None, None, None),
+        ])
+
+    def test_monthly_changes_restart_every_year(self):
+        self.assertEqual([(year, month, total_cost, previous_cost, change) for year, month, total_cost, previous_cost, change, *_ in self.get_rows('monthly_cost')], [
+            (Decimal(2021), Decimal(5), Decimal(100), Decimal(0), None),
+            (Decimal(2023), Decimal(1), Decimal(350), Decimal(0), None),
+            (Decimal(2023), Decimal(3), Decimal(100), Decimal(350), Decimal('-71.43')),
+            (Decimal(2023), Decimal(4), Decimal(70), Decimal(100), Decimal('-30.00')),
+        ])
+
+    def test_top_three_parts_break_ties_by_name(self):
+        yearly_parts = [(year, part_name, count, part_cost, rank) for year, _, _, _, _, part_name, count, part_cost, rank in self.get_rows('yearly_part')]
+        self.assertEqual(yearly_parts, [
+            (Decimal(2021), 'oil', 1, Decimal(100), 1),
+            (Decimal(2023), 'brakes', 2, Decimal(130), 1),
+            (Decimal(2023), 'oil', 2, Decimal(100), 2),
+            (Decimal(2023), 'tyres', 2, Decimal(190), 3),
+        ])
+        march_parts = [row[5] for row in self.get_rows('monthly_part') if row[1] == Decimal(3)]
+        self.assertEqual(march_parts, ['Filter', 'brakes', 'tyres'])
+
+    @skipUnless(connection.vendor == 'postgresql', "The query only runs on PostgreSQL")
+    def test_rows_match_the_postgresql_query(self):
+        for vehicle_id, profile_id in ((self.vehicle.id, self.user_profile.id), (self.vehicle.id, 0)):
+            rows = VehicleMaintenanceService.get_yearly_maintenance_rows(vehicle_id, profile_id)
+            self.assertEqual(rows, VehicleMaintenanceService.aggregate_yearly_maintenance_rows(vehicle_id, profile_id))
+
+    @skipUnless(connection.vendor == 'postgresql', "The query only runs on PostgreSQL")
+    def test_rows_of_several_vehicles_match_the_postgresql_query(self):
+        other_vehicle = VehicleFactory.create(profile=self.user_profile)
+        report = MaintenanceReportFactory.create(profile=self.user_profile, vehicle=other_vehicle, start_date=date(2023, 2, 1), end_date=date(2023, 2, 1))
+        PartPurchaseEventFactory.create(maintenance_report=report, part=self.parts['oil'], provider=self.provider, cost=80)
+        vehicle_ids = [self.vehicle.id, other_vehicle.id, VehicleFactory.create(profile=self.user_profile).id]
+
+        rows = VehicleMaintenanceService.get_vehicles_yearly_maintenance_rows(vehicle_ids, self.user_profile.id)
+        self.assertEqual(rows, VehicleMaintenanceService.aggregate_vehicles_yearly_maintenance_rows(vehicle_ids, self.user_profile.id))
+        self.assertEqual(set(rows), {self.vehicle.id, other_vehicle.id})
+        self.assertEqual(rows[self.vehicle.id], VehicleMaintenanceService.get_yearly_maintenance_rows(self.vehicle.id, self.user_profile.id))
+
+    def test_overview_is_formatted_from_the_rows(self):
+        overview = dict(VehicleMaintenanceService.format_yearly_maintenance_data(
+            VehicleMaintenanceService.get_yearly_maintenance_rows(self.vehicle.id, self.user_profile.id)
+        ))
+        self.assertEqual(list(overview), [2021, 2023])
+        self.assertEqual(overview[2023]['yoy_change'], Decimal('420.00'))
+        self.assertEqual([issue['part_name'] for issue in overview[2023]['top_recurring_issues']], ['brakes', 'oil', 'tyres'])
+        self.assertEqual(overview[2023][3]['mom_change'], Decimal('-71.43'))
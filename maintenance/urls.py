@@ -2,7 +2,8 @@ from django.urls import path
 
 from .views import PartsListView, PartDetailsView, ServiceProviderListView, ServiceProviderDetailsView, PartsProvidersListView, \
     PartsProviderDetailsView, PartPurchaseEventDetailsView, MaintenanceReportListView, MaintenanceReportDetailsView, \
-    VehicleMaintenanceReportOverview, GeneralMaintenanceDataView, ServiceProviderEventDetailsView, CSVImportView, FleetWideOverviewView, VehicleReportsListView
+    VehicleMaintenanceReportOverview, GeneralMaintenanceDataView, ServiceProviderEventDetailsView, CSVImportView, FleetWideOverviewView, VehicleReportsListView, \
+    MaintenanceReportImportView, VehiclesMaintenanceOverview, VehicleOverviewCacheStatsView
 
 urlpatterns = [
     # parts endpoints
@@ -24,11 +25,14 @@ urlpatterns = [
 
     # reports endpoints
     path('reports/', MaintenanceReportListView.as_view(), name='reports'),
+    path('reports/import/', MaintenanceReportImportView.as_view(), name='reports-import'),
     path('reports/<int:pk>/', MaintenanceReportDetailsView.as_view(), name='reports-details'),
     path('reports/vehicle/<int:pk>/', VehicleReportsListView.as_view(), name='vehicle-reports-list'),
 
     # statistics endpoints
     path('<int:pk>/overview/', VehicleMaintenanceReportOverview.as_view(), name="overview"),
+    path('overview/', VehiclesMaintenanceOverview.as_view(), name="vehicles-overview"),
+    path('overview/cache-stats/', VehicleOverviewCacheStatsView.as_view(), name="overview-cache-stats"),
     path('general-data/', GeneralMaintenanceDataView.as_view(), name="general-data"),
     path('fleet-wide-overview/', FleetWideOverviewView.as_view(), name="fleet-wide-overview"),
 ]
@@ -1,5 +1,7 @@
-from django.db.models import Sum
-from .models import MaintenanceChoices, ServiceChoices
+from django.db.models import Sum, Count, Q
+from django.db.models.query import QuerySet
+
+from .models import MaintenanceChoices, ServiceChoices, ServiceProviderEvent
 
 
 class ReportSummarizer:
@@ -25,6 +27,42 @@ class ReportSummarizer:
 
         return report
 
+    def summarize_queryset(self, maintenance_reports: QuerySet):
+        """
+        Set-based counterpart of summarize_reports for querysets.
+
+        Produces the same counters with two grouped queries, one over the reports (including their stored service cost)
+        and one counting their service provider events by service type, no matter how many reports the queryset
+        matches. Plain iterables fall back to summarize_reports.
+        """
+        if not isinstance(maintenance_reports, QuerySet):
+            return self.summarize_reports(maintenance_reports)
+
+        if not maintenance_reports.query.is_sliced:
+            maintenance_reports = maintenance_reports.order_by()
+        report = self.initialize_report_summary()
+        report_totals = maintenance_reports.aggregate(
+            **{
+                self.TOTAL_MAINTENANCE: Count('id'),
+                self.TOTAL_MAINTENANCE_COST: Sum('total_cost', default=0),
+                self.PREVENTIVE: Count('id', filter=Q(maintenance_type=MaintenanceChoices.PREVENTIVE)),
+                self.PREVENTIVE_COST: Sum('total_cost', filter=Q(maintenance_type=MaintenanceChoices.PREVENTIVE), default=0),
+                self.CURATIVE: Count('id', filter=Q(maintenance_type=MaintenanceChoices.CURATIVE)),
+                self.CURATIVE_COST: Sum('total_cost', filter=Q(maintenance_type=MaintenanceChoices.CURATIVE), default=0),
+                self.TOTAL_SERVICE_COST: Sum('service_cost', default=0),
+            }
+        )
+        event_totals = ServiceProviderEvent.objects.filter(maintenance_report__in=maintenance_reports.values('pk')).aggregate(
+            **{
+                self.MECHANIC: Count('id', filter=Q(service_provider__service_type=ServiceChoices.MECHANIC)),
+                self.ELECTRICIAN: Count('id', filter=Q(service_provider__service_type=ServiceChoices.ELECTRICIAN)),
+                self.CLEANING: Count('id', filter=Q(service_provider__service_type=ServiceChoices.CLEANING)),
+            }
+        )
+        report.update(report_totals)
+        report.update(event_totals)
+        return report
+
     def initialize_report_summary(self):
         return {
             self.TOTAL_MAINTENANCE: 0,
@@ -44,7 +82,7 @@ class ReportSummarizer:
 
     def update_costs(self, report, maintenance_report):
         report[self.TOTAL_MAINTENANCE_COST] += maintenance_report.total_cost
-        report[self.TOTAL_SERVICE_COST] += maintenance_report.service_provider_events.aggregate(Sum('cost'))["cost__sum"] or 0
+        report[self.TOTAL_SERVICE_COST] += maintenance_report.service_cost
 
     def update_maintenance_type_counts(self, report, maintenance_report):
         if maintenance_report.maintenance_type == MaintenanceChoices.PREVENTIVE:
@@ -1,6 +1,6 @@
 from .events import PartPurchaseEventDetailsView, ServiceProviderEventDetailsView
-from .maintenance_insights import VehicleMaintenanceReportOverview, GeneralMaintenanceDataView, FleetWideOverviewView
+from .maintenance_insights import VehicleMaintenanceReportOverview, VehiclesMaintenanceOverview, VehicleOverviewCacheStatsView, GeneralMaintenanceDataView, FleetWideOverviewView
 from .part import PartsListView, PartDetailsView, CSVImportView
 from .parts_provider import PartsProvidersListView, PartsProviderDetailsView
-from .reports import MaintenanceReportListView, MaintenanceReportDetailsView, VehicleReportsListView
+from .reports import MaintenanceReportListView, MaintenanceReportDetailsView, VehicleReportsListView, MaintenanceReportImportView
 from .service_provider import ServiceProviderListView, ServiceProviderDetailsView
\ No newline at end of file
@@ -7,6 +7,13 @@ from rest_framework.views import APIView
 
 from maintenance.models import PartPurchaseEvent, ServiceProviderEvent
 from maintenance.serializers import PartPurchaseEventSerializer, ServiceProviderEventSerializer
+from maintenance.services.report_costs import ReportCostBreakdownService
+
+
+def get_report_id(validated_data):
+    """Returns the id of the report an event is moved to, or None if the update keeps it on its report."""
+    report = validated_data.get('maintenance_report')
+    return report.pk if report else None
 
 
 class PartPurchaseEventDetailsView(APIView):
@@ -20,15 +27,22 @@ class PartPurchaseEventDetailsView(APIView):
 
     def put(self, request, pk):
         part_purchase_event = self.get_object(pk, request.user)
+        previous_report_id = part_purchase_event.maintenance_report_id
         serializer = PartPurchaseEventSerializer(part_purchase_event, data=request.data, context={"request": request})
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                ReportCostBreakdownService.lock_reports({previous_report_id, get_report_id(serializer.validated_data)})
+                event = serializer.save()
+                ReportCostBreakdownService.refresh_reports({previous_report_id, event.maintenance_report_id})
             return Response(serializer.data, status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
         part_purchase_event = self.get_object(pk, request.user)
-        part_purchase_event.delete()
+        with transaction.atomic():
+            ReportCostBreakdownService.lock_reports({part_purchase_event.maintenance_report_id})
+            part_purchase_event.delete()
+            ReportCostBreakdownService.refresh_reports({part_purchase_event.maintenance_report_id})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -43,21 +57,27 @@ class ServiceProviderEventDetailsView(APIView):
 
     def put(self, request, pk):
         service_provider_event = self.get_object(pk, request.user)
+        previous_report_id = service_provider_event.maintenance_report_id
         serializer = ServiceProviderEventSerializer(service_provider_event, data=request.data, context={"request": request})
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                ReportCostBreakdownService.lock_reports({previous_report_id, get_report_id(serializer.validated_data)})
+                event = serializer.save()
+                ReportCostBreakdownService.refresh_reports({previous_report_id, event.maintenance_report_id})
             return Response(serializer.data, status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
         service_provider_event = self.get_object(pk, request.user)
         with transaction.atomic():
+            ReportCostBreakdownService.lock_reports({service_provider_event.maintenance_report_id})
             has_other_events = ServiceProviderEvent.objects.filter(
                 maintenance_report_id=service_provider_event.maintenance_report_id,
                 maintenance_report__profile__user=request.user
             ).exclude(pk=service_provider_event.pk).exists()
             if has_other_events:
                 service_provider_event.delete()
+                ReportCostBreakdownService.refresh_reports({service_provider_event.maintenance_report_id})
                 return Response(status=status.HTTP_204_NO_CONTENT)
             else:
                 raise ValidationError(detail={"error": "Cannot delete the only service provider event for this maintenance report."})
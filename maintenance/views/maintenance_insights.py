@@ -1,15 +1,14 @@
-from django.db import connection
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from maintenance.models import Part, ServiceProvider, PartsProvider
-from maintenance.queries import COMBINED_YEARLY_DATA_QUERY
-from maintenance.serializers import PartSerializer, ServiceProviderSerializer, PartsProviderSerializer
+from maintenance.caching import get_general_data_version, get_general_data, with_ownership, get_vehicle_overview, get_vehicle_overview_cache_stats
 from maintenance.services.fleet_services import FleetHealthService, FleetMaintenanceService, VehicleMaintenanceService
-from vehicles.models import Vehicle
+from vehicles.models import Vehicle, VehicleTypeChoices
 
 
 class VehicleMaintenanceReportOverview(APIView):
@@ -23,24 +22,82 @@ class VehicleMaintenanceReportOverview(APIView):
 
     def get(self, request, pk):
         vehicle = self.get_vehicle(pk, request.user)
-        profile = request.user.userprofile.id
-        params = [vehicle.id, profile, vehicle.id, profile, vehicle.id, profile, vehicle.id, profile]
-        with connection.cursor() as cursor:
-            # Pass vehicle_id and profile_id twice (once for each CTE that needs them)
-            cursor.execute(COMBINED_YEARLY_DATA_QUERY, params)
-            return Response(VehicleMaintenanceService.format_yearly_maintenance_data(cursor.fetchall()), status=status.HTTP_200_OK)
+        profile_id = request.user.userprofile.id
+        overview = get_vehicle_overview(vehicle.id, profile_id, lambda: VehicleMaintenanceService.format_yearly_maintenance_data(
+            VehicleMaintenanceService.get_yearly_maintenance_rows(vehicle.id, profile_id)
+        ))
+        return Response(overview, status=status.HTTP_200_OK)
+
+
+class VehicleOverviewCacheStatsView(APIView):
+    permission_classes = [IsAdminUser, ]
+
+    def get(self, request):
+        """Returns the hits and misses of the vehicle overview cache, to follow its hit rate."""
+        return Response(get_vehicle_overview_cache_stats(), status=status.HTTP_200_OK)
+
+
+class VehiclesMaintenanceOverview(APIView):
+    permission_classes = [IsAuthenticated, ]
+    MAX_VEHICLE_IDS = 200
+
+    def get_vehicle_ids(self, request):
+        """Returns the ids of the vehicles of the user selected by the `vehicle_ids` or the `vehicle_type` query parameter."""
+        vehicles = Vehicle.objects.filter(profile__user=request.user).order_by('id')
+        raw_vehicle_ids = request.query_params.get('vehicle_ids')
+        vehicle_type = request.query_params.get('vehicle_type')
+
+        if raw_vehicle_ids:
+            try:
+                vehicle_ids = {int(vehicle_id) for vehicle_id in raw_vehicle_ids.split(',')}
+            except ValueError:
+                raise ValidationError(detail={'vehicle_ids': "Must be a comma-separated list of vehicle ids."})
+            if len(vehicle_ids) > self.MAX_VEHICLE_IDS:
+                raise ValidationError(detail={'vehicle_ids': f"At most {self.MAX_VEHICLE_IDS} vehicles can be requested at once."})
+            found_ids = list(vehicles.filter(pk__in=vehicle_ids).values_list('id', flat=True))
+            missing_ids = sorted(vehicle_ids.difference(found_ids))
+            if missing_ids:
+                raise ValidationError(detail={'vehicle_ids': f"Vehicles {missing_ids} do not exist!"})
+            return found_ids
+
+        if vehicle_type:
+            if vehicle_type not in VehicleTypeChoices.values:
+                raise ValidationError(detail={'vehicle_type': f"Must be one of {', '.join(VehicleTypeChoices.values)}."})
+            return list(vehicles.filter(type=vehicle_type).values_list('id', flat=True))
+
+        raise ValidationError(detail={'detail': "Either vehicle_ids or vehicle_type is required."})
+
+    def get(self, request):
+        """
+        Returns the overview of VehicleMaintenanceReportOverview for several vehicles, computed in a single query.
+
+        Query Parameters:
+            vehicle_ids (str, optional): Comma-separated ids of the vehicles.
+            vehicle_type (str, optional): Type of the vehicles, used when vehicle_ids is not given.
+        """
+        vehicle_ids = self.get_vehicle_ids(request)
+        rows = VehicleMaintenanceService.get_vehicles_yearly_maintenance_rows(vehicle_ids, request.user.userprofile.id)
+        return Response([
+            {'vehicle': vehicle_id, 'overview': VehicleMaintenanceService.format_yearly_maintenance_data(rows.get(vehicle_id, []))}
+            for vehicle_id in vehicle_ids
+        ], status=status.HTTP_200_OK)
 
 
 class GeneralMaintenanceDataView(APIView):
     permission_classes = [IsAuthenticated, ]
 
     def get(self, request):
-        serialized_parts = PartSerializer(Part.objects.all(), many=True, context={'request': request})
-        serialized_service_providers = ServiceProviderSerializer(ServiceProvider.objects.all(), many=True, context={'request': request})
-        serialized_parts_providers = PartsProviderSerializer(PartsProvider.objects.all(), many=True, context={'request': request})
-        response_data = {"parts": serialized_parts.data, "service_providers": serialized_service_providers.data,
-                         "part_providers": serialized_parts_providers.data}
-        return Response(response_data, status=status.HTTP_200_OK)
+        # is_owner depends on the user, so the ETag does too. The user id is used since it is already loaded.
+        version = get_general_data_version()
+        etag = f'"{version}-{request.user.id}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = get_general_data(version)
+            response = Response(with_ownership(data, request.user.userprofile.id), status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 class FleetWideOverviewView(APIView):
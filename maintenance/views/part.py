@@ -1,4 +1,3 @@
-import csv
 from io import TextIOWrapper
 
 from rest_framework import status
@@ -7,9 +6,11 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.views import import_error_response
 from maintenance.models import Part
 from maintenance.permissions import IsOwner
 from maintenance.serializers import PartSerializer
+from maintenance.services.part_import import PartCSVImportService
 
 
 class PartsListView(APIView):
@@ -67,18 +68,10 @@ class CSVImportView(APIView):
         if not csv_file or not csv_file.name.endswith('.csv'):
             return Response({"error": "Please upload a CSV file."}, status=status.HTTP_400_BAD_REQUEST)
 
+        service = PartCSVImportService()
         try:
             decode_file = TextIOWrapper(csv_file.file, encoding='utf-8')
-            reader = csv.DictReader(decode_file)
-
-            existing_names = set(Part.objects.all().values_list('name', flat=True))
-            parts_to_create = []
-            for row in reader:
-                if row['name'] and row['description'] and row['name'] not in existing_names:
-                    parts_to_create.append(Part(name=row['name'], description=row['description']))
-
-            created_parts = Part.objects.bulk_create(parts_to_create)
-            serialized_parts = PartSerializer(created_parts, many=True, context={'request': request})
-            return Response(serialized_parts.data, status=status.HTTP_201_CREATED)
+            summary = service.import_file(decode_file)
+            return Response(summary, status=status.HTTP_201_CREATED)
         except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return import_error_response(service.get_summary(), e)
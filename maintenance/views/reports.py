@@ -1,14 +1,19 @@
+from io import TextIOWrapper
+
 from django.db import transaction
 from rest_framework import status
 from rest_framework.exceptions import ValidationError, NotFound
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.querysets import optimize_queryset_for_serializer
+from core.views import import_error_response
 from maintenance.models import MaintenanceReport
-from maintenance.pagination import MonthlyPagination
+from maintenance.pagination import MonthlyPagination, get_report_paginator
 from maintenance.serializers import MaintenanceReportSerializer
+from maintenance.services.report_costs import ReportCostBreakdownService
+from maintenance.services.report_import import MaintenanceReportImportService
 from vehicles.models import Vehicle
 
 
@@ -17,7 +22,8 @@ class MaintenanceReportListView(APIView):
 
     def get(self, request):
         reports = MaintenanceReport.objects.filter(profile__user=request.user).order_by("start_date")
-        paginator = PageNumberPagination()
+        reports = optimize_queryset_for_serializer(reports, MaintenanceReportSerializer)
+        paginator = get_report_paginator(request)
         paginated_reports = paginator.paginate_queryset(reports, request)
         serializer = MaintenanceReportSerializer(paginated_reports, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
@@ -41,6 +47,7 @@ class VehicleReportsListView(APIView):
     def get(self, request, pk):
         vehicle = self.get_vehicle(pk, request.user)
         reports = MaintenanceReport.objects.filter(profile__user=request.user, vehicle=vehicle).order_by("start_date")
+        reports = optimize_queryset_for_serializer(reports, MaintenanceReportSerializer)
         paginator = MonthlyPagination()
         paginated_reports = paginator.paginate_queryset(reports, request)
         serializer = MaintenanceReportSerializer(paginated_reports, many=True, context={'request': request})
@@ -72,9 +79,31 @@ class MaintenanceReportDetailsView(APIView):
         try:
             with transaction.atomic():
                 maintenance_report = self.get_object(pk, request.user)
+                # The report is locked before its events, like in the event views
+                ReportCostBreakdownService.lock_reports({maintenance_report.pk})
                 maintenance_report.part_purchase_events.all().delete()
                 maintenance_report.service_provider_events.all().delete()
                 maintenance_report.delete()
                 return Response(status=status.HTTP_204_NO_CONTENT)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MaintenanceReportImportView(APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def post(self, request):
+        import_file = request.FILES.get('file')
+        if not import_file or not import_file.name.endswith(('.jsonl', '.csv')):
+            return Response({"error": "Please upload a JSON Lines (.jsonl) or CSV file."}, status=status.HTTP_400_BAD_REQUEST)
+
+        service = MaintenanceReportImportService(request.user.userprofile)
+        try:
+            decode_file = TextIOWrapper(import_file.file, encoding='utf-8')
+            if import_file.name.endswith('.jsonl'):
+                summary = service.import_jsonl(decode_file)
+            else:
+                summary = service.import_csv(decode_file)
+            return Response(summary, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return import_error_response(service.get_summary(), e)
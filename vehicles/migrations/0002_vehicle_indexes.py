@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-17 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['profile', 'type'], name='vehicle_profile_type_idx'),
+        ),
+    ]
@@ -67,5 +67,11 @@ class Vehicle(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Fleet metrics of a tenant filtered by vehicle type
+            models.Index(fields=['profile', 'type'], name='vehicle_profile_type_idx'),
+        ]
+
     def __str__(self):
         return f'{self.make} {self.model} ({self.registration_number})'
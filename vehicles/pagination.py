@@ -1,6 +1,14 @@
 from rest_framework.pagination import PageNumberPagination
 
+from core.pagination import CustomCursorPagination
+
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = "pageSize"
     max_page_size = 20
+
+
+def get_paginator(request):
+    if request.query_params.get("pagination") == "cursor":
+        return CustomCursorPagination()
+    return CustomPageNumberPagination()
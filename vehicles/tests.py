@@ -24,6 +24,17 @@ class VehiclesListTestCases(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], len(self.vehicles))
 
+    def test_successful_vehicles_retrieval_with_cursor_pagination(self):
+        response = self.client.get(reverse("vehicles"), {"pagination": "cursor", "pageSize": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual([vehicle['id'] for vehicle in response.data['results']], [self.vehicles[0].id])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([vehicle['id'] for vehicle in response.data['results']], [self.vehicles[1].id])
+        self.assertIsNone(response.data['next'])
+
     def test_failed_vehicles_retrieval_with_unauthenticated_user(self):
         self.client.cookies["access"] = None
         response = self.client.get(reverse("vehicles"))
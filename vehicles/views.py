@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import Vehicle
-from .pagination import CustomPageNumberPagination
+from .pagination import get_paginator
 from .permissions import IsVehicleOwner
 from .serializers import VehicleSerializer
 
@@ -15,7 +15,7 @@ class VehiclesListView(APIView):
 
     def get(self, request):
         vehicles = Vehicle.objects.filter(profile__user=request.user).order_by("pk")
-        paginator = CustomPageNumberPagination()
+        paginator = get_paginator(request)
         paginated_vehicles = paginator.paginate_queryset(vehicles, request)
         serializer = VehicleSerializer(paginated_vehicles, many=True, context={"request": request})
         return paginator.get_paginated_response(serializer.data)